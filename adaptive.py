@@ -0,0 +1,68 @@
+import logging
+from typing import Iterable, Optional
+
+from models import JiraIssue
+
+logger = logging.getLogger(__name__)
+
+
+def nearest_ttfr_remaining_ms(tracks: Iterable[JiraIssue]) -> Optional[int]:
+    """Smallest remaining time among running (not paused, not breached) TTFR cycles."""
+    nearest = None
+    for track in tracks:
+        try:
+            cycle = track.fields.customfield_12671.ongoingCycle
+        except AttributeError:
+            continue
+        if not cycle or cycle.paused or cycle.breached:
+            continue
+        if nearest is None or cycle.remainingTime.millis < nearest:
+            nearest = cycle.remainingTime.millis
+    return nearest
+
+
+def outside_calendar_hours(tracks: Iterable[JiraIssue]) -> bool:
+    """True if there are SLA cycles and none of them is currently within calendar hours."""
+    flags = []
+    for track in tracks:
+        for sla in (track.fields.customfield_12671, track.fields.customfield_12670):
+            cycle = sla.ongoingCycle if sla else None
+            if cycle and cycle.withinCalendarHours is not None:
+                flags.append(cycle.withinCalendarHours)
+    return bool(flags) and not any(flags)
+
+
+class AdaptiveInterval:
+    """
+    Интервал опроса, который подстраивается под текущую ситуацию:
+    - приходят новые Open треки - сразу минимальный интервал;
+    - ближайший TTFR скоро истекает - опрашиваем примерно дважды до его истечения;
+    - вне рабочего календаря - максимальный интервал;
+    - иначе плавно увеличиваем интервал в `backoff` раз.
+    """
+
+    def __init__(self, base: int, min_interval: int, max_interval: int, backoff: float = 1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.current = self._clamp(base)
+
+    def _clamp(self, interval: float) -> int:
+        return int(min(max(interval, self.min_interval), self.max_interval))
+
+    def update(self, tracks: Iterable[JiraIssue], new_open: int = 0) -> int:
+        tracks = list(tracks)
+        nearest = nearest_ttfr_remaining_ms(tracks)
+        if new_open:
+            interval, reason = self.min_interval, f'{new_open} new open tracks'
+        elif nearest is not None and nearest < 2 * self.current * 1000:
+            interval, reason = nearest / 1000 / 2, f'TTFR expires in {nearest // 1000}s'
+        elif outside_calendar_hours(tracks):
+            interval, reason = self.max_interval, 'outside calendar hours'
+        else:
+            interval, reason = self.current * self.backoff, 'quiet'
+        interval = self._clamp(interval)
+        if interval != self.current:
+            logger.info(f'poll interval {self.current}s -> {interval}s ({reason})')
+        self.current = interval
+        return interval
@@ -0,0 +1,75 @@
+"""
+/mywatch change detection: one WatchColumns pass per watcher vs one pass for all due watchers.
+
+    python -m benchmarks.bench_changes [--issues 2000] [--watchers 500] [--per-watcher 50] [--repeat 5]
+"""
+import argparse
+import random
+import time
+
+import changes
+from benchmarks.fixtures import make_issues
+from changes import WatchColumns
+from records import parse_records
+
+THRESHOLD_MS = 4 * 3600 * 1000
+
+
+def make_watches(issues, watchers: int, per_watcher: int, seed: int = 42):
+    rng = random.Random(seed)
+    watches = []
+    for _ in range(watchers):
+        tracks = rng.sample(issues, per_watcher)
+        state = {track.key: {'status': rng.choice([track.fields.status.name, 'Open', 'In Progress']),
+                             'sla_warned': rng.random() < 0.5} for track in tracks}
+        watches.append((tracks, state))
+    return watches
+
+
+def per_watcher(watches):
+    results = []
+    for tracks, state in watches:
+        columns = WatchColumns()
+        columns.add_watcher(tracks, state)
+        events, states = columns.detect(THRESHOLD_MS)
+        results.append((events[0], states[0]))
+    return results
+
+
+def batched(watches):
+    columns = WatchColumns()
+    for tracks, state in watches:
+        columns.add_watcher(tracks, state)
+    return columns.detect(THRESHOLD_MS)
+
+
+def best(run, watches, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(watches)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--issues', type=int, default=2000)
+    parser.add_argument('--watchers', type=int, default=500)
+    parser.add_argument('--per-watcher', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    issues = parse_records(make_issues(args.issues))
+    watches = make_watches(issues, args.watchers, args.per_watcher)
+    print(f'{args.watchers} watchers x {args.per_watcher} of {args.issues} issues, best of {args.repeat}, '
+          f'{"numpy" if changes.np is not None else "array fallback"}')
+    results = {}
+    for name, run in (('per watcher', per_watcher), ('batched', batched)):
+        results[name] = best(run, watches, args.repeat)
+        print(f'{name:<12}{results[name] * 1000:>10.1f} ms')
+    print(f'batched is {results["per watcher"] / results["batched"]:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Decode benchmark: full pydantic models vs slot-based records.
+
+    python -m benchmarks.bench_decode [--issues 1000] [--repeat 5]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks.fixtures import make_issues
+from models import JiraIssue
+from records import parse_records
+
+
+def parse_models(data):
+    return [JiraIssue.model_validate(track) for track in data]
+
+
+def measure(parse, data, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        parse(data)
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = parse(data)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return min(timings), retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--issues', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = make_issues(args.issues)
+    per_k = 1000 / args.issues
+    print(f'{args.issues} issues, best of {args.repeat}, figures per 1000 issues')
+    print(f'{"decoder":<10}{"time, ms":>12}{"memory, KiB":>14}')
+    results = {}
+    for name, parse in (('pydantic', parse_models), ('records', parse_records)):
+        seconds, retained = measure(parse, data, args.repeat)
+        results[name] = seconds
+        print(f'{name:<10}{seconds * 1000 * per_k:>12.1f}{retained / 1024 * per_k:>14.0f}')
+    print(f'records are {results["pydantic"] / results["records"]:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Offline pipeline benchmark: tools.py against a local fake Jira, no credentials needed.
+
+    python -m benchmarks.bench_pipeline [--sizes 10,1000,50000] [--runs 5]
+    python -m benchmarks.bench_pipeline --json baseline.json
+    python -m benchmarks.bench_pipeline --compare baseline.json
+
+Stages: fetch (paged search over HTTP), etl (fetch + parse + broadcast render),
+parse (fast records, and full pydantic models up to --models-limit issues),
+render (/check messages from scratch and with the per-issue fragment cache warm),
+check_personal_track_changes. For every stage it reports latency
+percentiles over --runs, throughput and the tracemalloc peak of one extra run.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Union
+
+import render
+from benchmarks.fake_jira import FakeJiraServer, IssueSource
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+async def measure(stage: Callable[[], Union[Any, Awaitable[Any]]], runs: int, size: int) -> Dict[str, float]:
+    async def call():
+        result = stage()
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    await call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    p50 = percentile(timings, 50)
+    return {
+        'p50_ms': p50 * 1000,
+        'p95_ms': percentile(timings, 95) * 1000,
+        'max_ms': max(timings) * 1000,
+        'issues_per_s': size / p50 if p50 else float('inf'),
+        'peak_kib': peak / 1024,
+    }
+
+
+def changed_states(tracks, share: float = 0.1, seed: int = 7) -> Dict[str, Dict]:
+    """Previous /mywatch state where `share` of the issues had another status."""
+    rng = random.Random(seed)
+    return {
+        track.key: {
+            'status': 'Analysis' if rng.random() < share else track.fields.status.name,
+            'sla_warned': False,
+        }
+        for track in tracks
+    }
+
+
+async def bench_size(tools, server: FakeJiraServer, size: int, runs: int, models_limit: int) -> Dict[str, Dict]:
+    server.source = IssueSource(size)
+    raw = await tools.check_issues()
+    tracks = tools.parse_jira_issues(raw, fast=True)
+    prev_states = changed_states(tracks)
+    sla_warn_ms = tools.settings.telegram.sla_warning_threshold_ms
+
+    stages = {
+        'fetch': lambda: tools.check_issues(),
+        'etl': lambda: tools.track_cache.invalidate() or tools.etl(mode='broadcast'),
+        'parse': lambda: tools.parse_jira_issues(raw, fast=True),
+    }
+    if size <= models_limit:
+        stages['parse_models'] = lambda: tools.parse_jira_issues(raw, fast=False)
+    stages['render'] = lambda: (render._issue_block.cache_clear()
+                                or tools.render_tracks(tracks, mode='check', parse_mode=render.HTML))
+    stages['render_cached'] = lambda: tools.render_tracks(tracks, mode='check', parse_mode=render.HTML)
+    stages['track_changes'] = lambda: tools.check_personal_track_changes(tracks, prev_states, sla_warn_ms)
+
+    results = {}
+    for name, stage in stages.items():
+        requests_before = server.requests
+        results[name] = await measure(stage, runs, size)
+        results[name]['requests'] = (server.requests - requests_before) / (runs + 1)
+    return results
+
+
+def print_results(size: int, results: Dict[str, Dict], baseline: Dict[str, Dict] = None) -> None:
+    print(f'\n{size} issues')
+    header = f'{"stage":<16}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}{"issues/s":>12}{"peak KiB":>11}{"requests":>10}'
+    print(header + ('   vs baseline p50' if baseline else ''))
+    for name, row in results.items():
+        line = (f'{name:<16}{row["p50_ms"]:>10.2f}{row["p95_ms"]:>10.2f}{row["max_ms"]:>10.2f}'
+                f'{row["issues_per_s"]:>12.0f}{row["peak_kib"]:>11.0f}{row["requests"]:>10.1f}')
+        if baseline and name in baseline:
+            line += f'   {row["p50_ms"] / baseline[name]["p50_ms"]:>6.2f}x'
+        print(line)
+
+
+async def run(args) -> Dict[str, Dict]:
+    server = FakeJiraServer(IssueSource(0), latency=args.latency).start()
+    os.environ.update({
+        'JIRA_URL': server.url,
+        'JIRA_USERNAME': 'bench',
+        'JIRA_PASSWORD': 'bench',
+        'TELEGRAM_BOT_TOKEN': '0:bench',
+    })
+    import tools  # after the environment points at the fake server
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fixture:
+            baseline = json.load(fixture)
+    report = {}
+    try:
+        for size in args.sizes:
+            report[str(size)] = await bench_size(tools, server, size, args.runs, args.models_limit)
+            print_results(size, report[str(size)], baseline.get(str(size)))
+    finally:
+        server.stop()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=lambda value: [int(size) for size in value.split(',')], default=[10, 1000, 50000])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the fake Jira adds to every request')
+    parser.add_argument('--models-limit', type=int, default=1000, help='largest size to also parse with pydantic')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='baseline written earlier with --json')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Cold-start benchmark: how long `import tools` and `import bot` take in a fresh interpreter.
+
+    python -m benchmarks.bench_startup [--runs 10] [--jira-latency 0.3]
+    git worktree add /tmp/gbc_base HEAD~1 && python -m benchmarks.bench_startup --tree /tmp/gbc_base
+
+Every run is a new `python -X importtime -c "import <module>"` process with the environment
+pointing at a local fake Jira (no credentials, no .env needed). The fake Jira adds
+--jira-latency to each request, so a network round trip at import time shows up in the
+timings; the number of requests it received during the imports is reported too. --tree runs
+the same imports from another checkout (e.g. a git worktree of an older revision) for comparison.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from benchmarks.bench_pipeline import percentile
+from benchmarks.fake_jira import FakeJiraServer, IssueSource
+
+MODULES = ('tools', 'bot')
+
+
+def import_once(module: str, tree: str, env: Dict[str, str]) -> Tuple[float, Dict[str, int]]:
+    """Wall time of one cold import, and the -X importtime cumulative time (us) of each direct import of `module`."""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=tree, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode:
+        raise RuntimeError(f'import {module} failed:\n{result.stderr[-2000:]}')
+    children: Dict[str, int] = {}
+    # importtime prints children before their parent, indented by two spaces per level
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == module:
+                return elapsed, children
+            children = {}
+    return elapsed, children
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--jira-latency', type=float, default=0.3, help='seconds the fake Jira adds to every request')
+    parser.add_argument('--tree', default=os.getcwd(), help='checkout to import the modules from')
+    parser.add_argument('--top', type=int, default=8, help='slowest direct imports of each module to list')
+    args = parser.parse_args()
+
+    server = FakeJiraServer(IssueSource(0), latency=args.jira_latency).start()
+    state_dir = tempfile.TemporaryDirectory()
+    env = {
+        key: value for key, value in os.environ.items()
+        if not key.startswith(('JIRA_', 'TELEGRAM_', 'STORAGE_', 'SERVER_', 'METRICS_'))
+    }
+    env.update({
+        'PYTHONDONTWRITEBYTECODE': '1',
+        'JIRA_URL': server.url,
+        'JIRA_USERNAME': 'startup',
+        'JIRA_PASSWORD': 'startup',
+        'TELEGRAM_BOT_TOKEN': '0:startup',
+        'STORAGE_SQLITE_PATH': os.path.join(state_dir.name, 'startup.sqlite3'),
+    })
+    try:
+        print(f'{args.tree}, {args.runs} runs, fake Jira latency {args.jira_latency * 1000:.0f} ms')
+        print(f'{"module":<8}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}{"jira req/run":>14}')
+        for module in MODULES:
+            import_once(module, args.tree, env)  # warm the OS file cache and __pycache__ of the tree
+            server.calls.clear()
+            timings: List[float] = []
+            packages: Dict[str, List[int]] = defaultdict(list)
+            for _ in range(args.runs):
+                elapsed, imported = import_once(module, args.tree, env)
+                timings.append(elapsed)
+                for name, micros in imported.items():
+                    packages[name].append(micros)
+            requests = sum(server.calls.values()) / args.runs
+            print(f'{module:<8}{percentile(timings, 50) * 1000:>10.1f}{percentile(timings, 95) * 1000:>10.1f}'
+                  f'{max(timings) * 1000:>10.1f}{requests:>14.1f}')
+            slowest = sorted(packages.items(), key=lambda item: -percentile(item[1], 50))[:args.top]
+            print('  slowest imports (ms): ' + ', '.join(f'{name} {percentile(micros, 50) / 1000:.0f}'
+                                                    for name, micros in slowest))
+    finally:
+        server.stop()
+        state_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Local stand-in for the Jira REST API, enough for jira.JIRA and tools.py.
+
+    python -m benchmarks.fake_jira --issues 1000 --port 8765
+    python -m benchmarks.fake_jira --fixture recorded_search.json
+
+Serves /rest/api/2/serverInfo, /rest/api/2/field and /rest/api/2/search with paging
+(startAt/maxResults, capped at 1000 like Jira), `fields=` projection and the two JQL
+shapes the bot builds itself: `key in (...)` and `assignee in (...)`. Any other JQL
+matches every issue. Synthetic issues are generated page by page, so 50k issues
+do not have to fit in memory; a recorded search response can be served instead.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.fixtures import issue_number, make_issues
+
+MAX_RESULTS_CAP = 1000
+KEY_IN_RE = re.compile(r'\bkey\s+in\s*\(([^)]*)\)', re.IGNORECASE)
+ASSIGNEE_IN_RE = re.compile(r'\bassignee\s+in\s*\(([^)]*)\)', re.IGNORECASE)
+ASSIGNEE_EQ_RE = re.compile(r'\bassignee\s*=\s*"([^"]+)"', re.IGNORECASE)
+
+SERVER_INFO = {
+    'baseUrl': 'http://127.0.0.1',
+    'version': '8.20.10',
+    'versionNumbers': [8, 20, 10],
+    'deploymentType': 'Server',
+    'buildNumber': 820010,
+    'serverTitle': 'Fake Jira',
+}
+
+
+def _split_values(values: str) -> List[str]:
+    return [value.strip().strip('"').lower() for value in values.split(',') if value.strip()]
+
+
+class IssueSource:
+    """Issues served by the fake: synthetic (generated on demand) or a recorded list."""
+
+    def __init__(self, total: int = 1000, seed: int = 42, recorded: Optional[List[Dict[str, Any]]] = None):
+        self.recorded = recorded
+        self.total = len(recorded) if recorded is not None else total
+        self.seed = seed
+        self.now_ms = int(time.time() * 1000)
+        self._by_key = {issue['key'].lower(): issue for issue in recorded} if recorded is not None else None
+
+    def page(self, start: int, count: int) -> List[Dict[str, Any]]:
+        count = max(0, min(count, self.total - start))
+        if self.recorded is not None:
+            return self.recorded[start:start + count]
+        return make_issues(count, seed=self.seed, start=start, now_ms=self.now_ms)
+
+    def by_keys(self, keys: Iterable[str]) -> List[Dict[str, Any]]:
+        if self._by_key is not None:
+            return [self._by_key[key] for key in keys if key in self._by_key]
+        found = []
+        for key in keys:
+            try:
+                number = issue_number(key)
+            except ValueError:
+                continue
+            if 0 <= number < self.total:
+                issue = self.page(number, 1)[0]
+                if issue['key'].lower() == key:
+                    found.append(issue)
+        return found
+
+    def all(self) -> Iterable[Dict[str, Any]]:
+        for start in range(0, self.total, MAX_RESULTS_CAP):
+            yield from self.page(start, MAX_RESULTS_CAP)
+
+
+def project(issue: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if not fields or '*all' in fields:
+        return issue
+    projected = {name: value for name, value in issue.items() if name != 'fields'}
+    projected['fields'] = {name: value for name, value in issue['fields'].items() if name in fields}
+    return projected
+
+
+class FakeJiraHandler(BaseHTTPRequestHandler):
+    server: 'FakeJiraServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, payload: Any, status: int = 200) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.server.calls[url.path.rsplit('/', 1)[-1]] += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.outage:
+            return self._json({'errorMessages': ['Service Unavailable']}, status=503)
+        if url.path.endswith('/serverInfo'):
+            return self._json(SERVER_INFO)
+        if url.path.endswith('/field'):
+            return self._json([])
+        if url.path.endswith('/search'):
+            return self._json(self.server.search(query))
+        self._json({'errorMessages': [f'Not found: {url.path}']}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.server.outage:
+            return self._json({'errorMessages': ['Service Unavailable']}, status=503)
+        if urlparse(self.path).path.endswith('/search'):
+            query = {name: [value if isinstance(value, str) else ','.join(value) if isinstance(value, list) else str(value)]
+                     for name, value in payload.items()}
+            return self._json(self.server.search(query))
+        self._json({'errorMessages': ['Not found']}, status=404)
+
+
+class FakeJiraServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, source: IssueSource, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0):
+        super().__init__((host, port), FakeJiraHandler)
+        self.source = source
+        self.latency = latency
+        self.outage = False  # answer 503 to everything, to rehearse Jira incidents
+        self.requests = 0
+        self.calls: Counter = Counter()  # GET requests by endpoint (serverInfo, field, search)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def search(self, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        self.requests += 1
+        jql = query.get('jql', [''])[0]
+        start = int(query.get('startAt', ['0'])[0])
+        max_results = min(int(query.get('maxResults', ['50'])[0] or 50), MAX_RESULTS_CAP)
+        fields = [name for value in query.get('fields', []) for name in value.split(',')] or None
+
+        keys = KEY_IN_RE.search(jql)
+        assignees = ASSIGNEE_IN_RE.search(jql) or ASSIGNEE_EQ_RE.search(jql)
+        if keys:
+            matched = self.source.by_keys(_split_values(keys.group(1)))
+            total, issues = len(matched), matched[start:start + max_results]
+        elif assignees:
+            names = set(_split_values(assignees.group(1)))
+            matched = [issue for issue in self.source.all()
+                       if issue['fields']['assignee'] and issue['fields']['assignee']['name'].lower() in names]
+            total, issues = len(matched), matched[start:start + max_results]
+        else:
+            total, issues = self.source.total, self.source.page(start, max_results)
+        return {
+            'expand': 'schema,names',
+            'startAt': start,
+            'maxResults': max_results,
+            'total': total,
+            'issues': [project(issue, fields) for issue in issues],
+        }
+
+    def start(self) -> 'FakeJiraServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-jira', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def load_fixture(path: str) -> List[Dict[str, Any]]:
+    """A recorded search response ({"issues": [...]}) or a plain list of issues."""
+    with open(path, encoding='utf-8') as fixture:
+        data = json.load(fixture)
+    return data['issues'] if isinstance(data, dict) else data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--issues', type=int, default=1000)
+    parser.add_argument('--fixture', help='serve a recorded search response instead of synthetic issues')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    args = parser.parse_args()
+
+    recorded = load_fixture(args.fixture) if args.fixture else None
+    server = FakeJiraServer(IssueSource(args.issues, recorded=recorded), port=args.port, latency=args.latency)
+    print(f'Fake Jira with {server.source.total} issues on {server.url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
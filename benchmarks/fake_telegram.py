@@ -0,0 +1,194 @@
+"""
+Local stand-in for the Telegram Bot API, enough for python-telegram-bot polling.
+
+Point the bot at it with TELEGRAM_BASE_URL=http://127.0.0.1:<port>/bot. Updates pushed
+with push_update() are served through getUpdates (long polling) or, once the bot has called
+setWebhook, POSTed to the webhook URL with the secret token header, up to max_connections
+at a time. Every sendMessage is recorded with its arrival time. Other methods answer `true`.
+With flood_limit set,
+sendMessage answers 429 RetryAfter once more than flood_limit messages arrive within
+a second, like the real API does.
+"""
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'gbc_duty', 'username': 'gbc_duty_bot',
+            'can_join_groups': True, 'can_read_all_group_messages': False, 'supports_inline_queries': False}
+
+
+def command_update(update_id: int, chat_id: int, text: str) -> Dict[str, Any]:
+    """A private-chat message update whose text starts with a bot command."""
+    command = text.split()[0]
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': f'user{chat_id}'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f'user{chat_id}'},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}],
+        },
+    }
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    server: 'FakeTelegramServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _params(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode() if length else ''
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            return json.loads(body or '{}')
+        params = {}
+        # python-telegram-bot sends form fields with JSON-encoded non-string values
+        for name, value in parse_qsl(body):
+            try:
+                params[name] = json.loads(value)
+            except ValueError:
+                params[name] = value
+        return params
+
+    def _reply(self, payload: Dict[str, Any], status: int = 200) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the bot gave up on a long poll while shutting down
+
+    def do_POST(self):
+        method = self.path.rstrip('/').rsplit('/', 1)[-1]
+        params = self._params()
+        self.server.calls[method] += 1
+        if method == 'getMe':
+            return self._reply({'ok': True, 'result': BOT_USER})
+        if method == 'getUpdates':
+            updates = self.server.wait_updates(int(params.get('offset', 0)), int(params.get('limit', 100)),
+                                               float(params.get('timeout', 0)))
+            return self._reply({'ok': True, 'result': updates})
+        if method == 'setWebhook':
+            self.server.set_webhook(params['url'], params.get('secret_token'), int(params.get('max_connections', 40)))
+        if method == 'deleteWebhook':
+            self.server.set_webhook(None)
+        if method == 'sendMessage':
+            retry_after = self.server.record_message(int(params['chat_id']), params.get('text', ''))
+            if retry_after:
+                return self._reply({'ok': False, 'error_code': 429,
+                                    'description': f'Too Many Requests: retry after {retry_after}',
+                                    'parameters': {'retry_after': retry_after}}, status=429)
+            return self._reply({'ok': True, 'result': {
+                'message_id': self.server.calls['sendMessage'],
+                'date': int(time.time()),
+                'chat': {'id': int(params['chat_id']), 'type': 'private'},
+                'from': BOT_USER,
+                'text': params.get('text', ''),
+            }})
+        self._reply({'ok': True, 'result': True})
+
+    do_GET = do_POST
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, flood_limit: int = 0):
+        super().__init__((host, port), FakeTelegramHandler)
+        self.flood_limit = flood_limit
+        self.calls: Counter = Counter()
+        self.sent: List[Tuple[float, int, int]] = []  # (perf_counter, chat_id, text length)
+        self.rejected = 0
+        self.webhook_failures = 0
+        self._webhook: Optional[Tuple[str, Optional[str]]] = None  # (url, secret token)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._updates: List[Dict[str, Any]] = []
+        self._next_update_id = 1
+        self._recent: Deque[float] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/bot'
+
+    def set_webhook(self, url: Optional[str], secret_token: Optional[str] = None, max_connections: int = 40) -> None:
+        with self._cond:
+            self._webhook = (url, secret_token) if url else None
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool = ThreadPoolExecutor(max_connections, thread_name_prefix='fake-telegram-webhook') if url else None
+
+    def push_update(self, chat_id: int, text: str) -> int:
+        with self._cond:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            update = command_update(update_id, chat_id, text)
+            if self._webhook is not None:
+                self._pool.submit(self._post_update, *self._webhook, update)
+            else:
+                self._updates.append(update)
+                self._cond.notify_all()
+        return update_id
+
+    def _post_update(self, url: str, secret_token: Optional[str], update: Dict[str, Any]) -> None:
+        headers = {'Content-Type': 'application/json'}
+        if secret_token:
+            headers['X-Telegram-Bot-Api-Secret-Token'] = secret_token
+        request = urllib.request.Request(url, data=json.dumps(update).encode(), headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=30):
+                pass
+        except (urllib.error.URLError, OSError):
+            with self._cond:
+                self.webhook_failures += 1
+
+    def wait_updates(self, offset: int, limit: int, timeout: float) -> List[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            # confirmed updates (id < offset) are dropped, like the real API does
+            self._updates = [update for update in self._updates if update['update_id'] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            return self._updates[:limit]
+
+    def record_message(self, chat_id: int, text: str) -> int:
+        """Store a sent message; returns retry_after seconds when the flood limit is hit."""
+        now = time.perf_counter()
+        with self._cond:
+            if self.flood_limit:
+                while self._recent and now - self._recent[0] > 1:
+                    self._recent.popleft()
+                if len(self._recent) >= self.flood_limit:
+                    self.rejected += 1
+                    return 1
+                self._recent.append(now)
+            self.sent.append((now, chat_id, len(text)))
+        return 0
+
+    def start(self) -> 'FakeTelegramServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-telegram', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self.shutdown()
+        self.server_close()
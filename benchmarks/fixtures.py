@@ -0,0 +1,144 @@
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+JIRA_HOST = 'https://jira.glowbyteconsulting.com'
+PROJECTS = ['LTBEXT', 'RSBEXT', 'BOTEXT', 'GPBEXT', 'INGSEXT', 'LMREXT', 'MTSBEXT', 'AKBREXT', 'RTDMSUP']
+SERVICES = ['Anti-Fraud', 'Collection', 'Credit Scoring', 'Data Verification', 'Anti Money Laundering',
+            'Система принятия решений', 'Система управления лимитами']
+STATUSES = [('1', 'Open'), ('3', 'In Progress'), ('10001', 'Waiting for customer'), ('10002', 'Analysis')]
+USERS = [f'engineer.{i:02d}' for i in range(40)]
+HOUR_MS = 3600 * 1000
+
+
+def friendly_duration(ms: int) -> str:
+    minutes = abs(ms) // 60000
+    hours, minutes = divmod(minutes, 60)
+    sign = '-' if ms < 0 else ''
+    return f'{sign}{hours}h {minutes}m' if hours else f'{sign}{minutes}m'
+
+
+def time_info(epoch_ms: int) -> Dict[str, Any]:
+    moment = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(epoch_ms / 1000))
+    return {
+        'iso8601': f'{moment}+0300',
+        'jira': f'{moment}.000+0300',
+        'friendly': time.strftime('%d/%b/%y %I:%M %p', time.localtime(epoch_ms / 1000)),
+        'epochMillis': epoch_ms,
+    }
+
+
+def duration(ms: int) -> Dict[str, Any]:
+    return {'millis': ms, 'friendly': friendly_duration(ms)}
+
+
+def user(name: str) -> Dict[str, Any]:
+    return {
+        'self': f'{JIRA_HOST}/rest/api/2/user?username={name}',
+        'name': name,
+        'key': name,
+        'emailAddress': f'{name}@glowbyteconsulting.com',
+        'avatarUrls': {size: f'{JIRA_HOST}/secure/useravatar?size={size}&ownerId={name}'
+                       for size in ('48x48', '24x24', '16x16', '32x32')},
+        'displayName': name.replace('.', ' ').title(),
+        'active': True,
+        'timeZone': 'Europe/Moscow',
+    }
+
+
+def sla(sla_id: str, name: str, goal_ms: int, remaining_ms: Optional[int], now_ms: int,
+        paused: bool = False, within_calendar_hours: bool = True) -> Dict[str, Any]:
+    """SLA custom field as Jira Service Desk returns it; remaining_ms=None means no ongoing cycle."""
+    field = {
+        'id': sla_id,
+        'name': name,
+        '_links': {'self': f'{JIRA_HOST}/rest/servicedeskapi/request/1/sla/{sla_id}'},
+        'completedCycles': [],
+    }
+    if remaining_ms is not None:
+        elapsed = goal_ms - remaining_ms
+        field['ongoingCycle'] = {
+            'startTime': time_info(now_ms - elapsed),
+            'breachTime': time_info(now_ms + remaining_ms),
+            'breached': remaining_ms < 0,
+            'paused': paused,
+            'withinCalendarHours': within_calendar_hours,
+            'goalDuration': duration(goal_ms),
+            'elapsedTime': duration(elapsed),
+            'remainingTime': duration(remaining_ms),
+        }
+    return field
+
+
+def make_issue(number: int, rng: random.Random, now_ms: Optional[int] = None,
+               status: Optional[str] = None, assignee: Optional[str] = None) -> Dict[str, Any]:
+    """One raw issue as returned by /rest/api/2/search with the fields the bot requests."""
+    now_ms = now_ms or int(time.time() * 1000)
+    project = PROJECTS[number % len(PROJECTS)]
+    key = f'{project}-{1000 + number}'
+    status_id, status_name = next((s for s in STATUSES if s[1] == status), rng.choice(STATUSES))
+    if assignee is None and status_name != 'Open':
+        assignee = rng.choice(USERS)
+    ttfr_remaining = rng.choice([None, rng.randint(-HOUR_MS, 4 * HOUR_MS)])
+    if status_name == 'Open' and ttfr_remaining is None:
+        ttfr_remaining = rng.randint(0, 4 * HOUR_MS)
+    within = rng.random() > 0.2
+    return {
+        'expand': 'operations,versionedRepresentations,editmeta,changelog,renderedFields',
+        'id': str(100000 + number),
+        'self': f'{JIRA_HOST}/rest/api/2/issue/{100000 + number}',
+        'key': key,
+        'fields': {
+            'customfield_20672': {
+                'self': f'{JIRA_HOST}/rest/api/2/customFieldOption/{number % len(SERVICES)}',
+                'value': SERVICES[number % len(SERVICES)],
+                'id': str(30000 + number % len(SERVICES)),
+                'disabled': False,
+            },
+            'assignee': user(assignee) if assignee else None,
+            'status': {
+                'self': f'{JIRA_HOST}/rest/api/2/status/{status_id}',
+                'description': '',
+                'iconUrl': f'{JIRA_HOST}/images/icons/statuses/open.png',
+                'name': status_name,
+                'id': status_id,
+                'statusCategory': {
+                    'self': f'{JIRA_HOST}/rest/api/2/statuscategory/2',
+                    'id': 2, 'key': 'new', 'colorName': 'blue-gray', 'name': 'To Do',
+                },
+            },
+            'creator': user(f'client.{number % 17}'),
+            'issuetype': {
+                'self': f'{JIRA_HOST}/rest/api/2/issuetype/1',
+                'id': '1',
+                'description': 'A problem which impairs or prevents the functions of the product.',
+                'iconUrl': f'{JIRA_HOST}/secure/viewavatar?size=xsmall&avatarId=10303&avatarType=issuetype',
+                'name': 'Bug',
+                'subtask': False,
+                'avatarId': 10303,
+            },
+            'customfield_12671': sla('2', 'Time to first response', 4 * HOUR_MS, ttfr_remaining, now_ms,
+                                     paused=rng.random() < 0.05, within_calendar_hours=within),
+            'description': f'Steps to reproduce for {key}\n' * rng.randint(1, 5),
+            'customfield_12670': sla('1', 'Time to resolution', 40 * HOUR_MS,
+                                     rng.randint(-4 * HOUR_MS, 40 * HOUR_MS), now_ms,
+                                     within_calendar_hours=within),
+            'summary': f'[{project}] Ошибка расчёта в потоке #{number} <batch>',
+            'environment': None,
+            'duedate': None,
+        },
+    }
+
+
+def issue_rng(number: int, seed: int = 42) -> random.Random:
+    """Per-issue generator, so any issue can be rebuilt on its own (pages are generated lazily)."""
+    return random.Random(seed * 1_000_003 + number)
+
+
+def issue_number(key: str) -> int:
+    return int(key.rsplit('-', 1)[1]) - 1000
+
+
+def make_issues(count: int, seed: int = 42, start: int = 0, now_ms: Optional[int] = None) -> List[Dict[str, Any]]:
+    now_ms = now_ms or int(time.time() * 1000)
+    return [make_issue(number, issue_rng(number, seed), now_ms) for number in range(start, start + count)]
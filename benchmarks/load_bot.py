@@ -0,0 +1,238 @@
+"""
+Load test of bot.py: thousands of synthetic chats against a fake Telegram Bot API and a fake Jira.
+
+    python -m benchmarks.load_bot [--chats 1000] [--rate 50] [--duration 60] [--drain 10]
+    python -m benchmarks.load_bot --mix check=5,get=3,set=2 --jira-latency 0.2 --flood-limit 30
+    python -m benchmarks.load_bot --webhook --concurrent-updates 16
+
+The real application from bot.build_application() runs against benchmarks.fake_telegram,
+with long polling or, with --webhook, receiving updates on the embedded HTTP server;
+commands are pushed as updates at --rate per second from random chats. Reported:
+  - queue delay (update pushed -> handlers start) and handler latency per command;
+  - job-queue tick lag (scheduled run time -> job submitted), per job kind;
+  - event-loop blocking (oversleep of a 10 ms ticker);
+  - outbound throughput: sendMessage calls seen by the fake API, 429s, dispatcher backlog;
+  - process CPU time, also over an idle stretch (--idle) before the load starts.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import random
+import re
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from benchmarks.bench_pipeline import percentile
+from benchmarks.fake_jira import FakeJiraServer, IssueSource
+from benchmarks.fake_telegram import FakeTelegramServer
+from benchmarks.fixtures import PROJECTS, USERS
+
+DEFAULT_MIX = 'check=20,get=15,mycheck=10,set=15,unset=5,mywatch=10,myunwatch=3,jobs=5,zen=5,help=5,start=5,stop=2'
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    return {name: int(weight) for name, weight in (item.split('=') for item in value.split(','))}
+
+
+def command_text(command: str, rng: random.Random, issues: int) -> str:
+    if command == 'get':
+        numbers = rng.sample(range(issues), min(issues, rng.randint(1, 5)))
+        return '/get ' + ' '.join(f'{PROJECTS[n % len(PROJECTS)]}-{1000 + n}' for n in numbers)
+    if command in ('set', 'unset'):
+        return f'/{command} {rng.choice([600, 900, 1800])}'
+    if command == 'mywatch':
+        return f'/mywatch {rng.choice([60, 120, 300])} {rng.choice(USERS)}'
+    if command == 'mycheck':
+        return f'/mycheck {rng.choice(USERS)}'
+    return f'/{command}'
+
+
+def job_kind(name: str) -> str:
+    """poll_3f2a..., 42_send_updates_600 -> poll, send_updates: lag is reported per kind, not per job."""
+    return re.sub(r'^-?\d+_', '', re.sub(r'_[0-9a-f]{12}$|_\d+$', '', name or 'anonymous'))
+
+
+def summary(values: List[float]) -> str:
+    if not values:
+        return f'{"-":>8}'
+    return (f'{len(values):>8}{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}'
+            f'{percentile(values, 99) * 1000:>10.1f}{max(values) * 1000:>10.1f}')
+
+
+class LoopMonitor:
+    """Measures how late a 10 ms sleep wakes up: anything above that is time the loop was blocked."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+
+    async def run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - started - self.interval))
+
+
+async def generate(telegram: FakeTelegramServer, pushed: Dict[int, tuple], args, mix: Dict[str, int]) -> None:
+    rng = random.Random(args.seed)
+    commands, weights = list(mix), list(mix.values())
+    started = time.perf_counter()
+    for sent in range(int(args.rate * args.duration)):
+        # open-loop schedule: lateness of the generator does not slow the offered load down
+        delay = started + sent / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        command = rng.choices(commands, weights)[0]
+        chat_id = 100000 + rng.randrange(args.chats)
+        update_id = telegram.push_update(chat_id, command_text(command, rng, args.issues))
+        pushed[update_id] = (command, time.perf_counter())
+
+
+async def run(args) -> None:
+    jira_server = FakeJiraServer(IssueSource(args.issues), latency=args.jira_latency).start()
+    telegram = FakeTelegramServer(flood_limit=args.flood_limit).start()
+    state_dir = tempfile.TemporaryDirectory()
+    os.environ.update({
+        'JIRA_URL': jira_server.url,
+        'JIRA_USERNAME': USERS[0],
+        'JIRA_PASSWORD': 'load',
+        'TELEGRAM_BOT_TOKEN': '0:load',
+        'TELEGRAM_BASE_URL': telegram.base_url,
+        'STORAGE_SQLITE_PATH': os.path.join(state_dir.name, 'load.sqlite3'),
+        'TELEGRAM_CONCURRENT_UPDATES': str(args.concurrent_updates),
+        'TELEGRAM_WEBHOOK_ENABLED': str(args.webhook).lower(),
+        'TELEGRAM_WEBHOOK_SECRET': 'load',
+        'SERVER_PORT': '0',
+    })
+    import bot  # after the environment points at the fakes
+    from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_SUBMITTED
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    logging.basicConfig(level=args.log_level)
+
+    pushed: Dict[int, tuple] = {}
+    started_at: Dict[int, float] = {}
+    queue_delay: Dict[str, List[float]] = defaultdict(list)
+    handler_latency: Dict[str, List[float]] = defaultdict(list)
+    tick_lag: Dict[str, List[float]] = defaultdict(list)
+
+    async def before(update, context):
+        started_at[update.update_id] = time.perf_counter()
+
+    async def after(update, context):
+        command, pushed_at = pushed.get(update.update_id, (None, None))
+        if command is None:
+            return
+        started = started_at.pop(update.update_id)
+        queue_delay[command].append(started - pushed_at)
+        handler_latency[command].append(time.perf_counter() - started)
+
+    job_names: Dict[str, str] = {}
+
+    def on_added(event):
+        job_names[event.job_id] = application.job_queue.scheduler.get_job(event.job_id).name
+
+    def on_submitted(event):
+        now = datetime.now(timezone.utc)
+        for scheduled in event.scheduled_run_times:
+            tick_lag[job_kind(job_names.get(event.job_id))].append(max(0.0, (now - scheduled).total_seconds()))
+
+    application = bot.get_application()
+    application.add_handler(TypeHandler(Update, before), group=-1)
+    application.add_handler(TypeHandler(Update, after), group=1)
+    application.job_queue.scheduler.add_listener(on_added, EVENT_JOB_ADDED)
+    application.job_queue.scheduler.add_listener(on_submitted, EVENT_JOB_SUBMITTED)
+
+    monitor = LoopMonitor()
+    monitor_task = asyncio.create_task(monitor.run())
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):  # keep stray prints of the bot out of the report
+        await application.initialize()
+        await application.post_init(application)
+        if args.webhook:
+            url = f'http://127.0.0.1:{bot.web_server.port}{bot.settings.telegram.telegram_webhook_path}'
+            await application.bot.set_webhook(url, secret_token=bot.telegram_webhook_secret)
+        else:
+            await application.updater.start_polling(poll_interval=0, timeout=1)
+        await application.start()
+        cpu_started = time.process_time()
+        await asyncio.sleep(args.idle)
+        idle_cpu = time.process_time() - cpu_started
+        load_started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            await generate(telegram, pushed, args, parse_mix(args.mix))
+            await asyncio.sleep(args.drain)
+        finally:
+            load_elapsed = time.perf_counter() - load_started
+            load_cpu = time.process_time() - cpu_started
+            backlog = bot.dispatcher.pending
+            unhandled = len(pushed) - sum(map(len, handler_latency.values()))
+            if application.updater:
+                await application.updater.stop()
+            await application.stop()
+            await application.post_shutdown(application)
+            await application.shutdown()
+            monitor_task.cancel()
+            telegram.stop()
+            jira_server.stop()
+            state_dir.cleanup()
+
+    mode = 'webhook' if args.webhook else 'long polling'
+    print(f'\n{len(pushed)} updates from {args.chats} chats at {args.rate}/s over {args.duration}s '
+          f'(+{args.drain}s drain), {args.issues} issues in Jira, {unhandled} not handled by the end; '
+          f'{mode}, {args.concurrent_updates} concurrent updates')
+
+    header = f'{"count":>8}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}'
+    print(f'\n{"command":<14}{"queue delay":>48}  |  handler latency')
+    print(f'{"":<14}{header}  |  {header}')
+    for command in sorted(handler_latency, key=lambda name: -len(handler_latency[name])):
+        print(f'{command:<14}{summary(queue_delay[command])}  |  {summary(handler_latency[command])}')
+
+    print(f'\n{"job tick lag":<14}{header}')
+    for kind, lags in sorted(tick_lag.items()):
+        print(f'{kind:<14}{summary(lags)}')
+
+    blocked = [lag for lag in monitor.lags if lag > 0.05]
+    print(f'\nevent loop: {summary(monitor.lags)}  ({len(blocked)} stalls > 50 ms, {sum(blocked):.1f}s blocked)')
+
+    sent_times = [sent_at for sent_at, _, _ in telegram.sent]
+    per_second = defaultdict(int)
+    for sent_at in sent_times:
+        per_second[int(sent_at - load_started)] += 1
+    print(f'outbound: {len(sent_times)} messages to {len({chat for _, chat, _ in telegram.sent})} chats, '
+          f'{len(sent_times) / load_elapsed:.1f}/s average, {max(per_second.values(), default=0)}/s peak, '
+          f'{telegram.rejected} rejected with 429, {backlog} still queued in the dispatcher')
+    if args.idle:
+        print(f'cpu: idle {idle_cpu / args.idle * 100:.1f}% over {args.idle:.0f}s, '
+              f'load {load_cpu / load_elapsed * 100:.1f}% ({load_cpu:.1f}s)')
+    else:
+        print(f'cpu: load {load_cpu / load_elapsed * 100:.1f}% ({load_cpu:.1f}s)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=50.0, help='updates per second')
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds of load')
+    parser.add_argument('--drain', type=float, default=10.0, help='seconds to keep running after the load')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='command weights, e.g. check=5,get=3')
+    parser.add_argument('--issues', type=int, default=200, help='issues in the fake Jira')
+    parser.add_argument('--jira-latency', type=float, default=0.05, help='seconds per fake Jira request')
+    parser.add_argument('--flood-limit', type=int, default=30, help='sendMessage per second before 429, 0 = off')
+    parser.add_argument('--webhook', action='store_true', help='receive updates by webhook instead of long polling')
+    parser.add_argument('--concurrent-updates', type=int, default=8, help='updates handled at the same time')
+    parser.add_argument('--idle', type=float, default=5.0, help='seconds without load to measure idle CPU')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--log-level', default='WARNING')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
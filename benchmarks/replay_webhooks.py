@@ -0,0 +1,106 @@
+"""
+Replay Jira webhook payloads into the bot's receiver (JIRA_WEBHOOK_ENABLED=true).
+
+    python -m benchmarks.replay_webhooks --file recorded.jsonl --url http://127.0.0.1:8080/jira/webhook
+    python -m benchmarks.replay_webhooks --synthetic 500 --rate 50 --secret s3cret
+
+--file takes a JSON list or JSON lines of webhook bodies as Jira sent them (e.g. captured
+with a request bin). --synthetic builds issue_created/issue_updated events from the
+benchmark fixtures; pair it with benchmarks.fake_jira serving the same issues so that the
+bot's follow-up queries see a consistent Jira. Reports status codes and delivery latency.
+"""
+import argparse
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+from benchmarks.bench_pipeline import percentile
+from benchmarks.fixtures import STATUSES, USERS, issue_rng, make_issue, user
+
+
+def load_payloads(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding='utf-8') as source:
+        text = source.read().strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def synthetic_payloads(count: int, issues: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """Updates of existing issues (status or assignee changes) with a share of newly created ones."""
+    rng = random.Random(seed)
+    now_ms = int(time.time() * 1000)
+    created = issues
+    for _ in range(count):
+        if rng.random() < 0.2:
+            number, event, status = created, 'jira:issue_created', 'Open'
+            created += 1
+        else:
+            number, event, status = rng.randrange(issues), 'jira:issue_updated', rng.choice(STATUSES)[1]
+        issue = make_issue(number, issue_rng(number, seed), now_ms=now_ms, status=status,
+                           assignee=None if status == 'Open' else rng.choice(USERS))
+        yield {
+            'timestamp': now_ms,
+            'webhookEvent': event,
+            'issue_event_type_name': 'issue_created' if event == 'jira:issue_created' else 'issue_generic',
+            'user': user(rng.choice(USERS)),
+            'issue': issue,
+            'changelog': {'id': str(number), 'items': [{'field': 'status', 'toString': status}]},
+        }
+
+
+def deliver(url: str, payload: Dict[str, Any]) -> Tuple[int, float]:
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8080/jira/webhook')
+    parser.add_argument('--secret', help='appended as ?secret=, like a Jira Server webhook URL')
+    parser.add_argument('--file', help='recorded webhook bodies (JSON list or JSON lines)')
+    parser.add_argument('--synthetic', type=int, default=0, help='number of generated events')
+    parser.add_argument('--issues', type=int, default=1000, help='issues the fake Jira serves (for --synthetic)')
+    parser.add_argument('--rate', type=float, default=0, help='events per second, 0 = as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.file) if args.file else list(synthetic_payloads(args.synthetic, args.issues))
+    url = f'{args.url}?secret={args.secret}' if args.secret else args.url
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        futures = []
+        for sent, payload in enumerate(payloads):
+            if args.rate:
+                delay = started + sent / args.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(pool.submit(deliver, url, payload))
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(status for status, _ in results)
+    latencies = [latency for _, latency in results]
+    print(f'{len(results)} events in {elapsed:.1f}s ({len(results) / elapsed:.0f}/s), statuses: {dict(statuses)}')
+    if latencies:
+        print(f'latency ms: p50 {percentile(latencies, 50) * 1000:.1f}, p95 {percentile(latencies, 95) * 1000:.1f}, '
+              f'max {max(latencies) * 1000:.1f}')
+
+
+if __name__ == '__main__':
+    main()
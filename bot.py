@@ -1,30 +1,595 @@
+import asyncio
+import hmac
+import html
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Optional
+import re
+import secrets
+import signal
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+from typing import Dict, List, Optional, Set, Tuple
 
+from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_REMOVED, EVENT_JOB_SUBMITTED, JobEvent
 from telegram import Update
 from telegram.constants import ParseMode
-from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram.ext import Application, CommandHandler, ContextTypes, Job, JobQueue
 
+from broadcast import BroadcastTick
+from cluster import ROLES, LeaderElection, SharedSnapshots, snapshot_record
 from config import settings
-from tools import etl, get_my_issues, check_personal_track_changes, format_my_issue_message, check_sla_warning
+from deadlines import ttfr_breach_millis
+from issue_index import TEAM_ROUTES, IssueIndex, compiled_filter, parse_check_filters
+from lookup import parse_issue_keys
+from dispatcher import OutboundDispatcher
+from metrics import JOB_LAG_SECONDS, NOTIFICATIONS, registry as metrics_registry
+from models import JiraIssue
+from render import pack_messages, render_messages
+from snapshot import SnapshotDelta, split_order_by
+from storage import StateStore, create_backend
+from subscriptions import PollGroup, PollRegistry, Subscription, Watcher, WatchRegistry, normalize_jql
+from tools import (etl, fetch_tracks, check_issue_keys, render_tracks, get_my_issues, get_issues_by_assignee,
+                   detect_personal_track_changes, format_my_issue_message, format_deadline_message, check_sla_warning,
+                   stale_notice, parse_jira_issues, is_my_active_issue, issue_lookup, track_cache)
+from webhooks import JiraEvent, JiraWebhookReceiver
+from webserver import Request, Response, WebServer
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-logging.debug(f"Telegram bot token: {settings.telegram.telegram_bot_token}")
+logger.debug(f"Telegram bot token: {settings.telegram.telegram_bot_token}")
 
 user_chat_ids = set()
 
-# Personal track monitoring state: chat_id -> None (not yet init) | {issue_key -> {status, sla_warned}}
-my_watch_state: Dict[int, Optional[Dict]] = {}
+ADAPTIVE_BOUNDS = (
+    (settings.telegram.adaptive_min_interval, settings.telegram.adaptive_max_interval)
+    if settings.telegram.adaptive_polling else None
+)
 
-async def alarm(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send the alarm message."""
-    job = context.job
-    text = etl(mode='broadcast')
-    await context.bot.send_message(chat_id=job.chat_id, text=text)
+JIRA_USERNAME_RE = re.compile(r'^[\w.@-]+$')
+
+# Personal track monitoring: chat_id -> Watcher(assignee, interval, state={issue_key -> {status, sla_warned}})
+watch_registry = WatchRegistry(adaptive_bounds=ADAPTIVE_BOUNDS)
+
+# All job-originated messages go through one rate-limited queue
+dispatcher = OutboundDispatcher(
+    concurrency=settings.telegram.outbound_concurrency,
+    global_rate=settings.telegram.outbound_global_rate,
+    chat_rate=settings.telegram.outbound_chat_rate,
+    group_rate=settings.telegram.outbound_group_rate,
+)
+
+# Subscriptions and watch snapshots survive restarts; writes are batched and flushed in the background
+state_store = StateStore(create_backend(
+    settings.storage.storage_backend,
+    sqlite_path=settings.storage.storage_sqlite_path,
+    redis_url=settings.storage.storage_redis_url,
+))
+
+# CLUSTER_ROLE=all: this process does everything. Otherwise one elected `poller` polls Jira and schedules
+# SLA warnings, `worker`s serve commands (Telegram webhook behind a load balancer) from the shared state.
+CLUSTER_ROLE = settings.cluster.cluster_role
+if CLUSTER_ROLE not in ROLES:
+    raise ValueError(f'CLUSTER_ROLE must be one of {ROLES}, got {CLUSTER_ROLE!r}')
+election = LeaderElection(
+    state_store.backend, settings.cluster.cluster_lease_ttl,
+    on_elected=lambda job_queue: become_poller(job_queue),
+    on_deposed=lambda job_queue: stop_polling(job_queue),
+) if CLUSTER_ROLE == 'poller' else None
+shared_snapshots = SharedSnapshots(state_store.backend)
+published_at: Dict[str, float] = {}  # poller: jql -> when the group's issues were last shared
+
+
+def owns_polling() -> bool:
+    """Whether this process runs the Jira poll, SLA deadline and mywatch jobs."""
+    return election.is_leader if election else CLUSTER_ROLE == 'all'
+
+
+# /set subscriptions grouped by JQL: one Jira query per group tick, fanned out to all subscribers
+poll_registry = PollRegistry(
+    sla_warning_threshold_ms=settings.telegram.sla_warning_threshold_ms,
+    incremental=settings.jira.incremental_polling,
+    reconcile_every=settings.jira.reconcile_every,
+    full_refresh_every=settings.jira.full_refresh_every,
+    adaptive_bounds=ADAPTIVE_BOUNDS,
+    reconcile_interval=settings.jira.webhook_reconcile_interval if settings.jira.webhook_enabled else None,
+)
+
+# Prometheus metrics; every instrumented call is a no-op while METRICS_ENABLED is off
+metrics_registry.enabled = settings.server.metrics_enabled
+metrics_registry.gauge('gbc_telegram_outbound_pending', 'Messages waiting in the outbound dispatcher',
+                       collect=lambda: dispatcher.pending)
+
+# Service HTTP endpoints (/metrics), started only if something is routed
+web_server = WebServer(settings.server.server_host, settings.server.server_port)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response.text(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+if metrics_registry.enabled:
+    web_server.route('GET', '/metrics', metrics_endpoint)
+
+def job_metric_label(name: str) -> str:
+    """poll_3f2a9c0d1b7e_sla -> poll_sla: one label per kind of job, not per JQL."""
+    return re.sub(r'_[0-9a-f]{12}', '', name or 'job')
+
+
+def observe_job_lag(job_queue: JobQueue) -> None:
+    """Record how late each job starts compared to its scheduled time."""
+    labels: Dict[str, str] = {}
+    # one-shot jobs are removed before their submission event is dispatched, keep the last few labels around
+    removed: OrderedDict = OrderedDict()
+
+    def listener(event: JobEvent) -> None:
+        if event.code == EVENT_JOB_ADDED:
+            labels[event.job_id] = job_metric_label(job_queue.scheduler.get_job(event.job_id).name)
+        elif event.code == EVENT_JOB_REMOVED:
+            removed[event.job_id] = labels.pop(event.job_id, 'job')
+            if len(removed) > 256:
+                removed.popitem(last=False)
+        else:
+            label = labels.get(event.job_id) or removed.pop(event.job_id, 'job')
+            now = datetime.now(timezone.utc)
+            for run_time in event.scheduled_run_times:
+                JOB_LAG_SECONDS.observe((now - run_time).total_seconds(), job=label)
+
+    job_queue.scheduler.add_listener(listener, EVENT_JOB_ADDED | EVENT_JOB_REMOVED | EVENT_JOB_SUBMITTED)
+
+
+def persist_subscription(sub: Subscription, group: PollGroup) -> None:
+    """Written by the commands only. Per-tick state lives apart, so a poller never rewrites (revives) this record."""
+    record = {'chat_id': sub.chat_id, 'interval': sub.interval, 'jql': group.jql}
+    if sub.delta:
+        record['delta'] = True
+    if sub.filters:
+        record['filters'] = sub.filters
+    state_store.put('subscriptions', sub.name, record)
+    persist_delivery(sub)
+
+
+def persist_delivery(sub: Subscription) -> None:
+    """Delta mode state: what the chat was last sent, tagged with the filters it was computed for."""
+    if sub.delta:
+        state_store.put('deliveries', sub.name, {'filters': sub.filters, 'sent': sub.sent, 'digest_at': sub.digest_at})
+
+
+def forget_subscription(sub: Subscription) -> None:
+    state_store.delete('subscriptions', sub.name)
+    state_store.delete('deliveries', sub.name)
+
+
+def persist_watcher(watcher: Watcher) -> None:
+    """Written by the commands only, like persist_subscription."""
+    state_store.put('watchers', watcher.chat_id, {'assignee': watcher.assignee, 'interval': watcher.interval})
+    persist_watch_state(watcher)
+
+
+def persist_watch_state(watcher: Watcher) -> None:
+    """Last seen statuses of the watcher's tracks, tagged with the assignee they belong to."""
+    state_store.put('watch_states', watcher.chat_id, {'assignee': watcher.assignee, 'state': watcher.state})
+
+
+def forget_watcher(chat_id: int) -> None:
+    state_store.delete('watchers', chat_id)
+    state_store.delete('watch_states', chat_id)
+
+
+async def restore_state(application: Application) -> None:
+    """post_init hook: start the outbound dispatcher and HTTP endpoints, bulk-restore subscriptions and watches."""
+    await dispatcher.start(application.bot)
+    if settings.jira.webhook_enabled:
+        await webhook_receiver.start()
+    if web_server.has_routes:
+        await web_server.start()
+    if metrics_registry.enabled:
+        observe_job_lag(application.job_queue)
+    subscriptions, watchers = await sync_registries(application.job_queue)
+    if owns_polling() and watchers:
+        application.job_queue.run_once(callback=mywatch_job, when=0)
+    if CLUSTER_ROLE != 'all':
+        application.job_queue.run_repeating(
+            callback=sync_registries_job,
+            interval=timedelta(seconds=settings.cluster.cluster_sync_interval),
+            name='sync_registries',
+        )
+    if election:
+        application.job_queue.run_repeating(
+            callback=election_job,
+            interval=timedelta(seconds=settings.cluster.cluster_lease_renew),
+            first=0,
+            name='leader_election',
+        )
+    application.job_queue.run_repeating(
+        callback=flush_state_job,
+        interval=timedelta(seconds=settings.storage.storage_flush_interval),
+        name='flush_state',
+    )
+    logger.info(f"Restored {subscriptions} subscriptions in {len(poll_registry.groups)} poll groups "
+                f"and {watchers} personal watches ({CLUSTER_ROLE} role)")
+
+
+async def sync_registries(job_queue: JobQueue, take_over: bool = False) -> Tuple[int, int]:
+    """
+    Bring the subscription and watch registries in line with the state store: everything on start,
+    then (in a cluster) what other processes changed. Delta and watch states are taken from the store
+    unless this process is the one writing them. Returns how many subscriptions and watches there are.
+    """
+    mirror = take_over or not owns_polling()
+    # per-tick state first: a row whose subscription is gone by the second read is an orphan to drop
+    deliveries = await asyncio.to_thread(state_store.load, 'deliveries')
+    subscriptions = await asyncio.to_thread(state_store.load, 'subscriptions')
+    if owns_polling():
+        for name in deliveries.keys() - subscriptions.keys():
+            state_store.delete('deliveries', name)
+
+    def delivery(name: str, record: Dict) -> Tuple[Optional[Dict[str, str]], float]:
+        row = deliveries.get(name)
+        if row is None or row.get('filters', '') != record.get('filters', ''):
+            row = record  # records written before delivery state had its own namespace
+        return row.get('sent'), row.get('digest_at', 0.0)
+
+    current = {sub.name: (group, sub) for group in poll_registry.groups.values() for sub in group.subscribers.values()}
+    for name, (group, sub) in current.items():
+        record = subscriptions.get(name)
+        if record is not None and (record['jql'], record['interval'], record.get('delta', False),
+                                   record.get('filters', '')) == (group.jql, sub.interval, sub.delta, sub.filters):
+            if mirror:
+                sub.sent, sub.digest_at = delivery(name, record)
+            del subscriptions[name]
+            continue
+        reschedule_groups(poll_registry.unsubscribe(sub.chat_id, sub.interval), job_queue)
+    added = {}
+    for record in subscriptions.values():
+        group, sub = poll_registry.subscribe(record['chat_id'], record['interval'], record['jql'],
+                                             record.get('delta', False), record.get('filters', ''))
+        sub.sent, sub.digest_at = delivery(sub.name, record)
+        added[group.jql] = group
+    for group in added.values():
+        schedule_poll_job(group, job_queue)
+
+    states = await asyncio.to_thread(state_store.load, 'watch_states')
+    watchers = await asyncio.to_thread(state_store.load, 'watchers')
+    if owns_polling():
+        for chat_id in states.keys() - watchers.keys():
+            state_store.delete('watch_states', chat_id)
+    for chat_id in list(watch_registry.watchers):
+        if str(chat_id) not in watchers:
+            watch_registry.unwatch(chat_id)
+    for chat_id, record in watchers.items():
+        watcher = watch_registry.watchers.get(int(chat_id))
+        if watcher is None or (watcher.assignee, watcher.interval) != (record['assignee'], record['interval']):
+            watcher = watch_registry.watch(int(chat_id), record['assignee'], record['interval'])
+        if watcher.state is None or mirror:
+            row = states.get(chat_id)
+            if row is None or row['assignee'] != watcher.assignee:
+                row = record  # written before watch states had their own namespace, or for another assignee
+            watcher.state = row.get('state')  # compare against the last known state on the first tick
+    schedule_mywatch_job(job_queue)
+    return sum(len(group.subscribers) for group in poll_registry.groups.values()), len(watch_registry.watchers)
+
+
+async def sync_registries_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    try:
+        await sync_registries(context.job_queue)
+    except Exception as e:
+        logger.error(f"Failed to sync subscriptions from the state store: {e}")
+
+
+async def election_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await election.tick(context.job_queue)
+
+
+async def become_poller(job_queue: JobQueue) -> None:
+    """Elected: take over the registries as last written by the previous poller and start polling."""
+    await sync_registries(job_queue, take_over=True)
+    for group in poll_registry.groups.values():
+        schedule_poll_job(group, job_queue)
+    if watch_registry.watchers:
+        job_queue.run_once(callback=mywatch_job, when=0)
+
+
+async def stop_polling(job_queue: JobQueue) -> None:
+    """Deposed: another process polls now, drop our poll, SLA deadline and mywatch jobs."""
+    names = {watch_registry.job_name}
+    for group in poll_registry.groups.values():
+        names.update((group.job_name, group.deadline_job_name))
+        group.snapshot.loaded = False  # stale by the time this process may be elected again
+    for job in job_queue.jobs():
+        if job.name in names:
+            job.schedule_removal()
+
+
+def publish_snapshot(group: PollGroup, changed: bool) -> None:
+    """
+    Poller: share the group's tracks with the workers; written with the next state flush. Without a change they
+    are still re-shared once the copy gets older than max_age, so the SLA times workers show keep up.
+    """
+    if CLUSTER_ROLE != 'poller':
+        return
+    if changed or time.time() - published_at.get(group.jql, 0) >= group.max_age:
+        published_at[group.jql] = time.time()
+        state_store.put('snapshots', group.jql, snapshot_record(group.tracks, published_at[group.jql]))
+    state_store.put('snapshot_meta', group.jql, {
+        'published_at': published_at[group.jql], 'fetched_at': group.snapshot.fetched_at, 'max_age': group.max_age})
+
+
+async def share_state() -> None:
+    """In a cluster, write a command's changes out right away, so the poller and other workers see them."""
+    if CLUSTER_ROLE != 'all':
+        await state_store.flush()
+
+
+async def flush_state_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await state_store.flush()
+
+
+async def shutdown_state(application: Application) -> None:
+    """post_shutdown hook: deliver and write out everything still buffered."""
+    await web_server.stop()
+    await webhook_receiver.stop()
+    await dispatcher.stop()
+    await state_store.flush()
+    if election:
+        await election.resign()  # after the flush: the next poller starts from our last state
+    state_store.backend.close()
+
+
+async def poll_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Poll Jira for the group's JQL if its poll interval is up, and send the snapshot to every due subscriber."""
+    group = poll_registry.groups.get(context.job.data)
+    if group is None:
+        context.job.schedule_removal()
+        return
+    delta = SnapshotDelta()
+    if group.needs_poll():
+        try:
+            delta = await group.snapshot.refresh(fetch_tracks, check_issue_keys)
+        except Exception as e:
+            logger.error(f"{group.job_name} failed to poll Jira: {e}")
+            return
+        group.deadlines.sync(group.tracks)
+        schedule_deadline_job(group, context.job_queue)
+        publish_snapshot(group, bool(delta))
+        if group.adaptive:
+            new_open = 0
+            if group.snapshot.polls > 1:
+                new_open = sum(group.snapshot.issues[key].fields.status.name.lower() == 'open' for key in delta.added)
+            group.adaptive.update(group.tracks, new_open)
+            schedule_poll_job(group, context.job_queue)
+
+    due = group.due_subscribers(time.monotonic())
+    if not due:
+        return
+    now_ms = int(time.time() * 1000)
+    ticks: Dict[str, BroadcastTick] = {}  # one per distinct filter among the due chats
+    sent = 0
+    for sub in due:
+        tick = ticks.get(sub.filters)
+        if tick is None:
+            tick = ticks[sub.filters] = BroadcastTick(filter_tracks(group.tracks, sub.filters, now_ms),
+                                                      settings.telegram.sla_warning_threshold_ms)
+        messages = delta_broadcast(sub, group, tick) if sub.delta else tick.full_messages
+        for text in messages or ():
+            dispatcher.send(sub.chat_id, text)
+        sent += bool(messages)
+    logger.info(f"{group.job_name}: {len(group.tracks)} tracks in {len(ticks)} slices, sent to {sent} of {len(due)} "
+                f"due chats ({len(group.subscribers)} subscribed)")
+    NOTIFICATIONS.observe(sent, job='poll')
+
+
+def filter_tracks(tracks: List[JiraIssue], filters: str, now_ms: int) -> List[JiraIssue]:
+    """A subscriber's slice of the group's tracks."""
+    if not filters:
+        return tracks
+    _, matches = compiled_filter(filters)
+    return [track for track in tracks if matches(track, now_ms)]
+
+
+def delta_broadcast(sub: Subscription, group: PollGroup, tick: BroadcastTick) -> Optional[List[str]]:
+    """
+    Delta mode: only what was added, changed or resolved since the chat's last broadcast, None if nothing.
+    The first broadcast and one every BROADCAST_DIGEST_INTERVAL seconds is the full list.
+    """
+    now = time.time()
+    digest_interval = settings.telegram.broadcast_digest_interval
+    if sub.sent is None or (digest_interval and now - sub.digest_at >= digest_interval):
+        messages = tick.full_messages
+        sub.digest_at = now
+    else:
+        messages = tick.delta_messages(sub.sent)
+    if messages is not None:
+        sub.sent = tick.fingerprints
+        persist_delivery(sub)
+    return messages
+
+
+async def sla_deadline_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """One-shot job: warn the group's subscribers about TTFR cycles reaching the warning threshold."""
+    group = poll_registry.groups.get(context.job.data)
+    if group is None:
+        return
+    now_ms = int(time.time() * 1000)
+    sent = 0
+    for key in group.deadlines.pop_due(now_ms):
+        issue = group.snapshot.issues.get(key)
+        if issue is None:
+            continue
+        text = format_deadline_message(issue, ttfr_breach_millis(issue) - now_ms)
+        for chat_id in group.chat_ids_for(issue, now_ms):
+            dispatcher.send(chat_id, text, parse_mode=ParseMode.HTML)
+            sent += 1
+    NOTIFICATIONS.observe(sent, job='sla_deadline')
+    schedule_deadline_job(group, context.job_queue)
+
+
+def schedule_deadline_job(group: PollGroup, job_queue: JobQueue) -> None:
+    """Keep exactly one run_once job armed for the group's nearest SLA warning."""
+    if not owns_polling():
+        return
+    fire_ms = group.deadlines.next_fire_ms()
+    fire_at = datetime.fromtimestamp(max(fire_ms / 1000, time.time()), tz=timezone.utc) if fire_ms else None
+    for job in job_queue.get_jobs_by_name(group.deadline_job_name):
+        if fire_at and job.next_t and abs((job.next_t - fire_at).total_seconds()) < 1:
+            return
+        job.schedule_removal()
+    if fire_at is None:
+        return
+    job_queue.run_once(
+        callback=sla_deadline_job,
+        when=fire_at,
+        name=group.deadline_job_name,
+        data=group.jql,
+    )
+
+
+def schedule_poll_job(group: PollGroup, job_queue: JobQueue) -> None:
+    """(Re)create the group's poll job so that it ticks at the group's current tick."""
+    if not owns_polling():
+        return
+    current_jobs = job_queue.get_jobs_by_name(group.job_name)
+    if current_jobs:
+        for job in current_jobs[1:]:
+            job.schedule_removal()
+        reschedule_repeating(current_jobs[0], group.tick, job_queue)
+        return
+    job_queue.run_repeating(
+        callback=poll_job,
+        interval=timedelta(seconds=group.tick),
+        name=group.job_name,
+        data=group.jql,
+    )
+
+
+def reschedule_repeating(job: Job, interval: int, job_queue: JobQueue) -> None:
+    """Re-create a repeating job with a new interval, keeping its callback, name, chat and data."""
+    if job.job.trigger.interval.total_seconds() == interval:
+        return
+    job.schedule_removal()
+    job_queue.run_repeating(
+        callback=job.callback,
+        interval=timedelta(seconds=interval),
+        first=interval,
+        chat_id=job.chat_id,
+        name=job.name,
+        data=job.data,
+    )
+
+
+def unsubscribe_chat(chat_id: int, context: ContextTypes.DEFAULT_TYPE, interval: Optional[int] = None) -> bool:
+    """Drop chat's /set subscriptions and reschedule or remove the affected poll jobs."""
+    removed = poll_registry.unsubscribe(chat_id, interval)
+    for group, sub in removed:
+        forget_subscription(sub)
+    reschedule_groups(removed, context.job_queue)
+    return bool(removed)
+
+
+def reschedule_groups(removed: List[Tuple[PollGroup, Subscription]], job_queue: JobQueue) -> None:
+    """After unsubscribing: retune the poll jobs of groups that still have subscribers, drop the others'."""
+    for group, _ in removed:
+        if group.subscribers:
+            schedule_poll_job(group, job_queue)
+            continue
+        for job in job_queue.get_jobs_by_name(group.job_name) + job_queue.get_jobs_by_name(group.deadline_job_name):
+            job.schedule_removal()
+
+
+WEBHOOK_KEYS_PER_QUERY = 100
+
+
+async def apply_jira_events(events: List[JiraEvent]) -> None:
+    """Webhook batch: update poll snapshots and personal watch states, push the resulting notifications."""
+    if not owns_polling():
+        logger.debug(f"Ignoring {len(events)} Jira events, another process polls (point the webhook at the pollers)")
+        return
+    deleted = {event.key for event in events if event.kind == 'deleted'}
+    issues, undecoded = {}, set()
+    for event in events:
+        if event.kind == 'deleted':
+            continue
+        try:
+            issues[event.key] = parse_jira_issues([event.issue])[0]
+        except Exception as e:
+            logger.warning(f"Webhook payload of {event.key} could not be decoded, fetching it instead: {e}")
+            undecoded.add(event.key)
+    if undecoded:
+        issues.update((track.key, track) for track in await fetch_tracks(f'key in ({", ".join(sorted(undecoded))})'))
+
+    issue_lookup.refresh(issues.values(), deleted)
+    await apply_pushed_to_groups(issues, deleted, get_application().job_queue)
+    apply_pushed_to_watchers(issues, deleted)
+
+
+async def apply_pushed_to_groups(issues: Dict[str, JiraIssue], deleted: Set[str], job_queue: JobQueue) -> None:
+    """Ask Jira which pushed issues match each group's filter and announce the ones that just entered it."""
+    keys = sorted(issues)
+    for group in list(poll_registry.groups.values()):
+        if not group.snapshot.loaded:
+            continue  # the first poll loads everything anyway
+        base, _ = split_order_by(group.jql)
+        matching = set()
+        for start in range(0, len(keys), WEBHOOK_KEYS_PER_QUERY):
+            chunk = keys[start:start + WEBHOOK_KEYS_PER_QUERY]
+            matching |= await check_issue_keys(f'key in ({", ".join(chunk)}) AND ({base})')
+        delta = group.snapshot.apply_pushed(
+            [issues[key] for key in keys if key in matching],
+            deleted | (set(keys) - matching),
+        )
+        if not delta:
+            continue
+        group.deadlines.sync(group.tracks)
+        schedule_deadline_job(group, job_queue)
+        publish_snapshot(group, True)
+        new_tracks = [group.snapshot.issues[key] for key in sorted(delta.added)
+                      if ttfr_breach_millis(group.snapshot.issues[key]) is not None]
+        now_ms = int(time.time() * 1000)
+        per_chat: Dict[int, List[JiraIssue]] = {}
+        for track in new_tracks:
+            for chat_id in group.chat_ids_for(track, now_ms):
+                per_chat.setdefault(chat_id, []).append(track)
+        rendered: Dict[tuple, List[str]] = {}  # chats with the same slice share the messages
+        for chat_id, tracks in per_chat.items():
+            slice_key = tuple(track.key for track in tracks)
+            if slice_key not in rendered:
+                rendered[slice_key] = render_messages(tracks)
+            for text in rendered[slice_key]:
+                dispatcher.send(chat_id, text)
+        NOTIFICATIONS.observe(len(per_chat), job='webhook')
+
+
+def apply_pushed_to_watchers(issues: Dict[str, JiraIssue], deleted: Set[str]) -> None:
+    """Same status-change and SLA notifications as mywatch_job, for the pushed issues only."""
+    touched, watches = [], []
+    for watcher in watch_registry.watchers.values():
+        if watcher.state is None:
+            continue  # not initialised yet, the next mywatch tick will do it
+        changed = False
+        for key in deleted:
+            changed |= watcher.state.pop(key, None) is not None
+        mine = []
+        for key, issue in issues.items():
+            if is_my_active_issue(issue, watcher.assignee):
+                mine.append(issue)
+            else:
+                changed |= watcher.state.pop(key, None) is not None
+        if mine:
+            touched.append(watcher)
+            watches.append((mine, {issue.key: watcher.state[issue.key] for issue in mine if issue.key in watcher.state}))
+        elif changed:
+            persist_watch_state(watcher)
+    results = detect_personal_track_changes(watches, sla_warn_ms=settings.telegram.sla_warning_threshold_ms)
+    for watcher, (notifications, new_state) in zip(touched, results):
+        watcher.state.update(new_state)
+        persist_watch_state(watcher)
+        for msg in notifications:
+            dispatcher.send(watcher.chat_id, msg, parse_mode=ParseMode.HTML)
+
+
+webhook_receiver = JiraWebhookReceiver(apply_jira_events, secret=settings.jira.webhook_secret)
+if settings.jira.webhook_enabled:
+    web_server.route('POST', settings.jira.webhook_path, webhook_receiver.endpoint)
 
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -37,26 +602,29 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /help command"""
     msg = """
-/set <seconds> - подписаться на обновления о новых треках
+/set <seconds> [delta] [фильтры] - подписаться на обновления о новых треках (delta - присылать только изменения, фильтры как у /check или team=<тимлид>)
 /unset <seconds> - отписаться от уведомлений каждые <seconds>
 /stop - отписаться от всех уведомлений сразу
-/check - посмотреть какие треки в Open and Unassigned
+/check [фильтры] - посмотреть какие треки в Open and Unassigned (фильтры: LTBEXT, status=open, unassigned, assignee=ivan.ivanov, system=credit, ttfr<30m, breached)
 /get <ltbetx-2977> - посмотреть конкретный трек
 /zen - обязанности дежурного
 
 Мои треки:
-/mywatch [seconds] - следить за своими треками (изменения статуса, SLA)
+/mywatch [seconds] [jira_username] - следить за своими треками (изменения статуса, SLA)
 /myunwatch - остановить слежку за своими треками
-/mycheck - разовая проверка своих активных треков
+/mycheck [jira_username] - разовая проверка своих активных треков
 """
     await update.message.reply_text(text=msg, parse_mode=ParseMode.MARKDOWN)
 
 
 async def stop_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /stop command"""
-    current_jobs = context.job_queue.jobs()
-    for job in current_jobs:
-        remove_job_if_exists(job.name, context)
+    chat_id = update.effective_chat.id
+    unsubscribe_chat(chat_id, context)
+    watch_registry.unwatch(chat_id)
+    forget_watcher(chat_id)
+    schedule_mywatch_job(context.job_queue)
+    await share_state()
 
     await update.message.reply_text("Вы больше не будете получать уведомления о новых треках.")
 
@@ -68,8 +636,8 @@ async def send_reminder(chat_id: int, title: str, description: str = None) -> No
         message = f"🔔 {title}"
         if description:
             message += f"\n\n{description}"
-            await application.bot.send_message(chat_id=chat_id, text=message)
-        logger.info(f"Reminder sent successfully to {chat_id}")
+            dispatcher.send(chat_id, message)
+        logger.info(f"Reminder queued for {chat_id}")
     except Exception as e:
         logger.error(f"Failed to send reminder to {chat_id}: {e}")
 
@@ -82,15 +650,59 @@ async def broadcast_reminder(broadcast_message: str) -> None:
         await send_reminder(chat_id, title, broadcast_message)
 
 
+CHECK_USAGE = ('Usage: /check [broadcast] [filters]\n'
+               'Filters: LTBEXT, project=LTBEXT,RSBEXT, status=open, status=in_progress, assignee=ivan.ivanov, '
+               'unassigned, system=credit, ttfr<30m, ttfr<2h, breached, paused, nosla, team=<lead>')
+_check_index: Tuple[Optional[List[JiraIssue]], IssueIndex] = (None, IssueIndex())
+
+
+async def check_index() -> Tuple[IssueIndex, str]:
+    """
+    Index over the default JQL: the subscribed group's live one, the poller's shared one on a worker,
+    else one built over the cached search.
+    """
+    global _check_index
+    group = poll_registry.get(settings.jira.search_string)
+    if group and group.is_fresh():
+        return group.snapshot.index, ''
+    if CLUSTER_ROLE == 'worker':
+        shared = await shared_snapshots.index(normalize_jql(settings.jira.search_string))
+        if shared:
+            return shared[0], ''
+    result = await track_cache.get(settings.jira.search_string)
+    if _check_index[0] is not result.value:
+        _check_index = (result.value, IssueIndex(result.value))
+    return _check_index[1], stale_notice(result)
+
+
+async def known_projects() -> Set[str]:
+    """Projects in the snapshots at hand (no Jira query), to tell a bare project word from a typo."""
+    projects = set(_check_index[1].projects)
+    for group in poll_registry.groups.values():
+        projects.update(group.snapshot.index.projects)
+    if CLUSTER_ROLE == 'worker':
+        shared = await shared_snapshots.index(normalize_jql(settings.jira.search_string))
+        if shared:
+            projects.update(shared[0].projects)
+    return projects
+
+
 async def check_tracks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Check current Open or Unassigner Tracks and send the message with info to requester"""
 
     try:
-        mode = context.args[0] if context.args else 'check'
+        args = list(context.args or ())
+        mode = args.pop(0) if args and args[0] in ('check', 'broadcast') else 'check'
+        # a worker polls nothing itself: filtered or not, the answer comes from the poller's shared snapshot
+        index, header = await check_index()
+        filters, invalid = parse_check_filters(args, index.projects)
+        if invalid:
+            await update.message.reply_text(f"Unknown filter: {' '.join(invalid)}\n\n{CHECK_USAGE}")
+            return
         logger.info(f"Check Opened or Unnassigned issues for user {update.effective_chat.id} with mode {mode}")
-        message = etl(mode=mode)
-        print(message)
-        await update.message.reply_text(text=message) #, parse_mode=ParseMode.MARKDOWN_V2)
+        messages = render_tracks(index.select(filters), mode=mode, header=header)
+        for message in messages:
+            await update.message.reply_text(text=message) #, parse_mode=ParseMode.MARKDOWN_V2)
     except Exception as e:
         logger.error(f"Failed to check issues for {update.effective_chat.id}: {e}")
 
@@ -99,13 +711,26 @@ async def get_issues(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     """Get info about the specified issue's by their numbers """
     try:
         logger.info(f"user: {update.effective_chat.username}, requests: {update.message.text}")
-        user_request = ", ".join(update.message.text.lower().split()[1:])
-        search_string = f"key in ({user_request})"
-        message = etl(mode='check', search_string=search_string)
-        await update.message.reply_text(message, parse_mode=ParseMode.HTML)
+        keys, invalid = parse_issue_keys(context.args)
+        if not keys:
+            await update.message.reply_text('Usage: /get <issue key> [<issue key> ...], e.g. /get RTDMSUP-123')
+            return
+        results = await issue_lookup.get(keys)
+        found = [result.value for result in results.values() if result.value is not None]
+        missing = [key for key, result in results.items() if result.value is None]
+        notes = []
+        if missing:
+            notes.append(f"Not found: {', '.join(missing)}")
+        if invalid:
+            notes.append(f"Not an issue key: {html.escape(', '.join(invalid))}")
+        stale = [result for result in results.values() if result.stale]
+        header = stale_notice(min(stale, key=lambda result: result.fetched_at)) if stale else ''
+        header += ''.join(note + '\n' for note in notes) + ('\n' if notes and found else '')
+        for message in render_messages(found, ParseMode.HTML, header=header, empty=''):
+            await update.message.reply_text(message, parse_mode=ParseMode.HTML)
 
     except Exception as e:
-        logger.error(f'Failed to get issues for {update.effective_chat.id} by request: {update.message.text}')
+        logger.error(f'Failed to get issues for {update.effective_chat.id} by request: {update.message.text}: {e}')
         await update.message.reply_text(f'there is an error. check logs!', parse_mode=ParseMode.MARKDOWN)
 
 
@@ -129,23 +754,31 @@ async def set_timer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             return
         elif interval < 600:
             interval = 600
-        job_name = f'{chat_id}_send_updates_{interval}'
-        job_removed = remove_job_if_exists(str(chat_id), context)
-
-        context.job_queue.run_repeating(
-            callback=alarm,
-            interval=timedelta(seconds=interval),
-            chat_id=chat_id,
-            name=job_name,
-        )
+        options = context.args[1:]
+        delta = any(option.lower() == 'delta' for option in options)
+        filters, invalid = parse_check_filters((option for option in options if option.lower() != 'delta'),
+                                               await known_projects())
+        if invalid:
+            raise ValueError(f'unknown options {invalid}')
+        job_removed = any(sub.interval == interval for sub in poll_registry.subscriptions(chat_id))
+        group, sub = poll_registry.subscribe(chat_id, interval, settings.jira.search_string, delta=delta,
+                                             filters=filters.spec)
+        persist_subscription(sub, group)
+        schedule_poll_job(group, context.job_queue)
+        await share_state()
 
         text = f"Timer for {interval} seconds is successfully set!"
+        if delta:
+            text += "\nOnly new, changed and resolved tracks will be sent."
+        if filters:
+            text += f"\nOnly tracks matching: {filters.spec}"
         if job_removed:
             text += "\nOld one was removed."
         await update.effective_message.reply_text(text)
 
     except (IndexError, ValueError):
-        await update.effective_message.reply_text("Usage: /set <seconds>")
+        await update.effective_message.reply_text(
+            f"Usage: /set <seconds> [delta] [filters]\nFilters as in /check, or team=<lead> ({', '.join(TEAM_ROUTES)})")
 
 
 async def unset_timer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -153,10 +786,10 @@ async def unset_timer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     try:
         chat_id = update.message.chat_id
         interval = int(context.args[0])
-        job_name = f'{chat_id}_send_updates_{interval}'
-        job_removed = remove_job_if_exists(job_name, context)
+        job_removed = unsubscribe_chat(chat_id, context, interval)
+        await share_state()
         text = "Timer successfully cancelled!" if job_removed else "You have no active timer."
-        logger.info(f'User {chat_id} remove job {job_name}')
+        logger.info(f'User {chat_id} remove subscription {chat_id}_send_updates_{interval}')
         await update.message.reply_text(text)
 
     except Exception as e:
@@ -165,9 +798,9 @@ async def unset_timer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
 async def send_updates(context: ContextTypes.DEFAULT_TYPE):
     """Handle to reminders job"""
-    message = etl(mode='broadcast')
-    logging.info(message)
-    await broadcast_reminder(broadcast_message=message)
+    for message in await etl(mode='broadcast'):
+        logging.info(message)
+        await broadcast_reminder(broadcast_message=message)
 
 
 async def get_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -175,6 +808,10 @@ async def get_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
         current_jobs = context.job_queue.jobs()
         logging.debug(f'CURRENT JOBS: {current_jobs}')
         message = f'Your active timers:\n'
+        for sub in poll_registry.subscriptions(update.effective_chat.id):
+            message += f"{sub.name}{' (delta)' if sub.delta else ''}{f' [{sub.filters}]' if sub.filters else ''}\n"
+        if update.effective_chat.id in watch_registry.watchers:
+            message += f"{watch_registry.watchers[update.effective_chat.id].name}\n"
         for job in current_jobs:
             message += f"{job.name}\n"
     except Exception as e:
@@ -212,117 +849,261 @@ async def duty_zen(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(text=message, parse_mode=ParseMode.MARKDOWN)
 
 async def mywatch_job(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Periodic job: check personal tracks for status changes and SLA warnings."""
-    chat_id = context.job.chat_id
+    """Periodic job: check personal tracks of all due watchers with one batched query."""
+    due = watch_registry.due_watchers(time.monotonic())
+    if not due:
+        return
     try:
-        current_issues = get_my_issues()
-        prev_states = my_watch_state.get(chat_id)  # None = first run
+        by_assignee = await get_issues_by_assignee({watcher.assignee for watcher in due})
+    except Exception as e:
+        logger.error(f"mywatch_job failed for {len(due)} watchers: {e}")
+        return
 
-        notifications, new_states = check_personal_track_changes(
-            current_issues,
-            prev_states,
-            sla_warn_ms=settings.telegram.sla_warning_threshold_ms,
-        )
-        my_watch_state[chat_id] = new_states
+    newly_assigned = sent = 0
+    results = detect_personal_track_changes(
+        [(by_assignee[watcher.assignee], watcher.state) for watcher in due],  # None = first run
+        sla_warn_ms=settings.telegram.sla_warning_threshold_ms,
+    )
+    for watcher, (notifications, new_states) in zip(due, results):
+        if watcher.state is not None:
+            newly_assigned += len(new_states.keys() - watcher.state.keys())
+        watcher.state = new_states
+        persist_watch_state(watcher)
 
         for msg in notifications:
-            await context.bot.send_message(chat_id=chat_id, text=msg, parse_mode=ParseMode.HTML)
-    except Exception as e:
-        logger.error(f"mywatch_job failed for {chat_id}: {e}")
+            dispatcher.send(watcher.chat_id, msg, parse_mode=ParseMode.HTML)
+        sent += len(notifications)
+    NOTIFICATIONS.observe(sent, job='mywatch')
+
+    if watch_registry.adaptive:
+        tracks = {track.key: track for track in chain.from_iterable(by_assignee.values())}  # e-mail and login may overlap
+        watch_registry.adaptive.update(tracks.values(), newly_assigned)
+        schedule_mywatch_job(context.job_queue)
+
+
+def schedule_mywatch_job(job_queue: JobQueue) -> None:
+    """Keep one mywatch job ticking at the registry's tick, or none if nobody watches."""
+    if not owns_polling():
+        return
+    tick = watch_registry.tick
+    current_jobs = job_queue.get_jobs_by_name(watch_registry.job_name)
+    if tick is None:
+        for job in current_jobs:
+            job.schedule_removal()
+    elif current_jobs:
+        reschedule_repeating(current_jobs[0], tick, job_queue)
+    else:
+        job_queue.run_repeating(
+            callback=mywatch_job,
+            interval=timedelta(seconds=tick),
+            name=watch_registry.job_name,
+        )
 
 
 async def mywatch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle /mywatch [seconds] — start monitoring personal tracks."""
+    """Handle /mywatch [seconds] [jira_username] — start monitoring personal tracks."""
     chat_id = update.effective_message.chat_id
     try:
         interval = int(context.args[0]) if context.args else settings.telegram.my_watch_default_interval
         if interval < 60:
             interval = 60
+        assignee = context.args[1] if len(context.args) > 1 else settings.jira.username
+        if assignee is None or not JIRA_USERNAME_RE.match(assignee):  # no JIRA_USERNAME to default to
+            raise ValueError(assignee)
 
-        job_name = f'{chat_id}_mywatch'
-        remove_job_if_exists(job_name, context)
-        my_watch_state[chat_id] = None  # force re-init on restart
+        watcher = watch_registry.watch(chat_id, assignee, interval)  # state starts as None: re-init on restart
+        persist_watcher(watcher)
+        schedule_mywatch_job(context.job_queue)
+        await share_state()
+        if owns_polling():
+            # initialise this chat's state right away instead of waiting for the next tick
+            context.job_queue.run_once(callback=mywatch_job, when=0)
 
-        context.job_queue.run_repeating(
-            callback=mywatch_job,
-            interval=timedelta(seconds=interval),
-            chat_id=chat_id,
-            name=job_name,
-            first=0,
-        )
         await update.effective_message.reply_text(
-            f"Слежу за вашими треками каждые {interval} сек.\n"
+            f"Слежу за треками {assignee} каждые {interval} сек.\n"
             f"Уведомлю при изменении статуса или когда SLA менее {settings.telegram.sla_warning_threshold_ms // 60000} мин."
         )
     except (IndexError, ValueError):
-        await update.effective_message.reply_text("Использование: /mywatch [seconds]")
+        await update.effective_message.reply_text("Использование: /mywatch [seconds] [jira_username]")
 
 
 async def myunwatch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /myunwatch — stop monitoring personal tracks."""
     chat_id = update.message.chat_id
-    job_name = f'{chat_id}_mywatch'
-    removed = remove_job_if_exists(job_name, context)
-    my_watch_state.pop(chat_id, None)
+    removed = watch_registry.unwatch(chat_id)
+    forget_watcher(chat_id)
+    schedule_mywatch_job(context.job_queue)
+    await share_state()
     if removed:
         await update.message.reply_text("Перестал следить за вашими треками.")
     else:
         await update.message.reply_text("Слежка не была запущена.")
 
 
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /stats — metrics digest, only for the admin chat."""
+    if update.effective_chat.id != settings.telegram.telegram_admin_chat_id:
+        return
+    if not metrics_registry.enabled:
+        await update.message.reply_text("Метрики выключены (METRICS_ENABLED=false).")
+        return
+    for text in pack_messages(metrics_registry.summary().splitlines(keepends=True)):
+        await update.message.reply_text(text)
+
+
 async def mycheck_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle /mycheck — one-shot view of personal active tracks."""
+    """Handle /mycheck [jira_username] — one-shot view of personal active tracks."""
     try:
-        issues = get_my_issues()
+        chat_id = update.effective_chat.id
+        watcher = watch_registry.watchers.get(chat_id)
+        if context.args:
+            assignee = context.args[0]
+        else:
+            assignee = watcher.assignee if watcher else settings.jira.username
+        if assignee is None or not JIRA_USERNAME_RE.match(assignee):  # no JIRA_USERNAME to default to
+            await update.message.reply_text("Использование: /mycheck [jira_username]")
+            return
+        result = await get_my_issues(assignee)
+        issues = result.value
         if not issues:
-            await update.message.reply_text("Нет активных треков, назначенных на вас.")
+            await update.message.reply_text(stale_notice(result) + "Нет активных треков, назначенных на вас.")
             return
 
-        parts = []
+        parts = [stale_notice(result).strip()] if result.stale else []
         for issue in issues:
             has_warning = check_sla_warning(issue, settings.telegram.sla_warning_threshold_ms)
             event = 'sla_warning' if has_warning else 'current'
             parts.append(format_my_issue_message(issue, event))
 
-        # Telegram limit is 4096 chars — split into chunks
-        chunk, chunk_len = [], 0
-        for part in parts:
-            part_len = len(part) + 2  # +2 for '\n\n'
-            if chunk and chunk_len + part_len > 4000:
-                await update.message.reply_text('\n\n'.join(chunk), parse_mode=ParseMode.HTML)
-                chunk, chunk_len = [], 0
-            chunk.append(part)
-            chunk_len += part_len
-        if chunk:
-            await update.message.reply_text('\n\n'.join(chunk), parse_mode=ParseMode.HTML)
+        for text in pack_messages(parts, separator='\n\n'):
+            await update.message.reply_text(text, parse_mode=ParseMode.HTML)
     except Exception as e:
         logger.error(f"mycheck failed for {update.effective_chat.id}: {e}")
         await update.message.reply_text("Ошибка при получении треков. Проверьте логи.")
 
 
-# Create application
-logger.info("Initializing Telegram bot...")
-application = Application.builder().token(settings.telegram.telegram_bot_token).build()
+def build_application() -> Application:
+    """Create the Telegram application with all command handlers registered."""
+    logger.info("Initializing Telegram bot...")
+    if not settings.telegram.telegram_bot_token:
+        raise RuntimeError('TELEGRAM_BOT_TOKEN must be set')
+    builder = (
+        Application.builder()
+        .token(settings.telegram.telegram_bot_token)
+        .base_url(settings.telegram.telegram_base_url)
+        .concurrent_updates(settings.telegram.telegram_concurrent_updates)
+        .post_init(restore_state)
+        .post_shutdown(shutdown_state)
+    )
+    if CLUSTER_ROLE == 'worker' and not settings.telegram.telegram_webhook_enabled:
+        raise RuntimeError('CLUSTER_ROLE=worker needs TELEGRAM_WEBHOOK_ENABLED: only one process may use getUpdates')
+    if CLUSTER_ROLE == 'worker' and settings.telegram.telegram_webhook_url and not settings.telegram.telegram_webhook_secret:
+        raise RuntimeError('Workers that register the webhook need a shared TELEGRAM_WEBHOOK_SECRET')
+    if settings.telegram.telegram_webhook_enabled or CLUSTER_ROLE == 'poller':
+        # updates arrive at telegram_webhook_endpoint (or, for a poller, not at all), not via getUpdates
+        builder = builder.updater(None)
+    app = builder.build()
+
+    # Add handlers
+    app.add_handler(CommandHandler("start", start_command))
+    app.add_handler(CommandHandler("stop", stop_command))
+    app.add_handler(CommandHandler("help", help_command))
+    app.add_handler(CommandHandler("check", check_tracks))
+    app.add_handler(CommandHandler("get", get_issues))
+    app.add_handler(CommandHandler("set", set_timer))
+    app.add_handler(CommandHandler("unset", unset_timer))
+    app.add_handler(CommandHandler("jobs", get_jobs))
+    app.add_handler(CommandHandler("zen", duty_zen))
+    app.add_handler(CommandHandler("mywatch", mywatch_command))
+    app.add_handler(CommandHandler("myunwatch", myunwatch_command))
+    app.add_handler(CommandHandler("mycheck", mycheck_command))
+    app.add_handler(CommandHandler("stats", stats_command))
+    return app
+
+
+_application: Optional[Application] = None
 
-# Add handlers
-application.add_handler(CommandHandler("start", start_command))
-application.add_handler(CommandHandler("stop", stop_command))
-application.add_handler(CommandHandler("help", help_command))
-application.add_handler(CommandHandler("check", check_tracks))
-application.add_handler(CommandHandler("get", get_issues))
-application.add_handler(CommandHandler("set", set_timer))
-application.add_handler(CommandHandler("unset", unset_timer))
-application.add_handler(CommandHandler("jobs", get_jobs))
-application.add_handler(CommandHandler("zen", duty_zen))
-application.add_handler(CommandHandler("mywatch", mywatch_command))
-application.add_handler(CommandHandler("myunwatch", myunwatch_command))
-application.add_handler(CommandHandler("mycheck", mycheck_command))
+
+def get_application() -> Application:
+    """The Telegram application, built on first use: importing bot needs no token."""
+    global _application
+    if _application is None:
+        _application = build_application()
+    return _application
+
+# Telegram sends it back in every webhook request. When the bot registers the webhook itself
+# and no secret is configured, a fresh one is generated per run.
+telegram_webhook_secret = settings.telegram.telegram_webhook_secret or (
+    secrets.token_urlsafe(32) if settings.telegram.telegram_webhook_url else None)
+
+
+async def telegram_webhook_endpoint(request: Request) -> Response:
+    """Receive one update pushed by Telegram and hand it to the application's update queue."""
+    token = request.headers.get('x-telegram-bot-api-secret-token', '')
+    if telegram_webhook_secret and not hmac.compare_digest(token, telegram_webhook_secret):
+        return Response.text('Unauthorized', status=401)
+    try:
+        payload = request.json()
+        if not isinstance(payload, dict):
+            raise ValueError('update is not a JSON object')
+        update = Update.de_json(payload, get_application().bot)
+    except (ValueError, TypeError, KeyError) as e:
+        logger.error(f'Bad Telegram update: {e}')
+        return Response.text('Bad request', status=400)
+    await get_application().update_queue.put(update)
+    return Response.text('OK')
+
+
+if settings.telegram.telegram_webhook_enabled:
+    web_server.route('POST', settings.telegram.telegram_webhook_path, telegram_webhook_endpoint)
+
+
+async def run_webhook() -> None:
+    """
+    Same lifecycle as Application.run_polling, but updates come from the embedded HTTP server
+    (shared with /metrics and the Jira webhook) instead of long polling.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    application = get_application()
+    await application.initialize()
+    try:
+        await application.post_init(application)  # starts the web server
+        url = settings.telegram.telegram_webhook_url
+        if not settings.telegram.telegram_webhook_enabled:
+            logger.info("Not taking Telegram updates: commands are served by the workers")
+        elif url:
+            await application.bot.set_webhook(
+                url=url,
+                secret_token=telegram_webhook_secret,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=settings.telegram.telegram_webhook_max_connections,
+            )
+            logger.info(f"Telegram webhook set to {url}")
+        else:
+            logger.warning("TELEGRAM_WEBHOOK_URL is not set, expecting the webhook to be registered elsewhere")
+        await application.start()
+        await stop.wait()
+        await application.stop()
+    finally:
+        await application.post_shutdown(application)
+        await application.shutdown()
 
 
 def start_bot():
     """Start the bot"""
+    logging.basicConfig(level=settings.log_level)
     logger.info("Starting Telegram bot...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if settings.telegram.telegram_webhook_enabled or CLUSTER_ROLE == 'poller':
+        asyncio.run(run_webhook())
+    else:
+        get_application().run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == "__main__":
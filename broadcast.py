@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from deadlines import ttfr_remaining_millis
+from metrics import RENDER_SECONDS
+from models import JiraIssue
+from render import render_sections
+from tools import render_tracks, select_broadcast_tracks
+
+logger = logging.getLogger(__name__)
+
+
+def sla_bucket(issue: JiraIssue, warn_ms: int) -> str:
+    """Coarse TTFR state: the remaining time itself changes every poll and must not count as a change."""
+    try:
+        cycle = issue.fields.customfield_12671.ongoingCycle
+    except AttributeError:
+        return 'none'
+    if not cycle:
+        return 'none'
+    remaining = ttfr_remaining_millis(issue, int(time.time() * 1000))
+    if cycle.breached or remaining < 0:
+        return 'breached'
+    if cycle.paused:
+        return 'paused'
+    if remaining < warn_ms:
+        return 'warning'
+    return 'running'
+
+
+def issue_fingerprint(issue: JiraIssue, warn_ms: int) -> str:
+    """Hash of what a broadcast shows about the issue: key, status, assignee and SLA bucket."""
+    assignee = issue.fields.assignee.name if issue.fields.assignee else ''
+    parts = (issue.key, issue.fields.status.name, assignee, sla_bucket(issue, warn_ms))
+    return hashlib.blake2b('\x1f'.join(parts).encode(), digest_size=8).hexdigest()
+
+
+@dataclass
+class BroadcastDelta:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    resolved: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.resolved)
+
+    @property
+    def cache_key(self) -> tuple:
+        return tuple(self.added), tuple(self.changed), tuple(self.resolved)
+
+
+def diff_fingerprints(previous: Dict[str, str], current: Dict[str, str]) -> BroadcastDelta:
+    """What a chat that last saw `previous` has to be told; keys keep the order of `current`."""
+    return BroadcastDelta(
+        added=[key for key in current if key not in previous],
+        changed=[key for key, fingerprint in current.items() if key in previous and previous[key] != fingerprint],
+        resolved=sorted(previous.keys() - current.keys()),
+    )
+
+
+class BroadcastTick:
+    """
+    Одна рассылка группы. Полный список и отпечатки треков считаются не больше одного раза,
+    а сообщения об изменениях - один раз на каждый различный набор изменений, общий для всех
+    подписчиков с этим набором.
+    """
+
+    def __init__(self, tracks: List[JiraIssue], warn_ms: int):
+        self.tracks = tracks
+        self.warn_ms = warn_ms
+        self._full: Optional[List[str]] = None
+        self._issues: Optional[Dict[str, JiraIssue]] = None
+        self._fingerprints: Optional[Dict[str, str]] = None
+        self._deltas: Dict[tuple, List[str]] = {}
+
+    @property
+    def full_messages(self) -> List[str]:
+        if self._full is None:
+            self._full = render_tracks(self.tracks, mode='broadcast')
+        return self._full
+
+    @property
+    def fingerprints(self) -> Dict[str, str]:
+        """Fingerprints of the tracks a full broadcast would show."""
+        if self._fingerprints is None:
+            self._issues = {track.key: track for track in select_broadcast_tracks(self.tracks)}
+            self._fingerprints = {key: issue_fingerprint(issue, self.warn_ms) for key, issue in self._issues.items()}
+        return self._fingerprints
+
+    def delta_messages(self, previous: Dict[str, str]) -> Optional[List[str]]:
+        """Messages for a chat that last saw `previous`, None if nothing changed for it."""
+        delta = diff_fingerprints(previous, self.fingerprints)
+        if not delta:
+            return None
+        messages = self._deltas.get(delta.cache_key)
+        if messages is None:
+            with RENDER_SECONDS.time(mode='delta'):
+                messages = self._deltas[delta.cache_key] = self._render_delta(delta)
+        return messages
+
+    def _render_delta(self, delta: BroadcastDelta) -> List[str]:
+        footer = 'No longer need attention: ' + ', '.join(delta.resolved) if delta.resolved else ''
+        return render_sections([
+            ('New tracks:\n\n', [self._issues[key] for key in delta.added]),
+            ('Changed tracks:\n\n', [self._issues[key] for key in delta.changed]),
+        ], footer)
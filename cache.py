@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+from metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open: the call was not even attempted."""
+
+
+class CircuitBreaker:
+    """
+    Размыкатель цепи для походов в Jira.
+    После `threshold` сбоев подряд вызовы отклоняются сразу; через паузу пропускается
+    один пробный вызов. Каждое повторное размыкание удваивает паузу (до max_backoff).
+    """
+
+    def __init__(self, threshold: int = 3, backoff: float = 5.0, max_backoff: float = 300.0):
+        self.threshold = threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.opened = 0  # consecutive openings, drives the backoff
+        self.open_until: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.open_until is not None
+
+    @property
+    def retry_in(self) -> float:
+        return max(0.0, self.open_until - time.monotonic()) if self.open_until else 0.0
+
+    def allow(self) -> bool:
+        if self.open_until is None:
+            return True
+        if self._probing or time.monotonic() < self.open_until:
+            return False
+        self._probing = True  # half-open: let exactly one call through
+        return True
+
+    def release(self) -> None:
+        """The probe call was cancelled before Jira answered: allow another one."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        if self.open_until is not None:
+            logger.info('Jira is back, closing the circuit')
+        self.failures = self.opened = 0
+        self.open_until = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            pause = min(self.backoff * 2 ** self.opened, self.max_backoff)
+            self.opened += 1
+            self.open_until = time.monotonic() + pause
+            self._probing = False
+            logger.warning(f'Jira failed {self.failures} times in a row, pausing calls for {pause:.0f}s')
+
+
+@dataclass
+class CachedResult(Generic[T]):
+    value: T
+    fetched_at: float  # time.time() of the Jira answer
+    stale: bool = False
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class SWRCache(Generic[T]):
+    """
+    Stale-while-revalidate cache for async loaders.
+
+    Fresh entries (younger than ttl) are served as is. Older ones, up to stale_ttl, are served
+    right away marked stale while one background refresh runs. Entries older than stale_ttl
+    wait for the refresh, but are still served (stale) if it fails. Concurrent misses of the
+    same key share one load.
+    """
+
+    def __init__(self, load: Callable[[Hashable], Awaitable[T]], ttl: float = 60.0, stale_ttl: float = 900.0,
+                 max_entries: int = 256):
+        self.load = load
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, CachedResult[T]]' = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def get(self, key: Hashable) -> CachedResult[T]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            if entry.age < self.ttl:
+                CACHE_REQUESTS.inc(result='fresh')
+                return entry
+            if entry.age < self.stale_ttl:
+                CACHE_REQUESTS.inc(result='stale')
+                self._refresh(key)
+                return CachedResult(entry.value, entry.fetched_at, stale=True)
+        CACHE_REQUESTS.inc(result='miss')
+        try:
+            # shield: a cancelled caller must not cancel the load other callers are waiting for
+            return await asyncio.shield(self._refresh(key))
+        except Exception as e:
+            if entry is None:
+                raise
+            logger.warning(f'Serving {entry.age:.0f}s old result, refresh failed: {e}')
+            return CachedResult(entry.value, entry.fetched_at, stale=True)
+
+    def _refresh(self, key: Hashable) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._load(key))
+            task.add_done_callback(self._loaded)
+        return task
+
+    async def _load(self, key: Hashable) -> CachedResult[T]:
+        try:
+            result = CachedResult(await self.load(key), time.time())
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _loaded(task: asyncio.Task) -> None:
+        # background refreshes nobody awaits: log the failure instead of "exception never retrieved"
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f'Cache refresh failed: {task.exception()}')
+
+    def invalidate(self, key: Any = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
@@ -0,0 +1,139 @@
+import logging
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from models import JiraIssue
+
+try:
+    import numpy as np
+except ImportError:  # optional: the same pass runs as a plain loop over the arrays
+    np = None
+
+logger = logging.getLogger(__name__)
+
+NO_STATUS = -1  # previous status of a track the watcher sees for the first time
+
+_status_ids: Dict[str, int] = {}
+_status_names: List[str] = []
+
+# (issue position in the batch, event for format_my_issue_message, previous status name)
+Event = Tuple[int, str, Optional[str]]
+
+
+def status_id(name: str) -> int:
+    """Small int standing for a status name; ids are stable for the life of the process."""
+    sid = _status_ids.get(name)
+    if sid is None:
+        sid = _status_ids[name] = len(_status_names)
+        _status_names.append(name)
+    return sid
+
+
+def ttfr_sla(issue: JiraIssue) -> Tuple[int, bool]:
+    """(remaining ms, breached) of the ongoing TTFR cycle, (0, False) if there is none."""
+    try:
+        cycle = issue.fields.customfield_12671.ongoingCycle
+        if cycle:
+            return int(cycle.remainingTime.millis), bool(cycle.breached)
+    except (AttributeError, TypeError):
+        pass
+    return 0, False
+
+
+class WatchColumns:
+    """
+    Состояние /mywatch всех проверяемых за тик чатов в колонках.
+
+    Каждый трек попадает в колонки один раз (статус, остаток TTFR, просрочка), сколько бы
+    чатов за ним ни следило; пары (чат, трек) хранят только номер трека и прошлое
+    состояние. Смены статуса и пересечения порога SLA считаются одним проходом по всем
+    парам (numpy, если установлен), уведомления раскладываются по чатам по смещениям строк.
+    """
+
+    def __init__(self):
+        self.issues: List[JiraIssue] = []
+        self.keys: List[str] = []
+        self.status_names: List[str] = []
+        self._positions: Dict[str, int] = {}
+        # per track
+        self.status = array('q')
+        self.remaining = array('q')
+        self.breached = array('b')
+        # per (watcher, track) pair; the rows of watcher i are offsets[i]:offsets[i + 1]
+        self.issue_pos = array('q')
+        self.prev_status = array('q')
+        self.prev_warned = array('b')
+        self.offsets = array('q', [0])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _position(self, issue: JiraIssue) -> int:
+        pos = self._positions.get(issue.key)
+        if pos is None:
+            pos = self._positions[issue.key] = len(self.issues)
+            self.issues.append(issue)
+            self.keys.append(issue.key)
+            self.status_names.append(issue.fields.status.name)
+            remaining, breached = ttfr_sla(issue)
+            self.status.append(status_id(self.status_names[-1]))
+            self.remaining.append(remaining)
+            self.breached.append(breached)
+        return pos
+
+    def add_watcher(self, issues: List[JiraIssue], state: Optional[Dict[str, Dict]]) -> int:
+        """Add one watcher's current tracks and stored state (None on the first run); returns its slot."""
+        state = state or {}
+        previous = [state.get(issue.key) for issue in issues]
+        self.issue_pos.extend([self._position(issue) for issue in issues])
+        self.prev_status.extend([NO_STATUS if p is None else status_id(p['status']) for p in previous])
+        self.prev_warned.extend([p is not None and bool(p.get('sla_warned', False)) for p in previous])
+        self.offsets.append(len(self.issue_pos))
+        return len(self) - 1
+
+    def _pass(self, threshold_ms: int) -> Tuple[List[int], List[bool], List[bool], List[bool]]:
+        """Rows with an event, then per row: status changed, must warn, new warned flag."""
+        if np is not None and self.issue_pos:
+            pos = np.frombuffer(self.issue_pos, dtype=np.int64)
+            prev = np.frombuffer(self.prev_status, dtype=np.int64)
+            remaining = np.frombuffer(self.remaining, dtype=np.int64)[pos]
+            breached = np.frombuffer(self.breached, dtype=np.int8)[pos] != 0
+            known = prev != NO_STATUS
+            changed = known & (prev != np.frombuffer(self.status, dtype=np.int64)[pos])
+            warned = known & ~breached & (remaining > 0) & (remaining < threshold_ms)
+            warn = warned & (np.frombuffer(self.prev_warned, dtype=np.int8) == 0)
+            return np.flatnonzero(changed | warn).tolist(), changed.tolist(), warn.tolist(), warned.tolist()
+        status, remaining, breached = self.status, self.remaining, self.breached
+        changed, warn, warned = [], [], []
+        for pos, prev, was_warned in zip(self.issue_pos, self.prev_status, self.prev_warned):
+            known = prev != NO_STATUS
+            in_window = known and not breached[pos] and 0 < remaining[pos] < threshold_ms
+            changed.append(known and prev != status[pos])
+            warn.append(in_window and not was_warned)
+            warned.append(in_window)
+        rows = [row for row, (c, w) in enumerate(zip(changed, warn)) if c or w]
+        return rows, changed, warn, warned
+
+    def detect(self, threshold_ms: int) -> Tuple[List[List[Event]], List[Dict[str, Dict]]]:
+        """
+        Events and new state per watcher slot. A status change comes before the SLA warning of the same track,
+        tracks keep the order they were added in; a track seen for the first time only initialises its state.
+        """
+        rows, changed, warn, warned = self._pass(threshold_ms)
+        events: List[List[Event]] = [[] for _ in range(len(self))]
+        states: List[Dict[str, Dict]] = []
+        keys, names, issue_pos = self.keys, self.status_names, self.issue_pos
+        for start, end in zip(self.offsets, self.offsets[1:]):
+            states.append({keys[pos]: {'status': names[pos], 'sla_warned': flag}
+                           for pos, flag in zip(issue_pos[start:end], warned[start:end])})
+        for row in rows:
+            pos = self.issue_pos[row]
+            slot_events = events[bisect_right(self.offsets, row) - 1]
+            if changed[row]:
+                current = names[pos]
+                event = 'status_inprogress' if current.lower() == 'in progress' else 'status_changed'
+                slot_events.append((pos, event, _status_names[self.prev_status[row]]))
+            if warn[row]:
+                slot_events.append((pos, 'sla_warning', None))
+        return events, states
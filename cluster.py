@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from issue_index import IssueIndex
+from models import JiraIssue
+from records import Record, parse_records
+from storage import StateBackend
+
+logger = logging.getLogger(__name__)
+
+ROLES = ('all', 'poller', 'worker')
+POLLER_LEASE = 'poller'
+
+
+class LeaderElection:
+    """
+    Выбор опрашивающего процесса через аренду в общем хранилище (файл SQLite или Redis).
+
+    Каждый процесс с ролью poller раз в CLUSTER_LEASE_RENEW секунд пытается взять или продлить аренду.
+    Лидер, который не смог её продлить до истечения ttl, слагает полномочия сам; если лидер
+    пропал, аренду через ttl забирает следующий. Поэтому смена лидера занимает не больше
+    ttl + CLUSTER_LEASE_RENEW секунд.
+    """
+
+    def __init__(self, backend: StateBackend, ttl: float, on_elected: Callable[..., Awaitable[None]],
+                 on_deposed: Callable[..., Awaitable[None]], name: str = POLLER_LEASE):
+        self.backend = backend
+        self.ttl = ttl
+        self.name = name
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}'
+        self.is_leader = False
+        self._valid_until = 0.0  # monotonic time until which our last successful renewal holds
+
+    async def tick(self, *args: Any) -> None:
+        """Take or renew the lease; `args` are passed on to on_elected / on_deposed."""
+        started = time.monotonic()
+        try:
+            acquired = await asyncio.to_thread(self.backend.acquire_lease, self.name, self.holder, self.ttl)
+        except Exception as e:
+            logger.error(f'Failed to renew the {self.name} lease: {e}')
+            acquired = self.is_leader and time.monotonic() < self._valid_until
+        else:
+            if acquired:
+                self._valid_until = started + self.ttl
+        if acquired and not self.is_leader:
+            self.is_leader = True
+            logger.info(f'{self.holder} took the {self.name} lease')
+            await self.on_elected(*args)
+        elif not acquired and self.is_leader:
+            self.is_leader = False
+            logger.warning(f'{self.holder} lost the {self.name} lease')
+            await self.on_deposed(*args)
+
+    async def resign(self) -> None:
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        try:
+            await asyncio.to_thread(self.backend.release_lease, self.name, self.holder)
+        except Exception as e:
+            logger.error(f'Failed to release the {self.name} lease: {e}')
+
+
+def issue_to_dict(issue: JiraIssue) -> Dict[str, Any]:
+    return issue.to_dict() if isinstance(issue, Record) else issue.model_dump(mode='json')
+
+
+def snapshot_record(tracks: List[JiraIssue], published_at: float) -> Dict[str, Any]:
+    """
+    Shared copy of a poll group's snapshot for the workers. It is stored under 'snapshots', next to a small
+    'snapshot_meta' record ({published_at, fetched_at, max_age}) that they check before reading the issues.
+    """
+    return {'published_at': published_at, 'issues': [issue_to_dict(track) for track in tracks]}
+
+
+class SharedSnapshots:
+    """Worker side: snapshots published by the poller, decoded and indexed once per publication."""
+
+    def __init__(self, backend: StateBackend):
+        self.backend = backend
+        self._indexes: Dict[str, Tuple[float, IssueIndex]] = {}
+
+    async def index(self, jql: str) -> Optional[Tuple[IssueIndex, float]]:
+        """Index and fetch time of the group's shared snapshot, None if there is no fresh one."""
+        meta = await asyncio.to_thread(self.backend.get, 'snapshot_meta', jql)
+        if not meta or time.time() - meta['fetched_at'] >= meta['max_age']:
+            return None
+        cached = self._indexes.get(jql)
+        if cached is None or cached[0] != meta['published_at']:
+            record = await asyncio.to_thread(self.backend.get, 'snapshots', jql)
+            if not record:
+                return None
+            # meta and issues are written in one transaction, but a newer pair may land between the two reads
+            cached = self._indexes[jql] = (record['published_at'], IssueIndex(parse_records(record['issues'])))
+        return cached[1], meta['fetched_at']
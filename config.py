@@ -1,14 +1,11 @@
-import errno
 import logging
-import os
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
-from pydantic import Field, SecretStr, ValidationError
+from pydantic import BaseModel, Field, SecretStr, ValidationError
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
 
 env_path = Path(__file__).parent / ".env"
 logger.debug(f"Loading .env from: {env_path}")
@@ -16,40 +13,123 @@ logger.debug(f"File exists: {env_path.exists()}")
 
 
 
+class JiraInstanceSettings(BaseModel):
+    """One more Jira polled next to the main one; unset fields are taken from the main settings."""
+    url: str
+    username: Optional[str] = None
+    password: Optional[str] = None
+    search_string: Optional[str] = None
+    max_concurrency: Optional[int] = None
+
+
 class JiraSettings(BaseSettings):
-    username: str = Field(..., env='USERNAME', alias='JIRA_USERNAME')
-    password: str = Field(..., env='PASSWORD', alias='JIRA_PASSWORD')
-    url: str = Field(..., env='URL', alias='JIRA_URL')
+    # Optional so that modules import without credentials; checked when the Jira client is first used
+    username: Optional[str] = Field(None, env='USERNAME', alias='JIRA_USERNAME')
+    password: Optional[str] = Field(None, env='PASSWORD', alias='JIRA_PASSWORD')
+    url: Optional[str] = Field(None, env='URL', alias='JIRA_URL')
+    max_concurrency: int = Field(4, env='MAX_CONCURRENCY', alias='JIRA_MAX_CONCURRENCY')
+    request_timeout: float = Field(20.0, env='REQUEST_TIMEOUT', alias='JIRA_REQUEST_TIMEOUT')
+    page_size: int = Field(100, env='PAGE_SIZE', alias='JIRA_PAGE_SIZE')
+    page_concurrency: int = Field(1, env='PAGE_CONCURRENCY', alias='JIRA_PAGE_CONCURRENCY')
+    fast_decode: bool = Field(True, env='FAST_DECODE', alias='JIRA_FAST_DECODE')
+    jql_max_length: int = Field(4000, env='JQL_MAX_LENGTH', alias='JIRA_JQL_MAX_LENGTH')
+    incremental_polling: bool = Field(False, env='INCREMENTAL_POLLING', alias='JIRA_INCREMENTAL_POLLING')
+    reconcile_every: int = Field(6, env='RECONCILE_EVERY', alias='JIRA_RECONCILE_EVERY')
+    full_refresh_every: int = Field(0, env='FULL_REFRESH_EVERY', alias='JIRA_FULL_REFRESH_EVERY')
+    cache_ttl: float = Field(60.0, env='CACHE_TTL', alias='JIRA_CACHE_TTL')
+    cache_stale_ttl: float = Field(900.0, env='CACHE_STALE_TTL', alias='JIRA_CACHE_STALE_TTL')
+    cache_max_entries: int = Field(256, env='CACHE_MAX_ENTRIES', alias='JIRA_CACHE_MAX_ENTRIES')
+    breaker_threshold: int = Field(3, env='BREAKER_THRESHOLD', alias='JIRA_BREAKER_THRESHOLD')
+    breaker_backoff: float = Field(5.0, env='BREAKER_BACKOFF', alias='JIRA_BREAKER_BACKOFF')
+    breaker_max_backoff: float = Field(300.0, env='BREAKER_MAX_BACKOFF', alias='JIRA_BREAKER_MAX_BACKOFF')
+    lookup_ttl: float = Field(30.0, env='LOOKUP_TTL', alias='JIRA_LOOKUP_TTL')
+    lookup_max_entries: int = Field(1000, env='LOOKUP_MAX_ENTRIES', alias='JIRA_LOOKUP_MAX_ENTRIES')
+    lookup_batch_window: float = Field(0.05, env='LOOKUP_BATCH_WINDOW', alias='JIRA_LOOKUP_BATCH_WINDOW')
+    lookup_chunk_size: int = Field(100, env='LOOKUP_CHUNK_SIZE', alias='JIRA_LOOKUP_CHUNK_SIZE')
+    lookup_concurrency: int = Field(4, env='LOOKUP_CONCURRENCY', alias='JIRA_LOOKUP_CONCURRENCY')
+    # JSON: {"databorn": {"url": "https://...", "username": "...", "password": "...", "search_string": "..."}}
+    instances: Dict[str, JiraInstanceSettings] = Field(default_factory=dict, env='INSTANCES', alias='JIRA_INSTANCES')
+    webhook_enabled: bool = Field(False, env='WEBHOOK_ENABLED', alias='JIRA_WEBHOOK_ENABLED')
+    webhook_path: str = Field('/jira/webhook', env='WEBHOOK_PATH', alias='JIRA_WEBHOOK_PATH')
+    webhook_secret: Optional[str] = Field(None, env='WEBHOOK_SECRET', alias='JIRA_WEBHOOK_SECRET')
+    webhook_reconcile_interval: int = Field(1800, env='WEBHOOK_RECONCILE_INTERVAL',
+                                            alias='JIRA_WEBHOOK_RECONCILE_INTERVAL')
     search_string: str = '(("EXT System / Service" in ("Система Внутренних Списков", Anti-Fraud, Collection, "Collection CA", "Credit Scoring", "Data Verification", "Система принятия решений", "Автоматизированная cистема управления операционными рисками", "Система управления лимитами", "Система противодействия внутреннему мошенничеству", "Система противодействия мошенничеству", "Автоматизированная cистема управления операционными рисками", "Автоматизированная система управления операционными рисками") OR "EXT System / Service" in ("Anti Money Laundering") AND project in ("ROSBANK Support", "Почта Банк Support", "OTP Bank Support", "МТС Банк Support", "Банк Открытие Support", "Ак Барс Support", "Банк СОЮЗ Support", "Согаз Support") OR project in ("RTDM Support") AND labels = support) AND status not in (Closed, Resolved) AND (labels != nomon OR labels is EMPTY)) and (status = "open" or assignee is EMPTY)'
     model_config = SettingsConfigDict(env_file=env_path, extra="ignore")
 
 
 class TelegramSettings(BaseSettings):
     """Telegram bot settings"""
-    telegram_bot_token: str = Field(..., env="TELEGRAM_BOT_TOKEN")
+    telegram_bot_token: Optional[str] = Field(None, env="TELEGRAM_BOT_TOKEN")  # required by bot.py only
     telegram_admin_chat_id: Optional[int] = Field(None, env="TELEGRAM_ADMIN_CHAT_ID")
+    telegram_base_url: str = Field('https://api.telegram.org/bot', env='TELEGRAM_BASE_URL')
     telegram_default_reminder_period: int = Field(30, env='TELEGRAM_DEFAULT_REMINDER_PERIOD')
     sla_warning_threshold_ms: int = Field(3600000, env='SLA_WARNING_THRESHOLD_MS')
     my_watch_default_interval: int = Field(300, env='MY_WATCH_DEFAULT_INTERVAL')
+    outbound_concurrency: int = Field(8, env='OUTBOUND_CONCURRENCY')
+    outbound_global_rate: float = Field(25.0, env='OUTBOUND_GLOBAL_RATE')
+    outbound_chat_rate: float = Field(1.0, env='OUTBOUND_CHAT_RATE')
+    outbound_group_rate: float = Field(20 / 60, env='OUTBOUND_GROUP_RATE')
+    adaptive_polling: bool = Field(False, env='ADAPTIVE_POLLING')
+    adaptive_min_interval: int = Field(60, env='ADAPTIVE_MIN_INTERVAL')
+    adaptive_max_interval: int = Field(3600, env='ADAPTIVE_MAX_INTERVAL')
+    broadcast_digest_interval: int = Field(0, env='BROADCAST_DIGEST_INTERVAL')  # full list for /set ... delta, 0 = never
+    telegram_concurrent_updates: int = Field(8, env='TELEGRAM_CONCURRENT_UPDATES')
+    # Webhook mode: Telegram pushes updates to the embedded HTTP server instead of long polling
+    telegram_webhook_enabled: bool = Field(False, env='TELEGRAM_WEBHOOK_ENABLED')
+    telegram_webhook_url: Optional[str] = Field(None, env='TELEGRAM_WEBHOOK_URL')
+    telegram_webhook_path: str = Field('/telegram/webhook', env='TELEGRAM_WEBHOOK_PATH')
+    telegram_webhook_secret: Optional[str] = Field(None, env='TELEGRAM_WEBHOOK_SECRET')
+    telegram_webhook_max_connections: int = Field(40, env='TELEGRAM_WEBHOOK_MAX_CONNECTIONS')
 
     model_config = SettingsConfigDict(env_file=env_path, extra="allow")
 
 
+class StorageSettings(BaseSettings):
+    """Persistent state (subscriptions, watchers) settings"""
+    storage_backend: str = Field('sqlite', env='STORAGE_BACKEND')
+    storage_sqlite_path: str = Field(str(Path(__file__).parent / 'gbc_duty.sqlite3'), env='STORAGE_SQLITE_PATH')
+    storage_redis_url: Optional[str] = Field(None, env='STORAGE_REDIS_URL')
+    storage_flush_interval: int = Field(5, env='STORAGE_FLUSH_INTERVAL')
+
+    model_config = SettingsConfigDict(env_file=env_path, extra="ignore")
+
+
+class ServerSettings(BaseSettings):
+    """Embedded HTTP server (metrics, webhooks) settings"""
+    server_host: str = Field('127.0.0.1', env='SERVER_HOST')
+    server_port: int = Field(8080, env='SERVER_PORT')
+    metrics_enabled: bool = Field(False, env='METRICS_ENABLED')
+
+    model_config = SettingsConfigDict(env_file=env_path, extra="ignore")
+
+
+class ClusterSettings(BaseSettings):
+    """Several bot processes: one elected poller, stateless command workers"""
+    cluster_role: str = Field('all', env='CLUSTER_ROLE')  # all (one process does everything), poller or worker
+    cluster_lease_ttl: int = Field(30, env='CLUSTER_LEASE_TTL')
+    cluster_lease_renew: int = Field(10, env='CLUSTER_LEASE_RENEW')
+    cluster_sync_interval: int = Field(10, env='CLUSTER_SYNC_INTERVAL')
+
+    model_config = SettingsConfigDict(env_file=env_path, extra="ignore")
+
+
 class Settings(BaseSettings):
     """Main settings class that combines all other settings"""
 
     # database: DatabaseSettings = Field(default_factory=DatabaseSettings)
     jira: JiraSettings = Field(default_factory=JiraSettings)
     telegram: TelegramSettings = Field(default_factory=TelegramSettings)
+    storage: StorageSettings = Field(default_factory=StorageSettings)
+    server: ServerSettings = Field(default_factory=ServerSettings)
+    cluster: ClusterSettings = Field(default_factory=ClusterSettings)
+    log_level: str = Field('INFO', env='LOG_LEVEL')
     model_config = SettingsConfigDict(env_file=env_path, extra='ignore')
 
 
-# Create a global settings instance
-if os.path.exists(env_path):
-    settings = Settings()
-    logger.debug(f"Settings loaded: {settings}")
-else:
-    raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), env_path)
+# Create a global settings instance; values come from .env if it exists, otherwise from the environment
+settings = Settings()
+logger.debug(f"Settings loaded: {settings}")
 
 if __name__ == "__main__":
     settings = Settings()
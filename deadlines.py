@@ -0,0 +1,94 @@
+import heapq
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models import JiraIssue
+
+logger = logging.getLogger(__name__)
+
+
+def ttfr_breach_millis(issue: JiraIssue) -> Optional[int]:
+    """Breach time of the running TTFR cycle, None if the cycle is paused, stopped, breached or absent."""
+    try:
+        cycle = issue.fields.customfield_12671.ongoingCycle
+    except AttributeError:
+        return None
+    if not cycle or cycle.paused or cycle.breached or cycle.stopTime or not cycle.breachTime:
+        return None
+    return cycle.breachTime.epochMillis
+
+
+def ttfr_remaining_millis(issue: JiraIssue, now_ms: int) -> Optional[int]:
+    """
+    Remaining time of the ongoing TTFR cycle at now_ms, None if there is no cycle. A running cycle keeps counting
+    down after the fetch: its remaining time is capped by the time left until breachTime. Both bound the real
+    value from above and agree within calendar hours, so a snapshot that webhooks spare from polling stays honest.
+    """
+    try:
+        cycle = issue.fields.customfield_12671.ongoingCycle
+    except AttributeError:
+        return None
+    if not cycle:
+        return None
+    breach = ttfr_breach_millis(issue)
+    if breach is None:
+        return cycle.remainingTime.millis
+    return min(cycle.remainingTime.millis, breach - now_ms)
+
+
+class DeadlineIndex:
+    """
+    Min-heap предупреждений о TTFR, ключ - момент `breachTime - threshold`.
+
+    Каждый опрос синхронизирует индекс с текущими треками: новые циклы добавляются,
+    у изменившихся (пауза, остановка, другой breachTime) старая запись становится
+    неактуальной и отбрасывается при извлечении из кучи.
+    """
+
+    def __init__(self, threshold_ms: int):
+        self.threshold_ms = threshold_ms
+        self._heap: List[Tuple[int, str, int]] = []  # (fire_at_ms, key, breach_ms)
+        self._active: Dict[str, int] = {}  # key -> breach_ms currently scheduled
+        self._fired: Dict[str, int] = {}  # key -> breach_ms already warned about
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def sync(self, tracks: Iterable[JiraIssue]) -> None:
+        seen = set()
+        for issue in tracks:
+            seen.add(issue.key)
+            breach = ttfr_breach_millis(issue)
+            if breach is None:
+                self._active.pop(issue.key, None)
+                continue
+            if self._active.get(issue.key) == breach or self._fired.get(issue.key) == breach:
+                continue
+            self._active[issue.key] = breach
+            heapq.heappush(self._heap, (breach - self.threshold_ms, issue.key, breach))
+        for key in self._active.keys() - seen:
+            del self._active[key]
+        for key in self._fired.keys() - seen:
+            del self._fired[key]
+
+    def _is_current(self, entry: Tuple[int, str, int]) -> bool:
+        _, key, breach = entry
+        return self._active.get(key) == breach
+
+    def next_fire_ms(self) -> Optional[int]:
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now_ms: int) -> List[str]:
+        """Keys whose warning time has come. Each cycle is returned once."""
+        due = []
+        while self._heap and self._heap[0][0] <= now_ms:
+            entry = heapq.heappop(self._heap)
+            if not self._is_current(entry):
+                continue
+            _, key, breach = entry
+            del self._active[key]
+            self._fired[key] = breach
+            due.append(key)
+        return due
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Deque, Dict, List, Optional, Set
+
+from telegram import Bot
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from metrics import TELEGRAM_SEND_ERRORS, TELEGRAM_SEND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations: reserve() tells how long to wait for the next token."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self) -> float:
+        wait = self.wait_time()
+        self.tokens -= 1
+        return wait
+
+    def block(self, seconds: float) -> None:
+        """Drain the bucket for `seconds` (used when Telegram answers RetryAfter)."""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+@dataclass
+class OutboundMessage:
+    chat_id: int
+    text: str
+    parse_mode: Optional[str] = None
+    attempts: int = 0
+
+
+class OutboundDispatcher:
+    """
+    Центральная очередь исходящих сообщений в Telegram.
+
+    - не более `concurrency` одновременных запросов;
+    - общий token bucket (лимит бота) и отдельный на каждый чат (личные и групповые лимиты);
+    - RetryAfter выдерживается автоматически, сетевые ошибки повторяются;
+    - несколько ожидающих сообщений одному чату склеиваются в одно, если влезают в лимит Telegram.
+    Сообщения одного чата отправляются строго по порядку.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 8,
+        global_rate: float = 25.0,
+        chat_rate: float = 1.0,
+        group_rate: float = 20 / 60,
+        max_attempts: int = 5,
+    ):
+        self.concurrency = concurrency
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_attempts = max_attempts
+        self.bot: Optional[Bot] = None
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._pending: Dict[int, Deque[OutboundMessage]] = {}
+        self._scheduled: Set[int] = set()  # chats that are queued, delayed or being sent
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # negative ids are groups and channels, they have a per-minute limit
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            bucket = self._chat_buckets[chat_id] = TokenBucket(rate, max(1.0, rate * 3))
+        return bucket
+
+    @property
+    def pending(self) -> int:
+        """Messages queued and not yet sent."""
+        return sum(map(len, self._pending.values()))
+
+    def send(self, chat_id: int, text: str, parse_mode: Optional[str] = None) -> None:
+        """Queue a message; returns immediately."""
+        self._enqueue(OutboundMessage(chat_id=chat_id, text=text, parse_mode=parse_mode))
+
+    def _enqueue(self, message: OutboundMessage, front: bool = False) -> None:
+        queue = self._pending.setdefault(message.chat_id, deque())
+        if front:
+            queue.appendleft(message)
+        else:
+            queue.append(message)
+        self._idle.clear()
+        if message.chat_id not in self._scheduled:
+            self._scheduled.add(message.chat_id)
+            self._ready.put_nowait(message.chat_id)
+
+    def _requeue_later(self, chat_id: int, delay: float) -> None:
+        asyncio.get_running_loop().call_later(delay, self._ready.put_nowait, chat_id)
+
+    def _take_batch(self, chat_id: int) -> OutboundMessage:
+        """Pop the next message of the chat, merged with following ones of the same parse mode."""
+        queue = self._pending[chat_id]
+        message = queue.popleft()
+        if message.attempts:
+            return message
+        while queue and queue[0].parse_mode == message.parse_mode and not queue[0].attempts:
+            merged = f'{message.text}\n\n{queue[0].text}'
+            if len(merged) > TELEGRAM_MESSAGE_LIMIT:
+                break
+            message.text = merged
+            queue.popleft()
+        return message
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            try:
+                await self._process(chat_id)
+            except Exception as e:
+                logger.error(f'Dispatcher worker failed for {chat_id}: {e}')
+            finally:
+                self._ready.task_done()
+
+    async def _process(self, chat_id: int) -> None:
+        wait = max(self._bucket(chat_id).wait_time(), self._global.wait_time())
+        if wait > 0:
+            self._requeue_later(chat_id, wait)
+            return
+        self._bucket(chat_id).reserve()
+        self._global.reserve()
+
+        retrying = False
+        try:
+            message = self._take_batch(chat_id)
+            retry_in = await self._deliver(message)
+            if retry_in is not None:
+                message.attempts += 1
+                if message.attempts < self.max_attempts:
+                    self._enqueue_retry(message, retry_in)
+                    retrying = True
+                    return
+                logger.error(f'Dropping message to {chat_id} after {message.attempts} attempts')
+        finally:
+            # also when sending failed unexpectedly (the message is dropped): otherwise the chat stays
+            # scheduled forever, never gets queued again and stop() waits for it in vain
+            if not retrying:
+                self._release(chat_id)
+
+    def _release(self, chat_id: int) -> None:
+        """Done with the chat's head message: queue the chat again if more is pending, else unschedule it."""
+        if self._pending.get(chat_id):
+            self._ready.put_nowait(chat_id)
+        else:
+            self._pending.pop(chat_id, None)
+            self._scheduled.discard(chat_id)
+            if not self._scheduled:
+                self._idle.set()
+
+    def _enqueue_retry(self, message: OutboundMessage, delay: float) -> None:
+        self._pending[message.chat_id].appendleft(message)
+        self._requeue_later(message.chat_id, delay)
+
+    async def _deliver(self, message: OutboundMessage) -> Optional[float]:
+        """Send one message. Returns a delay to retry after, or None when done (sent or dropped)."""
+        try:
+            try:
+                with TELEGRAM_SEND_SECONDS.time():
+                    await self.bot.send_message(chat_id=message.chat_id, text=message.text,
+                                                parse_mode=message.parse_mode)
+            except TelegramError as e:
+                TELEGRAM_SEND_ERRORS.inc(error=type(e).__name__)
+                raise
+            return None
+        except RetryAfter as e:
+            delay = e.retry_after.total_seconds() if isinstance(e.retry_after, timedelta) else e.retry_after
+            logger.warning(f'Flood control for {message.chat_id}, retry in {delay}s')
+            self._global.block(delay)
+            return delay
+        except ChatMigrated as e:
+            logger.info(f'Chat {message.chat_id} migrated to {e.new_chat_id}')
+            self._enqueue(OutboundMessage(chat_id=e.new_chat_id, text=message.text, parse_mode=message.parse_mode))
+            return None
+        except (Forbidden, BadRequest) as e:
+            logger.error(f'Failed to send message to {message.chat_id}: {e}')
+            return None
+        except NetworkError as e:
+            logger.warning(f'Network error sending to {message.chat_id}: {e}')
+            return min(2 ** message.attempts, 60)
+
+    async def start(self, bot: Bot) -> None:
+        self.bot = bot
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Wait for queued messages to go out (up to timeout), then stop the workers."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f'Dispatcher stopped with {self.pending} unsent messages')
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
@@ -0,0 +1,338 @@
+import bisect
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import unquote
+
+from deadlines import ttfr_breach_millis
+from models import JiraIssue
+
+logger = logging.getLogger(__name__)
+
+UNASSIGNED = ''
+SLA_STATES = ('running', 'paused', 'breached', 'none')
+TTFR_FILTER_RE = re.compile(r'^ttfr<(\d+)([mh]?)$', re.IGNORECASE)
+
+# Profile team leads from /zen: a track belongs to the team if it matches any of its filters
+TEAM_ROUTES: Dict[str, Tuple[str, ...]] = {
+    'сергей-роман': ('AKBREXT', 'system=anti_money_laundering,anti-fraud'),
+    'иван': ('project=BOTEXT,RSBEXT',),
+    'семен': ('LTBEXT',),
+    'тимофей': ('GPBEXT',),
+    'антон-сергей': ('INGSEXT',),
+    'ярослав': ('project=VBREXT,LOKOBEXT,EUBEXT',),
+    'тимофей-антон': ('LMREXT',),  # and OTP, whose tracks carry no key prefix of their own yet
+    'марат-айнур-роман-тимофей': ('project=MKBEXT,SZGEXT,AVOEXT,MTSBEXT',),
+}
+
+
+def sla_state(issue: JiraIssue) -> str:
+    """State of the TTFR cycle; running cycles are additionally indexed by their breach time."""
+    try:
+        cycle = issue.fields.customfield_12671.ongoingCycle
+    except AttributeError:
+        return 'none'
+    if not cycle or cycle.stopTime:
+        return 'none'
+    if cycle.breached:
+        return 'breached'
+    if cycle.paused:
+        return 'paused'
+    return 'running' if cycle.breachTime else 'none'
+
+
+@dataclass
+class IssueFilter:
+    """/check filters: values of one field are alternatives (OR), different fields must all match (AND)."""
+    projects: Set[str] = field(default_factory=set)
+    statuses: Set[str] = field(default_factory=set)
+    assignees: Set[str] = field(default_factory=set)
+    systems: Set[str] = field(default_factory=set)  # case-insensitive substrings of the option value
+    sla_states: Set[str] = field(default_factory=set)
+    ttfr_within_ms: Optional[int] = None  # running cycles that breach within this time
+    teams: Set[str] = field(default_factory=set)  # TEAM_ROUTES names, a track matches any route of the team
+
+    def __bool__(self) -> bool:
+        return bool(self.projects or self.statuses or self.assignees or self.systems or self.sla_states
+                    or self.ttfr_within_ms is not None or self.teams)
+
+    @property
+    def spec(self) -> str:
+        """Canonical text of the filter: parses back to an equal filter, equal filters have equal specs."""
+        parts = []
+        for name, values, encode in (('project', self.projects, str), ('status', self.statuses, _spaced),
+                                     ('assignee', self.assignees, str), ('system', self.systems, _spaced),
+                                     ('team', self.teams, str)):
+            if values:
+                parts.append(f"{name}={','.join(sorted(encode(value) or 'none' for value in values))}")
+        parts += sorted('nosla' if state == 'none' else state for state in self.sla_states)
+        if self.ttfr_within_ms is not None:
+            parts.append(f'ttfr<{self.ttfr_within_ms // 60000}m')
+        return ' '.join(parts)
+
+
+Predicate = Callable[[JiraIssue, int], bool]
+
+
+def compile_filter(filters: IssueFilter) -> Predicate:
+    """
+    The filter as a predicate over one parsed issue (and the current time in ms) - the same answer as
+    IssueIndex.select, for slicing a shared poll result per subscriber and routing single pushed issues.
+    """
+    checks: List[Predicate] = []
+    if filters.projects:
+        projects = frozenset(filters.projects)
+        checks.append(lambda issue, now_ms: issue.key.split('-')[0] in projects)
+    if filters.statuses:
+        statuses = frozenset(filters.statuses)
+        checks.append(lambda issue, now_ms: issue.fields.status.name.lower() in statuses)
+    if filters.assignees:
+        assignees = frozenset(filters.assignees)
+        checks.append(lambda issue, now_ms: (issue.fields.assignee.name.lower() if issue.fields.assignee
+                                             else UNASSIGNED) in assignees)
+    if filters.systems:
+        systems = tuple(filters.systems)
+
+        def system_matches(issue: JiraIssue, now_ms: int) -> bool:
+            option = issue.fields.customfield_20672
+            value = (option.value or '').lower() if option else ''
+            return any(part in value for part in systems)
+        checks.append(system_matches)
+    if filters.sla_states or filters.ttfr_within_ms is not None:
+        states, within = frozenset(filters.sla_states), filters.ttfr_within_ms
+
+        def sla_matches(issue: JiraIssue, now_ms: int) -> bool:
+            state = sla_state(issue)
+            if state in states:
+                return True
+            return within is not None and state == 'running' and ttfr_breach_millis(issue) < now_ms + within
+        checks.append(sla_matches)
+    if filters.teams:
+        routes = [compile_filter(route) for team in sorted(filters.teams) for route in team_routes(team)]
+        checks.append(lambda issue, now_ms: any(route(issue, now_ms) for route in routes))
+    if not checks:
+        return lambda issue, now_ms: True
+    if len(checks) == 1:
+        return checks[0]
+    return lambda issue, now_ms: all(check(issue, now_ms) for check in checks)
+
+
+@lru_cache(maxsize=256)
+def compiled_filter(spec: str) -> Tuple[IssueFilter, Predicate]:
+    """Parsed and compiled filter of a stored subscription spec; specs are shared by many chats and ticks."""
+    filters, invalid = parse_check_filters(spec.split())
+    if invalid:
+        raise ValueError(f'invalid filter {invalid}')
+    return filters, compile_filter(filters)
+
+
+def team_key(name: str) -> str:
+    return name.strip().lower().replace('ё', 'е')
+
+
+@lru_cache(maxsize=None)
+def team_routes(team: str) -> Tuple[IssueFilter, ...]:
+    return tuple(parse_check_filters(route.split())[0] for route in TEAM_ROUTES[team])
+
+
+def _values(value: str) -> List[str]:
+    return [part.strip().lower() for part in value.split(',') if part.strip()]
+
+
+def _spaced_values(value: str) -> List[str]:
+    """Status and system values: `_` stands for a space (status=in_progress), %XX for a literal `_`, `,` or `%`."""
+    return [unquote(part.replace('_', ' ')).strip().lower() for part in value.split(',') if part.strip()]
+
+
+def _spaced(value: str) -> str:
+    """The spec form of a status or system value, _spaced_values reads it back unchanged."""
+    return value.replace('%', '%25').replace('_', '%5F').replace(',', '%2C').replace(' ', '_')
+
+
+def _route_projects() -> Set[str]:
+    projects = set()
+    for routes in TEAM_ROUTES.values():
+        for token in (token for route in routes for token in route.split()):
+            name, sep, value = token.partition('=')
+            if not sep:
+                projects.add(token.upper())
+            elif name.lower() == 'project':
+                projects.update(part.upper() for part in _values(value))
+    return projects
+
+
+ROUTE_PROJECTS = frozenset(_route_projects())  # projects that may be named by a bare word even without a snapshot
+
+
+def parse_check_filters(tokens: Iterable[str], projects: Iterable[str] = ()) -> Tuple[IssueFilter, List[str]]:
+    """
+    Parse /check arguments into a filter and the tokens that are not understood:
+    LTBEXT, project=LTBEXT,RSBEXT, status=open, status=in_progress, assignee=ivan.ivanov, unassigned,
+    system=credit, ttfr<30m, ttfr<2h, breached, paused, nosla, team=семен (see TEAM_ROUTES).
+    A bare word is a project only if it is one of `projects` (those in the snapshot) or of TEAM_ROUTES,
+    so that a typo like `unasigned` is reported instead of silently matching nothing.
+    """
+    known = ROUTE_PROJECTS.union(project.upper() for project in projects)
+    filters, invalid = IssueFilter(), []
+    for token in tokens:
+        name, sep, value = token.partition('=')
+        name = name.lower()
+        ttfr = TTFR_FILTER_RE.match(token)
+        if ttfr:
+            amount, unit = int(ttfr.group(1)), ttfr.group(2).lower() or 'm'
+            filters.ttfr_within_ms = amount * (3600000 if unit == 'h' else 60000)
+        elif not sep and name == 'unassigned':
+            filters.assignees.add(UNASSIGNED)
+        elif not sep and name in ('breached', 'paused'):
+            filters.sla_states.add(name)
+        elif not sep and name == 'nosla':
+            filters.sla_states.add('none')
+        elif not sep and token.upper() in known:
+            filters.projects.add(token.upper())
+        elif sep and name == 'project' and value:
+            filters.projects.update(value.upper() for value in _values(value))
+        elif sep and name == 'status' and value:
+            filters.statuses.update(_spaced_values(value))
+        elif sep and name == 'assignee' and value:
+            filters.assignees.update(UNASSIGNED if value in ('none', 'unassigned') else value
+                                     for value in _values(value))
+        elif sep and name == 'system' and value:
+            filters.systems.update(_spaced_values(value))
+        elif sep and name == 'team' and value and all(team_key(team) in TEAM_ROUTES for team in value.split(',')):
+            filters.teams.update(team_key(team) for team in value.split(','))
+        else:
+            invalid.append(token)
+    return filters, invalid
+
+
+class IssueIndex:
+    """
+    Индексы последнего снимка треков: проект, статус, исполнитель, EXT System / Service и состояние TTFR.
+
+    Обновляется по ключам, которые изменились за опрос, а не перестраивается целиком.
+    Запущенные TTFR-циклы дополнительно отсортированы по breachTime, поэтому фильтр
+    `ttfr<30m` считается относительно текущего момента, а не момента опроса.
+    """
+
+    def __init__(self, tracks: Iterable[JiraIssue] = ()):
+        self.issues: Dict[str, JiraIssue] = {}
+        self._order: Dict[str, int] = {}  # key -> position of first appearance, answers keep the poll order
+        self._next = 0
+        self._attrs: Dict[str, Tuple[str, str, str, str, str, Optional[int]]] = {}
+        self.projects: Dict[str, Set[str]] = {}
+        self.statuses: Dict[str, Set[str]] = {}
+        self.assignees: Dict[str, Set[str]] = {}
+        self.systems: Dict[str, Set[str]] = {}
+        self.sla_states: Dict[str, Set[str]] = {}
+        self._deadlines: List[Tuple[int, str]] = []  # sorted (breach_ms, key) of running cycles
+        for track in tracks:
+            self.upsert(track)
+
+    def __len__(self) -> int:
+        return len(self.issues)
+
+    def upsert(self, issue: JiraIssue) -> None:
+        key, fields = issue.key, issue.fields
+        system = fields.customfield_20672.value if fields.customfield_20672 else None
+        state = sla_state(issue)
+        attrs = (
+            key.split('-')[0],
+            fields.status.name.lower(),
+            fields.assignee.name.lower() if fields.assignee else UNASSIGNED,
+            system or '',
+            state,
+            ttfr_breach_millis(issue) if state == 'running' else None,
+        )
+        self.issues[key] = issue
+        if key not in self._order:
+            self._order[key] = self._next
+            self._next += 1
+        if self._attrs.get(key) == attrs:
+            return
+        self._unindex(key)
+        self._attrs[key] = attrs
+        project, status, assignee, system, state, breach = attrs
+        for index, value in zip(self._indexes, (project, status, assignee, system, state)):
+            index.setdefault(value, set()).add(key)
+        if breach is not None:
+            bisect.insort(self._deadlines, (breach, key))
+
+    def remove(self, key: str) -> None:
+        if self.issues.pop(key, None) is None:
+            return
+        self._order.pop(key, None)
+        self._unindex(key)
+
+    def apply(self, issues: Dict[str, JiraIssue], added: Iterable[str] = (), changed: Iterable[str] = (),
+              removed: Iterable[str] = (), refreshed: Iterable[str] = ()) -> None:
+        """
+        Follow a snapshot change: only the keys it reports are re-indexed. `refreshed` ones are newer copies
+        that differ in nothing indexed (live SLA counters): they replace the stored issue as they are.
+        """
+        for key in removed:
+            self.remove(key)
+        for key in added:
+            self.upsert(issues[key])
+        for key in changed:
+            self.upsert(issues[key])
+        for key in refreshed:
+            self.issues[key] = issues[key]
+
+    @property
+    def _indexes(self) -> Tuple[Dict[str, Set[str]], ...]:
+        return self.projects, self.statuses, self.assignees, self.systems, self.sla_states
+
+    def _unindex(self, key: str) -> None:
+        attrs = self._attrs.pop(key, None)
+        if attrs is None:
+            return
+        for index, value in zip(self._indexes, attrs[:5]):
+            keys = index.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+        breach = attrs[5]
+        if breach is not None:
+            position = bisect.bisect_left(self._deadlines, (breach, key))
+            if position < len(self._deadlines) and self._deadlines[position] == (breach, key):
+                del self._deadlines[position]
+
+    def _breaching_before(self, deadline_ms: int) -> Set[str]:
+        end = bisect.bisect_left(self._deadlines, (deadline_ms, ''))
+        return {key for _, key in self._deadlines[:end]}
+
+    def select(self, filters: IssueFilter, now_ms: Optional[int] = None) -> List[JiraIssue]:
+        """Tracks matching the filter, in the order they first appeared in the polls."""
+        if not filters:
+            return list(self.issues.values())
+        keys = self._select_keys(filters, int(time.time() * 1000) if now_ms is None else now_ms)
+        return [self.issues[key] for key in sorted(keys, key=self._order.__getitem__)]
+
+    def _select_keys(self, filters: IssueFilter, now_ms: int) -> Set[str]:
+        if not filters:
+            return set(self.issues)
+        candidates: List[Set[str]] = []
+        if filters.projects:
+            candidates.append(set().union(*(self.projects.get(value, ()) for value in filters.projects)))
+        if filters.statuses:
+            candidates.append(set().union(*(self.statuses.get(value, ()) for value in filters.statuses)))
+        if filters.assignees:
+            candidates.append(set().union(*(self.assignees.get(value, ()) for value in filters.assignees)))
+        if filters.systems:
+            # a handful of distinct systems: substring match over the index keys, not over the issues
+            candidates.append(set().union(*(keys for system, keys in self.systems.items()
+                                            if any(part in system.lower() for part in filters.systems))))
+        sla: List[Set[str]] = [self.sla_states.get(state, set()) for state in filters.sla_states]
+        if filters.ttfr_within_ms is not None:
+            sla.append(self._breaching_before(now_ms + filters.ttfr_within_ms))
+        if sla:
+            candidates.append(set().union(*sla))
+        if filters.teams:
+            candidates.append(set().union(*(self._select_keys(route, now_ms)
+                                            for team in filters.teams for route in team_routes(team))))
+        candidates.sort(key=len)
+        return candidates[0].intersection(*candidates[1:])
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from cache import CircuitBreaker, CircuitOpenError
+
+from metrics import JIRA_REQUEST_ERRORS, JIRA_REQUEST_SECONDS
+
+if TYPE_CHECKING:
+    from jira import JIRA
+
+logger = logging.getLogger(__name__)
+
+
+class JiraTimeoutError(Exception):
+    """Jira did not answer within the configured timeout."""
+
+
+def is_outage(error: Exception) -> bool:
+    """Errors that say Jira is unhealthy. A 4xx answer (bad JQL, no permission) means Jira works."""
+    from jira import JIRAError  # already imported by the failed call
+
+    if isinstance(error, JIRAError) and error.status_code is not None:
+        return error.status_code >= 500
+    return True
+
+
+def is_bad_request(error: Exception) -> bool:
+    """Jira rejected the query itself (400): sent again as is, it fails again."""
+    from jira import JIRAError  # already imported by the failed call
+
+    return isinstance(error, JIRAError) and error.status_code == 400
+
+
+class AsyncJira:
+    """
+    Асинхронная обёртка над синхронным клиентом jira.JIRA.
+    Клиент создаётся фабрикой `connect` при первом запросе, в потоке пула, а не при импорте.
+    Запросы выполняются в ограниченном пуле потоков, поэтому медленный Jira не блокирует event loop бота.
+    С breaker'ом при серии сбоев запросы отклоняются сразу (CircuitOpenError), не нагружая Jira.
+    """
+
+    def __init__(self, connect: Callable[[], 'JIRA'], max_concurrency: int = 4, timeout: float = 20.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.connect = connect
+        self.timeout = timeout
+        self.breaker = breaker
+        self._client: Optional['JIRA'] = None
+        self._client_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='jira')
+
+    @property
+    def client(self) -> 'JIRA':
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self.connect()
+        return self._client
+
+    async def _run(self, method: str, *args, **kwargs) -> Any:
+        if self.breaker and not self.breaker.allow():
+            JIRA_REQUEST_ERRORS.inc(method=method, error='circuit_open')
+            raise CircuitOpenError(f'Jira calls are paused for {self.breaker.retry_in:.0f}s after repeated failures')
+        loop = asyncio.get_running_loop()
+
+        def call():
+            return getattr(self.client, method)(*args, **kwargs)
+
+        try:
+            with JIRA_REQUEST_SECONDS.time(method=method):
+                result = await asyncio.wait_for(loop.run_in_executor(self._executor, call), timeout=self.timeout)
+        except asyncio.TimeoutError as e:
+            JIRA_REQUEST_ERRORS.inc(method=method, error='timeout')
+            logger.error(f'Jira call {method} timed out after {self.timeout}s')
+            self._record(e)
+            raise JiraTimeoutError(f'Jira did not answer in {self.timeout}s')
+        except asyncio.CancelledError:
+            if self.breaker:
+                self.breaker.release()
+            raise
+        except Exception as e:
+            JIRA_REQUEST_ERRORS.inc(method=method, error=type(e).__name__)
+            self._record(e)
+            raise
+        self._record()
+        return result
+
+    def _record(self, error: Optional[Exception] = None) -> None:
+        """Feed the outcome of a call to the breaker: any answer from Jira counts as success."""
+        if self.breaker is None:
+            return
+        if error is not None and is_outage(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    async def search_issues(self, jql_str: str, **kwargs) -> Dict[str, Any]:
+        """Run search_issues(json_result=True) without blocking the event loop."""
+        return await self._run('search_issues', jql_str=jql_str, json_result=True, **kwargs)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from cache import CachedResult
+from metrics import LOOKUP_KEYS
+from models import JiraIssue
+
+logger = logging.getLogger(__name__)
+
+ISSUE_KEY_RE = re.compile(r'^[A-Z][A-Z0-9_]*-[1-9][0-9]*$')
+
+
+def parse_issue_keys(tokens: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    Split /get arguments into valid issue keys (upper-cased, de-duplicated, in order) and rejected tokens.
+    Keys may be separated by spaces or commas; browse links are reduced to their key.
+    """
+    keys, invalid = {}, []
+    for token in tokens:
+        for part in token.split(','):
+            part = part.strip().rstrip('/').rsplit('/', 1)[-1]
+            if not part:
+                continue
+            key = part.upper()
+            if ISSUE_KEY_RE.match(key):
+                keys[key] = None
+            else:
+                invalid.append(part)
+    return list(keys), invalid
+
+
+class IssueLookup:
+    """
+    Движок /get: поиск треков по ключам.
+
+    Недавно полученные треки (и отсутствующие в Jira ключи) отдаются из TTL+LRU кэша.
+    Промахи, пришедшие в течение batch_window от разных запросов, собираются в одну
+    пачку и запрашиваются `key in (...)` кусками по chunk_size ключей, не больше
+    concurrency запросов одновременно. Если Jira не ответил, отдаются устаревшие копии.
+    """
+
+    def __init__(self, fetch: Callable[[List[str]], Awaitable[List[JiraIssue]]], ttl: float = 30.0,
+                 max_entries: int = 1000, batch_window: float = 0.05, chunk_size: int = 100, concurrency: int = 4):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.batch_window = batch_window
+        self.chunk_size = chunk_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._entries: 'OrderedDict[str, CachedResult[Optional[JiraIssue]]]' = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._queued: List[str] = []
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def get(self, keys: List[str]) -> Dict[str, CachedResult[Optional[JiraIssue]]]:
+        """Result per key; the value is None for keys Jira does not know. Raises if Jira fails and nothing is cached."""
+        results: Dict[str, CachedResult[Optional[JiraIssue]]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None and entry.age < self.ttl:
+                self._entries.move_to_end(key)
+                LOOKUP_KEYS.inc(result='hit')
+                results[key] = entry
+            else:
+                waiting[key] = self._request(key)
+        if waiting:
+            # shield: a cancelled /get must not cancel a fetch that other requests are waiting for too
+            outcomes = await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()),
+                                            return_exceptions=True)
+            for key, outcome in zip(waiting, outcomes):
+                if not isinstance(outcome, Exception):
+                    results[key] = outcome
+                    continue
+                entry = self._entries.get(key)
+                if entry is None:
+                    raise outcome
+                logger.warning(f'Serving {entry.age:.0f}s old {key}, Jira failed: {outcome}')
+                results[key] = CachedResult(entry.value, entry.fetched_at, stale=True)
+        return {key: results[key] for key in keys}
+
+    def _request(self, key: str) -> asyncio.Future:
+        future = self._inflight.get(key)
+        if future is not None:
+            LOOKUP_KEYS.inc(result='coalesced')
+            return future
+        LOOKUP_KEYS.inc(result='miss')
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        # nobody may be left to retrieve a failure (all callers cancelled): don't log it as never retrieved
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._queued.append(key)
+        if self._flusher is None:
+            self._flusher = asyncio.ensure_future(self._flush_later())
+        return future
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.batch_window)
+        batch, self._queued, self._flusher = self._queued, [], None
+        chunks = [batch[start:start + self.chunk_size] for start in range(0, len(batch), self.chunk_size)]
+        logger.debug(f'Looking up {len(batch)} keys in {len(chunks)} Jira queries')
+        await asyncio.gather(*(self._fetch_chunk(chunk) for chunk in chunks))
+
+    async def _fetch_chunk(self, keys: List[str]) -> None:
+        try:
+            async with self._semaphore:
+                issues = await self.fetch(keys)
+        except Exception as e:
+            for key in keys:
+                self._inflight.pop(key).set_exception(e)
+            return
+        found = {issue.key: issue for issue in issues}
+        for key in keys:
+            self._inflight.pop(key).set_result(self._store(key, found.get(key)))
+
+    def _store(self, key: str, issue: Optional[JiraIssue]) -> CachedResult[Optional[JiraIssue]]:
+        entry = self._entries[key] = CachedResult(issue, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def refresh(self, issues: Iterable[JiraIssue] = (), deleted: Iterable[str] = ()) -> None:
+        """Newer copies from elsewhere (Jira webhooks): update keys that are cached, forget deleted ones."""
+        for issue in issues:
+            if issue.key in self._entries:
+                self._entries[issue.key] = CachedResult(issue, time.time())
+        for key in deleted:
+            self._entries.pop(key, None)
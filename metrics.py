@@ -0,0 +1,205 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, registry: 'Registry', name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        """(suffix, labels, value) triples in exposition order."""
+        for key, value in sorted(self._values.items()):
+            yield '', _format_labels(self.labelnames, key), value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(f'{self.name}{suffix}{labels} {_format_value(value)}' for suffix, labels, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down; with `collect` it is read from a callback at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, *args, collect: Optional[Callable[[], float]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.collect = collect
+
+    def set(self, value: float, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        self._values[self._key(labels)] = value
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        if self.collect is not None:
+            yield '', '', self.collect()
+        yield from super().samples()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # per-bucket counts (last one is +Inf), sum, count
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the duration of the block in seconds."""
+        if not self.registry.enabled:
+            return nullcontext()
+        return self._timer(labels)
+
+    @contextmanager
+    def _timer(self, labels: Dict[str, object]):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile: coarse, but enough for /stats."""
+        state = self._values.get(self._key(labels))
+        if not state or not state[2]:
+            return None
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), state[0]):
+            cumulative += count
+            if cumulative >= q * state[2]:
+                return bound
+        return float('inf')
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                yield '_bucket', _format_labels(self.labelnames, key, f'le="{le}"'), cumulative
+            yield '_sum', _format_labels(self.labelnames, key), total
+            yield '_count', _format_labels(self.labelnames, key), count
+
+
+class Registry:
+    """
+    Реестр метрик в формате Prometheus.
+    Пока enabled=False, inc/set/observe/time ничего не делают, так что инструментирование
+    горячих путей почти ничего не стоит.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              collect: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames, collect=collect))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets=buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> str:
+        """Short human-readable digest for the /stats command."""
+        lines = []
+        for metric in self._metrics.values():
+            if isinstance(metric, Histogram):
+                for key, (_, total, count) in sorted(metric._values.items()):
+                    labels = dict(zip(metric.labelnames, key))
+                    p95 = metric.quantile(0.95, **labels)
+                    lines.append(f'{metric.name}{_format_labels(metric.labelnames, key)}: '
+                                 f'n={count} avg={total / count:.3f} p95<={p95:g}')
+            else:
+                lines.extend(f'{metric.name}{labels}: {_format_value(value)}' for _, labels, value in metric.samples())
+        return '\n'.join(lines) or 'No metrics collected yet'
+
+
+registry = Registry()
+
+JIRA_REQUEST_SECONDS = registry.histogram(
+    'gbc_jira_request_seconds', 'Latency of Jira REST calls', ['method'])
+JIRA_REQUEST_ERRORS = registry.counter(
+    'gbc_jira_request_errors_total', 'Failed Jira REST calls', ['method', 'error'])
+JIRA_PAGES = registry.counter(
+    'gbc_jira_pages_total', 'Search result pages fetched from Jira')
+JIRA_QUERY_ISSUES = registry.histogram(
+    'gbc_jira_query_issues', 'Issues returned by one search query', buckets=COUNT_BUCKETS)
+PARSE_SECONDS = registry.histogram(
+    'gbc_parse_seconds', 'Time to decode one page of raw issues', ['decoder'])
+RENDER_SECONDS = registry.histogram(
+    'gbc_render_seconds', 'Time to render tracks into a message', ['mode'])
+TELEGRAM_SEND_SECONDS = registry.histogram(
+    'gbc_telegram_send_seconds', 'Latency of Telegram sendMessage calls')
+TELEGRAM_SEND_ERRORS = registry.counter(
+    'gbc_telegram_send_errors_total', 'Failed Telegram sendMessage calls', ['error'])
+JOB_LAG_SECONDS = registry.histogram(
+    'gbc_job_lag_seconds', 'Delay between the scheduled and the actual start of a job', ['job'])
+NOTIFICATIONS = registry.histogram(
+    'gbc_notifications_per_tick', 'Notifications queued by one job run', ['job'], buckets=COUNT_BUCKETS)
+CACHE_REQUESTS = registry.counter(
+    'gbc_cache_requests_total', 'Lookups in the Jira result cache', ['result'])
+LOOKUP_KEYS = registry.counter(
+    'gbc_lookup_keys_total', 'Issue keys requested with /get', ['result'])
+WEBHOOK_EVENTS = registry.counter(
+    'gbc_webhook_events_total', 'Jira webhook deliveries', ['event', 'result'])
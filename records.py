@@ -0,0 +1,135 @@
+from typing import Any, Dict, List, Optional
+
+
+class Record:
+    """
+    Компактные записи для горячего цикла опроса.
+
+    Повторяют пути атрибутов models.JiraIssue (issue.fields.status.name,
+    issue.fields.customfield_12671.ongoingCycle.remainingTime.millis, ...), но содержат
+    только то, что читают бот и SLA-проверки, и проверяют только эти поля.
+    Полная pydantic-модель остаётся для отладки и выгрузки: parse_jira_issues(..., fast=False).
+    """
+    __slots__ = ()
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other: object) -> bool:
+        return type(other) is type(self) and self._values() == other._values()
+
+    def __hash__(self) -> int:
+        return hash(self._values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The JSON shape the record was parsed from (the part of it that is kept)."""
+        return {name: value.to_dict() if isinstance(value, Record) else value
+                for name, value in zip(self.__slots__, self._values())}
+
+    def __repr__(self) -> str:
+        args = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({args})'
+
+
+def _require(data: Dict[str, Any], name: str, kind: type) -> Any:
+    value = data[name]
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise ValueError(f'{name}: expected {kind.__name__}, got {type(value).__name__}')
+    return value
+
+
+def _optional_bool(data: Dict[str, Any], name: str) -> Optional[bool]:
+    value = data.get(name)
+    if value is not None and not isinstance(value, bool):
+        raise ValueError(f'{name}: expected bool, got {type(value).__name__}')
+    return value
+
+
+class TimeRecord(Record):
+    __slots__ = ('epochMillis', 'friendly')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.epochMillis = _require(data, 'epochMillis', int)
+        self.friendly = _require(data, 'friendly', str)
+
+
+class DurationRecord(Record):
+    __slots__ = ('millis', 'friendly')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.millis = _require(data, 'millis', int)
+        self.friendly = _require(data, 'friendly', str)
+
+
+class CycleRecord(Record):
+    __slots__ = ('breached', 'paused', 'withinCalendarHours', 'stopTime', 'breachTime',
+                 'goalDuration', 'elapsedTime', 'remainingTime')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.breached = _require(data, 'breached', bool)
+        self.paused = _optional_bool(data, 'paused')
+        self.withinCalendarHours = _optional_bool(data, 'withinCalendarHours')
+        self.stopTime = TimeRecord(data['stopTime']) if data.get('stopTime') else None
+        self.breachTime = TimeRecord(data['breachTime']) if data.get('breachTime') else None
+        self.goalDuration = DurationRecord(data['goalDuration'])
+        self.elapsedTime = DurationRecord(data['elapsedTime'])
+        self.remainingTime = DurationRecord(data['remainingTime'])
+
+
+class SLARecord(Record):
+    __slots__ = ('name', 'ongoingCycle')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.name = _require(data, 'name', str)
+        self.ongoingCycle = CycleRecord(data['ongoingCycle']) if data.get('ongoingCycle') else None
+
+
+class UserRecord(Record):
+    __slots__ = ('name', 'key', 'emailAddress', 'displayName')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.name = _require(data, 'name', str)
+        self.key = data.get('key')
+        self.emailAddress = data.get('emailAddress')  # /mywatch may name the assignee by e-mail
+        self.displayName = _require(data, 'displayName', str)
+
+
+class StatusRecord(Record):
+    __slots__ = ('id', 'name')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.id = _require(data, 'id', str)
+        self.name = _require(data, 'name', str)
+
+
+class OptionRecord(Record):
+    __slots__ = ('value',)
+
+    def __init__(self, data: Dict[str, Any]):
+        self.value = _require(data, 'value', str)
+
+
+class FieldsRecord(Record):
+    __slots__ = ('summary', 'status', 'assignee', 'customfield_12671', 'customfield_12670', 'customfield_20672')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.summary = _require(data, 'summary', str)
+        self.status = StatusRecord(data['status'])
+        self.assignee = UserRecord(data['assignee']) if data.get('assignee') else None
+        self.customfield_12671 = SLARecord(data['customfield_12671']) if data.get('customfield_12671') else None
+        self.customfield_12670 = SLARecord(data['customfield_12670']) if data.get('customfield_12670') else None
+        self.customfield_20672 = OptionRecord(data['customfield_20672']) if data.get('customfield_20672') else None
+
+
+class IssueRecord(Record):
+    __slots__ = ('id', 'key', 'self', 'fields')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.id = _require(data, 'id', str)
+        self.key = _require(data, 'key', str)
+        self.self = _require(data, 'self', str)
+        self.fields = FieldsRecord(data['fields'])
+
+
+def parse_records(data_json: List[Dict[str, Any]]) -> List[IssueRecord]:
+    return [IssueRecord(track) for track in data_json]
@@ -0,0 +1,115 @@
+import html
+import logging
+import time
+from functools import lru_cache
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from deadlines import ttfr_remaining_millis
+from models import JiraIssue
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+JIRA_BROWSE_URL = 'https://jira.glowbyteconsulting.com/browse'  # for issues without a `self` link
+HTML = 'HTML'  # telegram.constants.ParseMode.HTML; None renders plain text
+
+
+def browse_url(issue: JiraIssue) -> str:
+    """Browse prefix of the Jira the issue came from, taken from its REST `self` link."""
+    base, sep, _ = str(issue.self or '').partition('/rest/')
+    return f'{base}/browse' if sep else JIRA_BROWSE_URL
+
+
+def friendly_duration(ms: int) -> str:
+    """Jira's short form of a duration: 2h 5m, 45m, -1h 10m."""
+    hours, minutes = divmod(abs(ms) // 60000, 60)
+    sign = '-' if ms < 0 else ''
+    return f'{sign}{hours}h {minutes}m' if hours else f'{sign}{minutes}m'
+
+
+def issue_block(issue: JiraIssue, parse_mode: Optional[str] = None) -> str:
+    """One issue as shown in /check, /get and broadcasts; a running TTFR is shown as of now, not as of the fetch."""
+    fields = issue.fields
+    try:
+        cycle = fields.customfield_12671.ongoingCycle
+        sla = (cycle.goalDuration.friendly, cycle.elapsedTime.friendly, cycle.remainingTime.friendly)
+        remaining = ttfr_remaining_millis(issue, int(time.time() * 1000))
+        if remaining != cycle.remainingTime.millis:
+            elapsed = cycle.elapsedTime.millis + cycle.remainingTime.millis - remaining
+            sla = (sla[0], friendly_duration(elapsed), friendly_duration(remaining))
+    except AttributeError:
+        sla = None
+    assignee = fields.assignee.displayName if fields.assignee else 'Unassigned'
+    return _issue_block(parse_mode, browse_url(issue), issue.key, fields.summary, assignee, fields.status.name, sla)
+
+
+@lru_cache(maxsize=16384)
+def _issue_block(parse_mode: Optional[str], browse: str, key: str, summary: str, assignee: str, status: str,
+                 sla: Optional[Tuple[str, str, str]]) -> str:
+    # keyed by the displayed values: an issue that did not change between polls is not formatted or escaped again
+    if parse_mode == HTML:
+        link = f'<a href="{browse}/{key}">{key}</a>'
+        summary, assignee, status = html.escape(summary), html.escape(assignee), html.escape(status)
+        sla = tuple(map(html.escape, sla)) if sla else None
+    else:
+        link = f'[{key}]({browse}/{key})'
+    lines = [link, f'Summary: {summary}', f'Assignee: {assignee}', f'Status: {status}']
+    if sla:
+        lines += [f'Goal duration: {sla[0]}', f'Elapsed Time: {sla[1]}', f'Time remaining: {sla[2]}']
+    else:
+        lines.append('NO SLA set for this track!')
+    return '\n'.join(lines) + '\n\n\n'
+
+
+def issue_blocks(tracks: Iterable[JiraIssue], parse_mode: Optional[str] = None, title: str = '') -> Iterator[str]:
+    """Blocks of the tracks, rendered lazily; `title` is glued to the first one so it never ends a message."""
+    blocks = (issue_block(track, parse_mode) for track in tracks)
+    first = next(blocks, None)
+    if first is None:
+        return
+    yield title + first
+    yield from blocks
+
+
+def _split_oversized(part: str, limit: int) -> Iterator[str]:
+    while len(part) > limit:
+        cut = part.rfind('\n', 0, limit)
+        cut = cut + 1 if cut > 0 else limit
+        yield part[:cut]
+        part = part[cut:]
+    if part:
+        yield part
+
+
+def pack_messages(parts: Iterable[str], limit: int = TELEGRAM_MESSAGE_LIMIT, separator: str = '') -> Iterator[str]:
+    """
+    Pack parts into as few messages of at most `limit` characters as possible, keeping their order.
+    Parts are never split unless a single one is longer than the limit.
+    """
+    chunk: List[str] = []
+    size = 0
+    for part in parts:
+        for piece in (part,) if len(part) <= limit else _split_oversized(part, limit):
+            extra = len(piece) + (len(separator) if chunk else 0)
+            if chunk and size + extra > limit:
+                yield separator.join(chunk)
+                chunk, size, extra = [], 0, len(piece)
+            chunk.append(piece)
+            size += extra
+    if chunk:
+        yield separator.join(chunk)
+
+
+def render_messages(tracks: Iterable[JiraIssue], parse_mode: Optional[str] = None, header: str = '',
+                    empty: str = 'No issues found') -> List[str]:
+    """Tracks as a list of Telegram-sized messages; `header` opens the first one."""
+    messages = list(pack_messages(issue_blocks(tracks, parse_mode, title=header)))
+    return messages or [header + empty]
+
+
+def render_sections(sections: Iterable[Tuple[str, Iterable[JiraIssue]]], footer: str = '',
+                    parse_mode: Optional[str] = None) -> List[str]:
+    """Several titled lists of tracks (empty ones skipped) and a closing line, packed into messages."""
+    blocks = chain.from_iterable(issue_blocks(tracks, parse_mode, title=title) for title, tracks in sections)
+    return list(pack_messages(chain(blocks, [footer] if footer else [])))
@@ -0,0 +1,175 @@
+import logging
+import math
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from deadlines import ttfr_breach_millis
+from issue_index import IssueIndex, sla_state
+from models import JiraIssue
+
+logger = logging.getLogger(__name__)
+
+ORDER_BY_RE = re.compile(r'\s+ORDER\s+BY\s+.*$', re.IGNORECASE | re.DOTALL)
+
+
+def split_order_by(jql: str):
+    """Split 'filter ORDER BY ...' into (filter, ' ORDER BY ...')."""
+    match = ORDER_BY_RE.search(jql)
+    if not match:
+        return jql, ''
+    return jql[:match.start()], match.group(0)
+
+
+def issue_state(issue: JiraIssue) -> Tuple:
+    """
+    What rendering and the indexes look at: status, assignee, summary, EXT system, TTFR state and deadline.
+    The remaining time ticks on every poll and is left out, or nearly every open issue would count as changed.
+    """
+    fields = issue.fields
+    assignee = fields.assignee
+    system = fields.customfield_20672.value if fields.customfield_20672 else None
+    state = sla_state(issue)
+    return (fields.status.name, assignee.name if assignee else None, assignee.displayName if assignee else None,
+            fields.summary, system, state, ttfr_breach_millis(issue) if state == 'running' else None)
+
+
+@dataclass
+class SnapshotDelta:
+    added: Set[str] = field(default_factory=set)
+    changed: Set[str] = field(default_factory=set)
+    removed: Set[str] = field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+class IssueSnapshot:
+    """
+    Последнее известное состояние треков по одному JQL, ключ - issue key.
+
+    В инкрементальном режиме каждый опрос запрашивает только треки с `updated >= -Nm`
+    и сливает их в снимок. Треки, выпавшие из фильтра (закрыты, назначены), находятся
+    дешёвой сверкой по ключам раз в `reconcile_every` опросов. SLA-счётчики у треков,
+    которые не менялись, обновляются полной перезагрузкой раз в `full_refresh_every` опросов.
+    """
+
+    def __init__(
+        self,
+        jql: str,
+        incremental: bool = False,
+        reconcile_every: int = 6,
+        full_refresh_every: int = 0,
+        overlap_minutes: int = 1,
+    ):
+        self.jql = jql
+        self.incremental = incremental
+        self.reconcile_every = reconcile_every
+        self.full_refresh_every = full_refresh_every
+        self.overlap_minutes = overlap_minutes
+        self.issues: Dict[str, JiraIssue] = {}
+        self._states: Dict[str, Tuple] = {}  # issue_state of each issue, what `changed` is judged by
+        self.index = IssueIndex()  # follows every change of `issues`, answers /check filters
+        self.loaded = False
+        self.fetched_at: Optional[float] = None  # time.time() of the last successful poll start
+        self.polls = 0
+
+    @property
+    def tracks(self) -> List[JiraIssue]:
+        return list(self.issues.values())
+
+    def age(self) -> Optional[float]:
+        return time.time() - self.fetched_at if self.fetched_at is not None else None
+
+    def updated_since_jql(self, since: float) -> str:
+        base, order_by = split_order_by(self.jql)
+        minutes = math.ceil((time.time() - since) / 60) + self.overlap_minutes
+        return f'({base}) AND updated >= -{minutes}m{order_by}'
+
+    def replace(self, tracks: List[JiraIssue]) -> SnapshotDelta:
+        """Replace the whole snapshot with a full poll result."""
+        current = {track.key: track for track in tracks}
+        states = {key: issue_state(track) for key, track in current.items()}
+        delta = SnapshotDelta(
+            added=current.keys() - self.issues.keys(),
+            removed=self.issues.keys() - current.keys(),
+        )
+        kept = current.keys() & self.issues.keys()
+        delta.changed = {key for key in kept if states[key] != self._states[key]}
+        self.issues, self._states = current, states
+        self.loaded = True
+        self.index.apply(current, delta.added, delta.changed, delta.removed, refreshed=kept - delta.changed)
+        return delta
+
+    def merge(self, tracks: List[JiraIssue]) -> SnapshotDelta:
+        """Upsert updated tracks into the snapshot."""
+        delta, refreshed = SnapshotDelta(), set()
+        for track in tracks:
+            state = issue_state(track)
+            previous = self._states.get(track.key)
+            if previous is None:
+                delta.added.add(track.key)
+            elif previous != state:
+                delta.changed.add(track.key)
+            else:
+                refreshed.add(track.key)
+            self.issues[track.key], self._states[track.key] = track, state
+        self.index.apply(self.issues, delta.added, delta.changed, refreshed=refreshed)
+        return delta
+
+    def discard(self, keys: Set[str]) -> SnapshotDelta:
+        removed = {key for key in keys if self.issues.pop(key, None) is not None}
+        for key in removed:
+            del self._states[key]
+        self.index.apply(self.issues, removed=removed)
+        return SnapshotDelta(removed=removed)
+
+    def apply_pushed(self, updated: List[JiraIssue], gone: Set[str]) -> SnapshotDelta:
+        """Changes pushed by Jira webhooks: upsert issues that match the filter, drop the ones that left it."""
+        return self._combine(self.discard(gone), self.merge(updated))
+
+    async def refresh(
+        self,
+        fetch: Callable[[str], Awaitable[List[JiraIssue]]],
+        fetch_keys: Callable[[str], Awaitable[Set[str]]],
+    ) -> SnapshotDelta:
+        """Poll Jira and bring the snapshot up to date. Returns what changed."""
+        started = time.time()
+        self.polls += 1
+        full = (
+            not self.incremental
+            or not self.loaded
+            or (self.full_refresh_every and self.polls % self.full_refresh_every == 0)
+        )
+        if full:
+            delta = self.replace(await fetch(self.jql))
+        else:
+            delta = self.merge(await fetch(self.updated_since_jql(self.fetched_at)))
+            if self.reconcile_every and self.polls % self.reconcile_every == 0:
+                delta = self._combine(delta, await self.reconcile(fetch, fetch_keys))
+        self.fetched_at = started
+        logger.debug(f'snapshot {"full" if full else "incremental"} poll: {len(self.issues)} issues, '
+                     f'+{len(delta.added)} ~{len(delta.changed)} -{len(delta.removed)}')
+        return delta
+
+    async def reconcile(
+        self,
+        fetch: Callable[[str], Awaitable[List[JiraIssue]]],
+        fetch_keys: Callable[[str], Awaitable[Set[str]]],
+    ) -> SnapshotDelta:
+        """Key-only pass: drop issues that left the filter, fetch ones the incremental polls missed."""
+        base, _ = split_order_by(self.jql)
+        keys = await fetch_keys(base)
+        delta = self.discard(self.issues.keys() - keys)
+        missing = keys - self.issues.keys()
+        if missing:
+            delta = self._combine(delta, self.merge(await fetch(f'key in ({", ".join(sorted(missing))})')))
+        return delta
+
+    @staticmethod
+    def _combine(first: SnapshotDelta, second: SnapshotDelta) -> SnapshotDelta:
+        added = (first.added | second.added) - second.removed
+        changed = (first.changed | second.changed) - second.removed - added
+        removed = (first.removed | second.removed) - second.added
+        return SnapshotDelta(added=added, changed=changed, removed=removed)
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# namespace -> key -> value (None means delete)
+Batch = Dict[str, Dict[str, Optional[Any]]]
+
+
+class StateBackend(ABC):
+    """Key-value storage for bot state grouped by namespace. Values are JSON-serializable."""
+
+    @abstractmethod
+    def load(self, namespace: str) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def apply(self, batch: Batch) -> None:
+        ...
+
+    @abstractmethod
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """Take or renew the lease if it is free, expired or already ours. Atomic across processes."""
+
+    @abstractmethod
+    def release_lease(self, name: str, holder: str) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend(StateBackend):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None  # opened on first use, not at import
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS state ('
+                ' namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,'
+                ' PRIMARY KEY (namespace, key))'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)')
+            self._conn.commit()
+        return self._conn
+
+    def load(self, namespace: str) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._connection().execute(
+                'SELECT key, value FROM state WHERE namespace = ?', (namespace,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT value FROM state WHERE namespace = ? AND key = ?', (namespace, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def apply(self, batch: Batch) -> None:
+        upserts = [(ns, key, json.dumps(value, ensure_ascii=False))
+                   for ns, items in batch.items() for key, value in items.items() if value is not None]
+        deletes = [(ns, key) for ns, items in batch.items() for key, value in items.items() if value is None]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    'INSERT INTO state (namespace, key, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value',
+                    upserts,
+                )
+                conn.executemany('DELETE FROM state WHERE namespace = ? AND key = ?', deletes)
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        # processes on one host share the file and the clock; the conditional upsert is a single write
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    'INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at '
+                    'WHERE leases.holder = excluded.holder OR leases.expires_at < ?',
+                    (name, holder, now + ttl, now),
+                )
+                row = conn.execute('SELECT holder FROM leases WHERE name = ?', (name,)).fetchone()
+        return row is not None and row[0] == holder
+
+    def release_lease(self, name: str, holder: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM leases WHERE name = ? AND holder = ?', (name, holder))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class RedisBackend(StateBackend):
+    """One hash per namespace. Works with any Redis-compatible server (redis, valkey, a local stand-in)."""
+
+    # set the lease if it is free or ours, in one server-side step
+    ACQUIRE_LEASE = (
+        "local holder = redis.call('GET', KEYS[1]) "
+        "if holder == false or holder == ARGV[1] then redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2]) return 1 end "
+        "return 0"
+    )
+    RELEASE_LEASE = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end return 0"
+
+    def __init__(self, url: str, prefix: str = 'gbc_duty'):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError('STORAGE_BACKEND=redis requires the "redis" package') from e
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+
+    def _hash(self, namespace: str) -> str:
+        return f'{self._prefix}:{namespace}'
+
+    def load(self, namespace: str) -> Dict[str, Any]:
+        return {key: json.loads(value) for key, value in self._client.hgetall(self._hash(namespace)).items()}
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        value = self._client.hget(self._hash(namespace), key)
+        return json.loads(value) if value is not None else None
+
+    def apply(self, batch: Batch) -> None:
+        pipe = self._client.pipeline(transaction=True)
+        for ns, items in batch.items():
+            for key, value in items.items():
+                if value is None:
+                    pipe.hdel(self._hash(ns), key)
+                else:
+                    pipe.hset(self._hash(ns), key, json.dumps(value, ensure_ascii=False))
+        pipe.execute()
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        return bool(self._client.eval(self.ACQUIRE_LEASE, 1, f'{self._prefix}:lease:{name}', holder, int(ttl * 1000)))
+
+    def release_lease(self, name: str, holder: str) -> None:
+        self._client.eval(self.RELEASE_LEASE, 1, f'{self._prefix}:lease:{name}', holder)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class StateStore:
+    """
+    Write-behind буфер над StateBackend.
+    Изменения копятся в памяти (последняя запись по ключу побеждает) и сбрасываются
+    одной транзакцией раз в flush_interval и при остановке бота.
+    """
+
+    def __init__(self, backend: StateBackend):
+        self.backend = backend
+        self._pending: Batch = defaultdict(dict)
+        self._flush_lock = asyncio.Lock()
+
+    def load(self, namespace: str) -> Dict[str, Any]:
+        return self.backend.load(namespace)
+
+    def get(self, namespace: str, key: Any) -> Optional[Any]:
+        return self.backend.get(namespace, str(key))
+
+    def put(self, namespace: str, key: Any, value: Any) -> None:
+        self._pending[namespace][str(key)] = value
+
+    def delete(self, namespace: str, key: Any) -> None:
+        self._pending[namespace][str(key)] = None
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, defaultdict(dict)
+            try:
+                await asyncio.to_thread(self.backend.apply, batch)
+            except Exception as e:
+                logger.error(f'Failed to persist state, will retry: {e}')
+                for ns, items in batch.items():
+                    for key, value in items.items():
+                        self._pending[ns].setdefault(key, value)
+                return
+            logger.debug(f'Persisted {sum(len(items) for items in batch.values())} state records')
+
+
+def create_backend(kind: str, sqlite_path: str, redis_url: Optional[str] = None) -> StateBackend:
+    if kind == 'sqlite':
+        return SQLiteBackend(sqlite_path)
+    if kind == 'redis':
+        return RedisBackend(redis_url)
+    raise ValueError(f'Unknown storage backend: {kind}')
@@ -0,0 +1,242 @@
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from adaptive import AdaptiveInterval
+from deadlines import DeadlineIndex
+from issue_index import compiled_filter
+from models import JiraIssue
+from snapshot import IssueSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_jql(jql: str) -> str:
+    """Collapse whitespace so that equal queries share one poll group."""
+    return ' '.join(jql.split())
+
+
+def pop_due(items, now: float, tick: float, max_interval: Optional[float] = None) -> list:
+    """
+    Items (with `interval` and `next_due`) whose own interval, or max_interval if shorter, has elapsed at this tick.
+    Intervals longer than the tick are rounded to the nearest tick.
+    """
+    due = []
+    for item in items:
+        if item.next_due - now < tick / 2:
+            item.next_due = now + (item.interval if max_interval is None else min(item.interval, max_interval))
+            due.append(item)
+    return due
+
+
+@dataclass
+class Subscription:
+    chat_id: int
+    interval: int
+    next_due: float = 0.0
+    delta: bool = False  # send only new, changed and resolved tracks
+    sent: Optional[Dict[str, str]] = None  # delta mode: issue key -> fingerprint of the last broadcast
+    digest_at: float = 0.0  # delta mode: time.time() of the last full broadcast
+    filters: str = ''  # IssueFilter.spec of the chat's slice of the group's tracks, empty for all of them
+
+    @property
+    def name(self) -> str:
+        return f'{self.chat_id}_send_updates_{self.interval}'
+
+
+@dataclass
+class PollGroup:
+    """
+    Все подписки на один и тот же JQL.
+    Jira опрашивается один раз за тик группы, результат раздаётся всем подписчикам.
+    """
+    jql: str
+    snapshot: IssueSnapshot
+    deadlines: DeadlineIndex
+    subscribers: Dict[str, Subscription] = field(default_factory=dict)
+    adaptive: Optional[AdaptiveInterval] = None
+    reconcile_interval: Optional[int] = None  # set when Jira webhooks keep the snapshot current
+
+    @property
+    def job_name(self) -> str:
+        return f'poll_{hashlib.sha1(self.jql.encode()).hexdigest()[:12]}'
+
+    @property
+    def deadline_job_name(self) -> str:
+        return f'{self.job_name}_sla'
+
+    @property
+    def chat_ids(self) -> List[int]:
+        return sorted({sub.chat_id for sub in self.subscribers.values()})
+
+    @property
+    def tracks(self) -> List[JiraIssue]:
+        return self.snapshot.tracks
+
+    @property
+    def max_age(self) -> float:
+        """How old the snapshot may get: a poll interval and a half (or the reconcile interval, if webhook-fed)."""
+        return self.reconcile_interval or self.poll_interval * 1.5
+
+    def is_fresh(self) -> bool:
+        """The snapshot was refreshed within the last poll interval (or reconcile interval, if webhook-fed)."""
+        age = self.snapshot.age()
+        return self.snapshot.loaded and age is not None and age < self.max_age
+
+    def needs_poll(self) -> bool:
+        """
+        Webhook-fed groups only poll to reconcile. The others poll once their poll interval has elapsed,
+        rounded to the nearest tick: ticks in between only broadcast the current snapshot.
+        """
+        if self.reconcile_interval is not None:
+            return not self.is_fresh()
+        age = self.snapshot.age()
+        return not self.snapshot.loaded or age is None or self.poll_interval - age < self.tick / 2
+
+    def chat_ids_for(self, issue: JiraIssue, now_ms: int) -> List[int]:
+        """Chats with a subscription whose filters let the issue through."""
+        return sorted({sub.chat_id for sub in self.subscribers.values()
+                       if not sub.filters or compiled_filter(sub.filters)[1](issue, now_ms)})
+
+    @property
+    def interval(self) -> int:
+        return min(sub.interval for sub in self.subscribers.values())
+
+    @property
+    def poll_interval(self) -> int:
+        """How often the group polls Jira: the adaptive interval or the shortest subscriber interval."""
+        return self.adaptive.current if self.adaptive else self.interval
+
+    @property
+    def tick(self) -> int:
+        """
+        How often the group's job runs. An adaptive interval that backed off beyond the shortest subscriber
+        interval slows down polling only: broadcasts still follow each subscriber's own interval.
+        """
+        return min(self.poll_interval, self.interval)
+
+    def due_subscribers(self, now: float) -> List[Subscription]:
+        return pop_due(self.subscribers.values(), now, self.tick)
+
+
+class PollRegistry:
+    """Subscriptions keyed by normalized JQL."""
+
+    def __init__(
+        self,
+        sla_warning_threshold_ms: int,
+        incremental: bool = False,
+        reconcile_every: int = 6,
+        full_refresh_every: int = 0,
+        adaptive_bounds: Optional[Tuple[int, int]] = None,
+        reconcile_interval: Optional[int] = None,
+    ):
+        self.groups: Dict[str, PollGroup] = {}
+        self.sla_warning_threshold_ms = sla_warning_threshold_ms
+        self.adaptive_bounds = adaptive_bounds  # (min, max) seconds, None disables adaptive polling
+        self.reconcile_interval = reconcile_interval  # webhook mode: poll only to reconcile the snapshots
+        self.snapshot_options = dict(
+            incremental=incremental,
+            reconcile_every=reconcile_every,
+            full_refresh_every=full_refresh_every,
+        )
+
+    def subscribe(self, chat_id: int, interval: int, jql: str, delta: bool = False,
+                  filters: str = '') -> Tuple[PollGroup, Subscription]:
+        """
+        Filtered subscriptions to the same JQL share its group: Jira is polled once for all of them and
+        each chat gets its slice of the result, so a new team's filter adds no Jira queries.
+        """
+        key = normalize_jql(jql)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = PollGroup(
+                jql=key,
+                snapshot=IssueSnapshot(key, **self.snapshot_options),
+                deadlines=DeadlineIndex(self.sla_warning_threshold_ms),
+                reconcile_interval=self.reconcile_interval,
+            )
+            if self.adaptive_bounds:
+                group.adaptive = AdaptiveInterval(interval, *self.adaptive_bounds)
+        sub = Subscription(chat_id=chat_id, interval=interval, delta=delta, filters=filters)
+        group.subscribers[sub.name] = sub
+        logger.info(f'{sub.name} subscribed to {group.job_name}, {len(group.subscribers)} subscribers')
+        return group, sub
+
+    def unsubscribe(self, chat_id: int, interval: Optional[int] = None) -> List[Tuple[PollGroup, Subscription]]:
+        """Remove chat's subscriptions (all of them if interval is None). Empty groups are dropped."""
+        removed = []
+        for key, group in list(self.groups.items()):
+            for name, sub in list(group.subscribers.items()):
+                if sub.chat_id == chat_id and (interval is None or sub.interval == interval):
+                    removed.append((group, group.subscribers.pop(name)))
+            if not group.subscribers:
+                del self.groups[key]
+        return removed
+
+    def get(self, jql: str) -> Optional[PollGroup]:
+        return self.groups.get(normalize_jql(jql))
+
+    def subscriptions(self, chat_id: Optional[int] = None) -> List[Subscription]:
+        return [
+            sub
+            for group in self.groups.values()
+            for sub in group.subscribers.values()
+            if chat_id is None or sub.chat_id == chat_id
+        ]
+
+
+@dataclass
+class Watcher:
+    """/mywatch subscription of one chat bound to one Jira user."""
+    chat_id: int
+    assignee: str
+    interval: int
+    state: Optional[Dict[str, Dict]] = None  # None until the first tick initialises it
+    next_due: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return f'{self.chat_id}_mywatch'
+
+
+class WatchRegistry:
+    """
+    Все /mywatch подписки. Один тик - один запрос `assignee in (...)` на всех,
+    кому пора проверяться; результат раскладывается по исполнителям.
+    """
+    job_name = 'mywatch'
+
+    def __init__(self, adaptive_bounds: Optional[Tuple[int, int]] = None):
+        self.watchers: Dict[int, Watcher] = {}
+        self.adaptive_bounds = adaptive_bounds
+        self.adaptive: Optional[AdaptiveInterval] = None
+
+    def watch(self, chat_id: int, assignee: str, interval: int) -> Watcher:
+        watcher = self.watchers[chat_id] = Watcher(chat_id=chat_id, assignee=assignee, interval=interval)
+        if self.adaptive_bounds and self.adaptive is None:
+            self.adaptive = AdaptiveInterval(interval, *self.adaptive_bounds)
+        logger.info(f'{watcher.name} watches {assignee}, {len(self.watchers)} watchers')
+        return watcher
+
+    def unwatch(self, chat_id: int) -> Optional[Watcher]:
+        watcher = self.watchers.pop(chat_id, None)
+        if not self.watchers:
+            self.adaptive = None
+        return watcher
+
+    @property
+    def tick(self) -> Optional[int]:
+        """
+        How often the mywatch job runs: the shortest watcher interval, or the adaptive interval if it sped up
+        below it. An adaptive interval that backed off never delays a watcher beyond its own interval.
+        """
+        if not self.watchers:
+            return None
+        interval = min(watcher.interval for watcher in self.watchers.values())
+        return min(self.adaptive.current, interval) if self.adaptive else interval
+
+    def due_watchers(self, now: float) -> List[Watcher]:
+        """Watchers whose own interval, shortened to the adaptive one in adaptive mode, has elapsed."""
+        return pop_due(self.watchers.values(), now, self.tick, self.adaptive.current if self.adaptive else None)
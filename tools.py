@@ -1,100 +1,392 @@
+import asyncio
 import html
 import os
 import sys
+import time
 from datetime import datetime
 from pprint import pprint
 
 import json
 import logging
-from typing import Any, Dict, List, Tuple
-
-from jira import JIRA
-
-from models import JiraIssue
+import re
+from collections import deque
+from dataclasses import dataclass
+from functools import partial
+from itertools import chain
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+
+from cache import CachedResult, CircuitBreaker, SWRCache
+from changes import WatchColumns, ttfr_sla
+from deadlines import ttfr_remaining_millis
+from jira_client import AsyncJira, is_bad_request
+from lookup import IssueLookup
+from metrics import JIRA_PAGES, JIRA_QUERY_ISSUES, PARSE_SECONDS, RENDER_SECONDS, registry as metrics_registry
+from models import Fields, JiraIssue
+from records import parse_records
+from render import browse_url, render_messages
+from snapshot import split_order_by
+from subscriptions import normalize_jql
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
+
+T = TypeVar('T')
 
 from config import settings
 
-jira_options = {'server': settings.jira.url}
-jira = JIRA(options=jira_options, basic_auth=(settings.jira.username, settings.jira.password))
+
+def connect_jira(url: Optional[str] = None, username: Optional[str] = None, password: Optional[str] = None,
+                 max_concurrency: Optional[int] = None):
+    """
+    Build a Jira client on first use: importing this module does no network round trip
+    (get_server_info=False) and does not even import the jira package. Defaults are the main instance.
+    """
+    from jira import JIRA
+    from requests.adapters import HTTPAdapter
+
+    url, username, password = url or settings.jira.url, username or settings.jira.username, password or settings.jira.password
+    if not (url and username and password):
+        raise RuntimeError('JIRA_URL, JIRA_USERNAME and JIRA_PASSWORD must be set')
+    client = JIRA(options={'server': url}, basic_auth=(username, password),
+                  timeout=settings.jira.request_timeout, get_server_info=False)
+    # one keep-alive connection per worker thread of the instance's AsyncJira
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency or settings.jira.max_concurrency)
+    client._session.mount('http://', adapter)
+    client._session.mount('https://', adapter)
+    logger.info(f'Connected to Jira at {url}')
+    return client
+
+
+@dataclass
+class JiraInstance:
+    name: str
+    search_string: str
+    client: AsyncJira
+    breaker: CircuitBreaker
+
+
+def make_instance(name: str, search_string: str, max_concurrency: int, **connect_options) -> JiraInstance:
+    # After repeated Jira failures calls fail fast for a growing pause instead of piling onto a struggling server
+    breaker = CircuitBreaker(threshold=settings.jira.breaker_threshold, backoff=settings.jira.breaker_backoff,
+                             max_backoff=settings.jira.breaker_max_backoff)
+    client = AsyncJira(partial(connect_jira, max_concurrency=max_concurrency, **connect_options),
+                       max_concurrency=max_concurrency, timeout=settings.jira.request_timeout, breaker=breaker)
+    return JiraInstance(name, search_string, client, breaker)
+
+
+# The main Jira and the ones from JIRA_INSTANCES, each with its own connection pool, worker threads and breaker
+jira_instances: Dict[str, JiraInstance] = {'main': make_instance('main', settings.jira.search_string,
+                                                                 settings.jira.max_concurrency)}
+for _name, _instance in settings.jira.instances.items():
+    jira_instances[_name] = make_instance(
+        _name, _instance.search_string or settings.jira.search_string,
+        _instance.max_concurrency or settings.jira.max_concurrency,
+        url=_instance.url, username=_instance.username, password=_instance.password,
+    )
+async_jira = jira_instances['main'].client
+jira_breaker = jira_instances['main'].breaker
+metrics_registry.gauge('gbc_jira_circuit_open', 'Whether Jira calls are currently paused (on any instance)',
+                       collect=lambda: int(any(instance.breaker.is_open for instance in jira_instances.values())))
+
+
+# Queries that mean the same on every instance, they have no search string to substitute
+SHARED_JQL_RE = re.compile(r'^(key|assignee) in \(', re.IGNORECASE)
+_unmatched_jql: Set[Tuple[str, str]] = set()  # (instance, query) already warned about
+
+
+def instance_jql(jql_str: str, instance: JiraInstance) -> str:
+    """
+    The query as sent to one instance: the main search string inside it is replaced with the instance's own.
+    Both sides are compared whitespace-normalised and without the setting's ORDER BY, the way poll groups
+    and incremental polls build their JQL.
+    """
+    if instance.search_string == settings.jira.search_string:
+        return jql_str
+    main, _ = split_order_by(normalize_jql(settings.jira.search_string))
+    own, _ = split_order_by(normalize_jql(instance.search_string))
+    normalized = normalize_jql(jql_str)
+    if main in normalized:
+        return normalized.replace(main, own)
+    if not SHARED_JQL_RE.match(normalized) and (instance.name, normalized) not in _unmatched_jql:
+        _unmatched_jql.add((instance.name, normalized))
+        logger.warning(f'Main search string not found in query for instance {instance.name}, sent as is: {normalized}')
+    return jql_str
+
+
+async def gather_instances(search: Callable[[JiraInstance, bool], Awaitable[T]]) -> List[T]:
+    """
+    Run one search on every instance at once: a tick takes as long as the slowest instance, not the sum.
+    With several instances queries are not validated, so a `key in (...)` list may name other instances' keys.
+    Any failure fails the whole search, a partial answer would look like issues disappearing.
+    """
+    validate_query = len(jira_instances) == 1
+    if validate_query:
+        return [await search(jira_instances['main'], validate_query)]
+    return list(await asyncio.gather(*(search(instance, validate_query) for instance in jira_instances.values())))
+
+
+# Only the fields the models actually read; everything else is dropped server-side
+JIRA_FIELDS = list(Fields.model_fields)
+
+
+async def iter_issue_pages(
+    jql_str: str = settings.jira.search_string,
+    fields: Optional[List[str]] = None,
+    page_size: int = settings.jira.page_size,
+    concurrency: int = settings.jira.page_concurrency,
+    validate_query: bool = True,
+    jira: Optional[AsyncJira] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield raw issue pages in order until `total` is reached.
+    After the first page (which tells the total) up to `concurrency` pages are requested at once.
+    """
+    fields = fields or JIRA_FIELDS
+    jira = jira or async_jira
+
+    async def fetch(start: int) -> Dict[str, Any]:
+        # search_issues rewrites the fields list in place, so each call gets its own copy
+        return await jira.search_issues(jql_str=jql_str, startAt=start, maxResults=page_size, fields=list(fields),
+                                              validate_query=validate_query)
+
+    first = await fetch(0)
+    JIRA_PAGES.inc()
+    JIRA_QUERY_ISSUES.observe(first['total'])
+    yield first['issues']
+    total, step = first['total'], len(first['issues'])  # the server may cap maxResults below page_size
+    logging.debug(f'there are {total} issues, {-(-total // step) if step else 1} pages of {step}')
+    if not step:
+        return
+
+    pending = deque()
+    try:
+        for start in range(step, total, step):
+            pending.append(asyncio.ensure_future(fetch(start)))
+            if len(pending) >= concurrency:
+                page = (await pending.popleft())['issues']
+                JIRA_PAGES.inc()
+                yield page
+        while pending:
+            page = (await pending.popleft())['issues']
+            JIRA_PAGES.inc()
+            yield page
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def check_issues(jql_str: str = settings.jira.search_string) -> json:
+    async def search(instance: JiraInstance, validate_query: bool) -> List[Dict[str, Any]]:
+        pages = []
+        async for page in iter_issue_pages(instance_jql(jql_str, instance), validate_query=validate_query,
+                                           jira=instance.client):
+            pages.extend(page)
+        return pages
+
+    issues = {}
+    for page in await gather_instances(search):
+        # pages are offset-based, an issue can shift between two of them while we page
+        issues.update((issue['key'], issue) for issue in page)
+    return list(issues.values())
+
+
+async def check_issue_keys(jql_str: str = settings.jira.search_string) -> Set[str]:
+    """Cheap key-only search, used to reconcile snapshots."""
+    async def search(instance: JiraInstance, validate_query: bool) -> Set[str]:
+        keys = set()
+        async for page in iter_issue_pages(instance_jql(jql_str, instance), fields=['key'], page_size=1000,
+                                           validate_query=validate_query, jira=instance.client):
+            keys.update(issue['key'] for issue in page)
+        return keys
+
+    return set().union(*await gather_instances(search))
+
+
+def parse_jira_issues(data_json: List[Dict[str, Any]], fast: bool = settings.jira.fast_decode) -> List[JiraIssue]:
+    """Decode raw issues: slot-based records for the poll loop, full pydantic models with fast=False."""
+    with PARSE_SECONDS.time(decoder='records' if fast else 'pydantic'):
+        if fast:
+            return parse_records(data_json)
+        return [JiraIssue.model_validate(track) for track in data_json]
+
+
+def select_broadcast_tracks(tracks: List[JiraIssue]) -> List[JiraIssue]:
+    """Tracks whose TTFR cycle is ongoing and already started counting down (as of now, not of the fetch)."""
+    issues_to_send = []
+    now_ms = int(time.time() * 1000)
+    for track in tracks:
+        try:
+            if (track.fields.customfield_12671.ongoingCycle
+                and ttfr_remaining_millis(track, now_ms) <
+                track.fields.customfield_12671.ongoingCycle.goalDuration.millis
+                ):
+                    issues_to_send.append(track)
+        except Exception as e:
+            logging.error(f'{e}')
+    return issues_to_send
+
+
+def render_tracks(tracks: List[JiraIssue], mode: str = 'broadcast', parse_mode: Optional[str] = None,
+                  header: str = '') -> List[str]:
+    """/check lists every track, broadcasts only those whose TTFR is counting down. One or more messages."""
+    with RENDER_SECONDS.time(mode=mode):
+        if mode == 'check':
+            return render_messages(tracks, parse_mode, header)
+        return render_messages(select_broadcast_tracks(tracks), parse_mode, header,
+                               empty='No tracks to pay attention!!!')
+
+
+async def fetch_tracks(search_string: str = settings.jira.search_string) -> List[JiraIssue]:
+    async def search(instance: JiraInstance, validate_query: bool) -> Dict[str, JiraIssue]:
+        found = {}
+        async for page in iter_issue_pages(instance_jql(search_string, instance), validate_query=validate_query,
+                                           jira=instance.client):
+            # parse each page while the next ones are still in flight
+            found.update((track.key, track) for track in parse_jira_issues(page))
+        return found
+
+    tracks = {}
+    for found in await gather_instances(search):
+        tracks.update(found)
+    tracks = list(tracks.values())
+    logging.debug(f'Find {len(tracks)} tracks')
+    return tracks
 
 
-def check_issues(jql_str: str = settings.jira.search_string) -> json:
-    current_issues = jira.search_issues(jql_str=jql_str, json_result=True, )
-    logging.debug(f'there are {current_issues["total"]} issues')
-    return current_issues['issues']
+# User-facing reads (/check, /get, /mycheck) by JQL: served from memory, stale copies while Jira is down
+track_cache = SWRCache(fetch_tracks, ttl=settings.jira.cache_ttl, stale_ttl=settings.jira.cache_stale_ttl,
+                       max_entries=settings.jira.cache_max_entries)
 
 
-def parse_jira_issues(data_json: List[Dict[str, Any]]) -> List[JiraIssue]:
-    return [JiraIssue.model_validate(track) for track in data_json]
+async def fetch_issues_by_keys(keys: List[str]) -> List[JiraIssue]:
+    """Issues with the given keys; keys Jira does not know (or hides) are simply missing from the result."""
+    # without validation Jira answers for the known keys instead of failing the whole query on one unknown
+    jql_str = f'key in ({", ".join(keys)})'
 
+    async def search(instance: JiraInstance, validate_query: bool) -> List[JiraIssue]:
+        tracks = []
+        async for page in iter_issue_pages(jql_str, page_size=len(keys), validate_query=False, jira=instance.client):
+            tracks.extend(parse_jira_issues(page))
+        return tracks
 
-def prepare_message(tracks: List[JiraIssue]) -> str:
-    msg = "No issues found"
-    if len(tracks) > 0:
-        msg = ''
-        for track in tracks:
-            # Compose the message
-            msg += f"[{track.key}](https://jira.glowbyteconsulting.com/browse/{track.key})\n"
-            msg += f"Summary: {track.fields.summary}\n"
-            msg += f"Assignee: {track.fields.assignee.displayName if track.fields.assignee else 'Unassigned'}\n"
-            msg += f"Status: {track.fields.status.name}\n"
+    return list({track.key: track for track in chain.from_iterable(await gather_instances(search))}.values())
 
-            try:
-                msg += f"Goal duration: {track.fields.customfield_12671.ongoingCycle.goalDuration.friendly}\n"
-                msg += f"Elapsed Time: {track.fields.customfield_12671.ongoingCycle.elapsedTime.friendly}\n"
-                msg += f"Time remaining: {track.fields.customfield_12671.ongoingCycle.remainingTime.friendly}\n"
-            except Exception as e:
-                msg += f"NO SLA set for this track!\n"
-            msg += f"\n\n"
-    return msg
 
+# /get by issue keys: cached per key, misses batched into `key in (...)` queries
+issue_lookup = IssueLookup(fetch_issues_by_keys, ttl=settings.jira.lookup_ttl,
+                           max_entries=settings.jira.lookup_max_entries,
+                           batch_window=settings.jira.lookup_batch_window,
+                           chunk_size=settings.jira.lookup_chunk_size, concurrency=settings.jira.lookup_concurrency)
 
-def etl(search_string: str = settings.jira.search_string, mode: str = 'broadcast') -> str:
-    data_json = check_issues(jql_str=search_string)
-    tracks = parse_jira_issues(data_json)
-    logging.debug(f'Find {len(tracks)} tracks')
-    if mode == 'check':
-        message = prepare_message(tracks)
-    else:
-        issues_to_send = []
-        for track in tracks:
-            try:
-                if (track.fields.customfield_12671.ongoingCycle
-                    and track.fields.customfield_12671.ongoingCycle.remainingTime.millis <
-                    track.fields.customfield_12671.ongoingCycle.goalDuration.millis
-                    ):
-                        issues_to_send.append(track)
-            except Exception as e:
-                logging.error(f'{e}')
-
-        if issues_to_send:
-            message = prepare_message(issues_to_send)
-        else:
-            message = f'No tracks to pay attention!!!'
-    return message
-
-
-def get_my_issues(assignee: str = None) -> List[JiraIssue]:
-    """Get issues assigned to the given user (defaults to configured jira username)."""
+
+def stale_notice(result: CachedResult) -> str:
+    """Header for answers built from an outdated copy, empty for fresh ones."""
+    if not result.stale:
+        return ''
+    fetched = datetime.fromtimestamp(result.fetched_at).strftime('%H:%M')
+    return f"⚠️ Данные Jira на {fetched} ({int(result.age // 60)} мин назад), обновляются\n\n"
+
+
+async def etl(search_string: str = settings.jira.search_string, mode: str = 'broadcast',
+              parse_mode: Optional[str] = None) -> List[str]:
+    result = await track_cache.get(search_string)
+    return render_tracks(result.value, mode, parse_mode, header=stale_notice(result))
+
+
+def my_issues_jql(assignees: List[str]) -> str:
+    users = ', '.join('"{}"'.format(user.replace('\\', '\\\\').replace('"', '\\"')) for user in assignees)
+    return f'assignee in ({users}) AND status not in (Closed, Resolved) AND project != RTDMSUP ORDER BY updated DESC'
+
+
+def assignee_ids(issue: JiraIssue) -> Set[str]:
+    """What `assignee in (...)` may have matched the issue's assignee by: login, user key or e-mail, lower-cased."""
+    user = issue.fields.assignee
+    if user is None:
+        return set()
+    return {value.lower() for value in (user.name, user.key, user.emailAddress) if value}
+
+
+def is_my_active_issue(issue: JiraIssue, assignee: str) -> bool:
+    """Local equivalent of my_issues_jql for a single pushed issue."""
+    return (
+        assignee.lower() in assignee_ids(issue)
+        and issue.fields.status.name not in ('Closed', 'Resolved')
+        and issue.key.split('-')[0] != 'RTDMSUP'
+    )
+
+
+def chunk_assignees(assignees: List[str], max_length: int = settings.jira.jql_max_length) -> List[List[str]]:
+    """Split assignees into groups whose `assignee in (...)` query stays under max_length."""
+    chunks, chunk = [], []
+    for user in assignees:
+        if chunk and len(my_issues_jql(chunk + [user])) > max_length:
+            chunks.append(chunk)
+            chunk = []
+        chunk.append(user)
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+async def get_my_issues(assignee: str = None) -> CachedResult[List[JiraIssue]]:
+    """Get issues assigned to the given user (defaults to configured jira username), through the cache."""
     if assignee is None:
         assignee = settings.jira.username
-    jql = f'assignee = "{assignee}" AND status not in (Closed, Resolved) AND project != RTDMSUP ORDER BY updated DESC'
-    data = check_issues(jql_str=jql)
-    return parse_jira_issues(data)
+    return await track_cache.get(my_issues_jql([assignee]))
+
+
+async def fetch_my_issues(assignees: List[str]) -> List[JiraIssue]:
+    """
+    Active issues of the users, one `assignee in (...)` query. It is not validated: a name Jira does not know
+    drops out of the answer (with a warning) instead of failing the query for everybody else.
+    """
+    jql_str = my_issues_jql(assignees)
+
+    async def search(instance: JiraInstance, validate_query: bool) -> List[JiraIssue]:
+        tracks = []
+        async for page in iter_issue_pages(jql_str, validate_query=False, jira=instance.client):
+            tracks.extend(parse_jira_issues(page))
+        return tracks
+
+    return list({track.key: track for track in chain.from_iterable(await gather_instances(search))}.values())
+
+
+async def fetch_assignee_chunk(assignees: List[str]) -> List[JiraIssue]:
+    """fetch_my_issues, split up user by user if Jira still rejects the query: one bad name costs only its own issues."""
+    try:
+        return await fetch_my_issues(assignees)
+    except Exception as e:
+        if not is_bad_request(e):
+            raise
+        if len(assignees) == 1:
+            logger.warning(f'Jira rejected the issues query of assignee {assignees[0]}: {e}')
+            return []
+        logger.warning(f'Jira rejected the issues query of {len(assignees)} assignees, retrying one by one: {e}')
+    results = await asyncio.gather(*(fetch_assignee_chunk([user]) for user in assignees))
+    return list(chain.from_iterable(results))
+
+
+async def get_issues_by_assignee(assignees: Iterable[str]) -> Dict[str, List[JiraIssue]]:
+    """
+    Active issues of several users with one query per JQL-sized chunk of users.
+    Returns {assignee: [issues]} keyed by the values as given (login or e-mail), with an entry for every one.
+    """
+    by_assignee = {user: [] for user in assignees}
+    requested: Dict[str, List[str]] = {}  # lower-cased -> as given, Jira matches users case-insensitively
+    for user in by_assignee:
+        requested.setdefault(user.lower(), []).append(user)
+    chunks = chunk_assignees(sorted(requested))
+    results = await asyncio.gather(*(fetch_assignee_chunk(chunk) for chunk in chunks))
+    for track in chain.from_iterable(results):
+        for user_id in assignee_ids(track) & requested.keys():
+            for user in requested[user_id]:
+                by_assignee[user].append(track)
+    return by_assignee
 
 
 def check_sla_warning(issue: JiraIssue, threshold_ms: int) -> bool:
     """Return True if the issue's TTFR SLA is ongoing and remaining time is below threshold."""
-    try:
-        cycle = issue.fields.customfield_12671.ongoingCycle
-        if cycle and 0 < cycle.remainingTime.millis < threshold_ms:
-            return True
-    except Exception:
-        pass
-    return False
+    remaining, breached = ttfr_sla(issue)
+    return not breached and 0 < remaining < threshold_ms
 
 
 def format_my_issue_message(issue: JiraIssue, event: str, prev_status: str = None) -> str:
@@ -108,11 +400,10 @@ def format_my_issue_message(issue: JiraIssue, event: str, prev_status: str = Non
       'sla_warning'      — SLA скоро истечёт
       'current'          — текущее состояние (для /mycheck)
     """
-    jira_base = 'https://jira.glowbyteconsulting.com/browse'
     key = issue.key
     summary = html.escape(issue.fields.summary)
     status = html.escape(issue.fields.status.name)
-    link = f'<a href="{jira_base}/{key}">{key}</a>'
+    link = f'<a href="{browse_url(issue)}/{key}">{key}</a>'
 
     sla_part = ''
     for sla_field, sla_name in (
@@ -158,6 +449,19 @@ def format_my_issue_message(issue: JiraIssue, event: str, prev_status: str = Non
     return f'{header}\n{body}{sla_part}'
 
 
+def format_deadline_message(issue: JiraIssue, remaining_ms: int) -> str:
+    """HTML warning sent by the SLA deadline scheduler when TTFR is about to expire."""
+    key = issue.key
+    link = f'<a href="{browse_url(issue)}/{key}">{key}</a>'
+    summary = html.escape(issue.fields.summary)
+    status = html.escape(issue.fields.status.name)
+    assignee = html.escape(issue.fields.assignee.displayName) if issue.fields.assignee else 'Unassigned'
+    minutes = max(0, remaining_ms) // 60000
+    breach = html.escape(issue.fields.customfield_12671.ongoingCycle.breachTime.friendly)
+    return (f'⚠️ <b>TTFR истекает через {minutes} мин:</b> {link}\n{summary}\n'
+            f'Статус: {status} · {assignee}\nДедлайн: {breach}')
+
+
 def check_personal_track_changes(
     current_issues: List[JiraIssue],
     previous_states: Dict[str, Dict],
@@ -168,45 +472,36 @@ def check_personal_track_changes(
     Returns (notifications, updated_state).
     If previous_states is None (first run) — returns no notifications, only initialised state.
     """
-    is_first_run = previous_states is None
-    prev = previous_states or {}
-    notifications: List[str] = []
-    new_states: Dict[str, Dict] = {}
-
-    for issue in current_issues:
-        key = issue.key
-        current_status = issue.fields.status.name
-        issue_prev = prev.get(key)
-
-        if is_first_run or issue_prev is None:
-            # Just initialise — no notifications on first sight
-            sla_warned = False
-        else:
-            prev_status = issue_prev['status']
-            sla_warned = issue_prev.get('sla_warned', False)
-
-            # Status change
-            if prev_status != current_status:
-                if current_status.lower() == 'in progress':
-                    event = 'status_inprogress'
-                else:
-                    event = 'status_changed'
-                notifications.append(format_my_issue_message(issue, event, prev_status))
-
-            # SLA warning (fire once per breach window)
-            if check_sla_warning(issue, sla_warn_ms):
-                if not sla_warned:
-                    notifications.append(format_my_issue_message(issue, 'sla_warning'))
-                    sla_warned = True
-            else:
-                sla_warned = False  # reset if SLA recovered or not applicable
+    return detect_personal_track_changes([(current_issues, previous_states)], sla_warn_ms)[0]
 
-        new_states[key] = {'status': current_status, 'sla_warned': sla_warned}
 
-    return notifications, new_states
+def detect_personal_track_changes(
+    watches: List[Tuple[List[JiraIssue], Optional[Dict[str, Dict]]]],
+    sla_warn_ms: int,
+) -> List[Tuple[List[str], Dict[str, Dict]]]:
+    """
+    check_personal_track_changes for many watchers in one pass over WatchColumns.
+    A message for the same track and event is formatted once and shared by every chat that gets it.
+    """
+    columns = WatchColumns()
+    for issues, state in watches:
+        columns.add_watcher(issues, state)
+    events, states = columns.detect(sla_warn_ms)
+    rendered: Dict[Tuple[int, str, Optional[str]], str] = {}
+    results = []
+    for slot_events, state in zip(events, states):
+        notifications = []
+        for event in slot_events:
+            if event not in rendered:
+                pos, kind, prev_status = event
+                rendered[event] = format_my_issue_message(columns.issues[pos], kind, prev_status)
+            notifications.append(rendered[event])
+        results.append((notifications, state))
+    return results
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=settings.log_level)
     # интересно посмотреть на расчет времени в выходные.
     logging.debug(f'username:{settings.jira.username}, password: {settings.jira.password}')
     # jql_string = 'key in (LTBEXT-3040)'
@@ -214,15 +509,20 @@ if __name__ == '__main__':
     # jql_string = '(("EXT System / Service" in ("Система Внутренних Списков", Anti-Fraud, Collection, "Collection CA", "Credit Scoring", "Data Verification", "Система принятия решений", "Автоматизированная cистема управления операционными рисками", "Система управления лимитами", "Система противодействия внутреннему мошенничеству", "Система противодействия мошенничеству", "Автоматизированная cистема управления операционными рисками", "Автоматизированная система управления операционными рисками") OR "EXT System / Service" in ("Anti Money Laundering") AND project in ("ROSBANK Support", "Почта Банк Support", "МТС Банк Support", "Банк Открытие Support") OR project in ("RTDM Support") AND labels = support) AND status not in (Closed, Resolved) AND (labels != nomon OR labels is EMPTY))'
     #jql_string = '(("EXT System / Service" in ("Система Внутренних Списков", Anti-Fraud, Collection, "Collection CA", "Credit Scoring", "Data Verification", "Система принятия решений", "Автоматизированная cистема управления операционными рисками", "Система управления лимитами", "Система противодействия внутреннему мошенничеству", "Система противодействия мошенничеству", "Автоматизированная cистема управления операционными рисками", "Автоматизированная система управления операционными рисками") OR "EXT System / Service" in ("Anti Money Laundering") AND project in ("ROSBANK Support", "Почта Банк Support", "OTP Bank Support", "МТС Банк Support", "Банк Открытие Support", "Ак Барс Support", "Банк СОЮЗ Support") OR project in ("RTDM Support") AND labels = support) AND status not in (Closed, Resolved) AND (labels != nomon OR labels is EMPTY))'
     jql_string = '(("EXT System / Service" in ("Система Внутренних Списков", Anti-Fraud, Collection, "Collection CA", "Credit Scoring", "Data Verification", "Система принятия решений", "Автоматизированная cистема управления операционными рисками", "Система управления лимитами", "Система противодействия внутреннему мошенничеству", "Система противодействия мошенничеству", "Автоматизированная cистема управления операционными рисками", "Автоматизированная система управления операционными рисками") OR "EXT System / Service" in ("Anti Money Laundering") AND project in ("ROSBANK Support", "Почта Банк Support", "OTP Bank Support", "МТС Банк Support", "Банк Открытие Support", "Ак Барс Support", "Банк СОЮЗ Support") OR project in ("RTDM Support") AND labels = support) AND status not in (Closed, Resolved) AND (labels != nomon OR labels is EMPTY)) and (status = "open" or assignee is EMPTY)'
-    json_data = check_issues(jql_str=jql_string)
+    json_data = asyncio.run(check_issues(jql_str=jql_string))
     # pprint(json_data, indent=4)
-    issues = parse_jira_issues(json_data)
-    import pandas as pd
-
-    df = pd.DataFrame(issues)
-    df.to_csv('data.csv', index=False, )
+    issues = parse_jira_issues(json_data, fast=False)
+    import csv
+
+    with open('data.csv', 'w', newline='', encoding='utf-8') as data_file:
+        writer = csv.writer(data_file)
+        writer.writerow(['key', 'summary', 'assignee', 'status', 'ttfr_remaining'])
+        for issue in issues:
+            cycle = issue.fields.customfield_12671.ongoingCycle if issue.fields.customfield_12671 else None
+            writer.writerow([issue.key, issue.fields.summary,
+                             issue.fields.assignee.name if issue.fields.assignee else '',
+                             issue.fields.status.name, cycle.remainingTime.friendly if cycle else ''])
     print(len(issues))
-    # message = prepare_message(issues)
     # message = etl(jql_string, mode='check')
     # print(message)
     # print('-'*100)
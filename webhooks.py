@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from metrics import WEBHOOK_EVENTS
+from webserver import Request, Response
+
+logger = logging.getLogger(__name__)
+
+EVENT_KINDS = {
+    'jira:issue_created': 'created',
+    'jira:issue_updated': 'updated',
+    'jira:issue_deleted': 'deleted',
+}
+
+
+@dataclass
+class JiraEvent:
+    kind: str  # created, updated or deleted
+    key: str
+    issue: Dict[str, Any]  # raw issue as in /rest/api/2/search
+    received_at: float
+
+
+class JiraWebhookReceiver:
+    """
+    Приёмник вебхуков Jira (jira:issue_created / issue_updated / issue_deleted).
+    Отвечает Jira сразу, а события обрабатывает пачками раз в batch_delay: несколько
+    обновлений одного трека за это время схлопываются в последнее.
+    """
+
+    def __init__(self, apply: Callable[[List[JiraEvent]], Awaitable[None]], secret: Optional[str] = None,
+                 batch_delay: float = 0.5):
+        self.apply = apply
+        self.secret = secret
+        self.batch_delay = batch_delay
+        self._pending: Dict[str, JiraEvent] = {}
+        self._wake = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    def authenticate(self, request: Request) -> bool:
+        """Shared secret in the URL (?secret=, what Jira Server can do) or an HMAC X-Hub-Signature header."""
+        if not self.secret:
+            return True
+        token = request.query.get('secret', [''])[0] or request.headers.get('x-webhook-secret', '')
+        if token:
+            return hmac.compare_digest(token, self.secret)
+        algorithm, _, signature = request.headers.get('x-hub-signature', '').partition('=')
+        if algorithm == 'sha256' and signature:
+            expected = hmac.new(self.secret.encode(), request.body, hashlib.sha256).hexdigest()
+            return hmac.compare_digest(signature, expected)
+        return False
+
+    async def endpoint(self, request: Request) -> Response:
+        if not self.authenticate(request):
+            WEBHOOK_EVENTS.inc(event='unknown', result='unauthorized')
+            return Response.text('Unauthorized', status=401)
+        try:
+            payload = request.json()
+            kind = EVENT_KINDS.get(payload.get('webhookEvent'))
+            key = payload['issue']['key'] if kind else None
+        except (ValueError, AttributeError, KeyError, TypeError):
+            WEBHOOK_EVENTS.inc(event='unknown', result='bad_request')
+            return Response.text('Bad request', status=400)
+        if kind is None:
+            WEBHOOK_EVENTS.inc(event=str(payload.get('webhookEvent')), result='ignored')
+            return Response.json({'ignored': payload.get('webhookEvent')})
+
+        previous = self._pending.get(key)
+        if previous is None or previous.kind != 'deleted':
+            self._pending[key] = JiraEvent(kind, key, payload['issue'], time.time())
+        self._wake.set()
+        WEBHOOK_EVENTS.inc(event=kind, result='queued')
+        return Response.json({'queued': key})
+
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(self.batch_delay)  # let a burst of updates collapse
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Apply everything received so far."""
+        self._wake.clear()
+        batch, self._pending = list(self._pending.values()), {}
+        if not batch:
+            return
+        try:
+            await self.apply(batch)
+        except Exception as e:
+            logger.error(f'Failed to apply {len(batch)} Jira webhook events: {e}')
+
+    async def start(self) -> None:
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
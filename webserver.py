@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_LINES = 100
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, list]
+    headers: Dict[str, str]  # lower-cased names
+    body: bytes = b''
+
+    def json(self) -> Any:
+        return json.loads(self.body or b'null')
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b''
+    content_type: str = 'text/plain; charset=utf-8'
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def text(cls, text: str, status: int = 200, content_type: str = 'text/plain; charset=utf-8') -> 'Response':
+        return cls(status=status, body=text.encode(), content_type=content_type)
+
+    @classmethod
+    def json(cls, payload: Any, status: int = 200) -> 'Response':
+        return cls(status=status, body=json.dumps(payload, ensure_ascii=False).encode(),
+                   content_type='application/json')
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class WebServer:
+    """
+    Минимальный HTTP/1.1 сервер на asyncio для служебных эндпоинтов бота
+    (/metrics, вебхуки Jira и Telegram). Живёт в том же event loop, что и бот.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080, max_body: int = 1 << 20):
+        self.host = host
+        self.port = port
+        self.max_body = max_body
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+
+    def route(self, method: str, path: str, handler: Handler) -> None:
+        self._routes[(method.upper(), path)] = handler
+
+    @property
+    def has_routes(self) -> bool:
+        return bool(self._routes)
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f'HTTP server listening on {self.host}:{self.port}, routes: {sorted(p for _, p in self._routes)}')
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._connections):  # idle keep-alive connections would block wait_closed
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        if length > self.max_body:
+            raise ValueError(f'body of {length} bytes is too large')
+        body = await reader.readexactly(length) if length else b''
+        url = urlsplit(target)
+        return Request(method=method.upper(), path=url.path, query=parse_qs(url.query), headers=headers, body=body)
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, response: Response, keep_alive: bool) -> None:
+        reason = HTTPStatus(response.status).phrase
+        headers = {
+            'Content-Type': response.content_type,
+            'Content-Length': str(len(response.body)),
+            'Connection': 'keep-alive' if keep_alive else 'close',
+            **response.headers,
+        }
+        head = f'HTTP/1.1 {response.status} {reason}\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in headers.items())
+        writer.write(head.encode('latin-1') + b'\r\n' + response.body)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    self._write(writer, Response.text(f'Bad request: {e}', status=400), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                handler = self._routes.get((request.method, request.path))
+                if handler is None:
+                    status = 405 if any(path == request.path for _, path in self._routes) else 404
+                    response = Response.text(HTTPStatus(status).phrase, status=status)
+                else:
+                    try:
+                        response = await handler(request)
+                    except Exception as e:
+                        logger.error(f'{request.method} {request.path} failed: {e}')
+                        response = Response.text('Internal server error', status=500)
+                keep_alive = request.headers.get('connection', '').lower() != 'close'
+                self._write(writer, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()